@@ -0,0 +1,56 @@
+-- Foreign key and export access-path indexes for PostgreSQL
+-- Run after migrations.sql. PostgreSQL does not index the referencing side of a
+-- foreign key, so every ON DELETE CASCADE / RESTRICT check scanned the child
+-- table, and the export's window functions sorted whole tables.
+-- Verify the plans with data/scripts/postgres/check_index_plans.py.
+--
+-- FKs already covered by the leading column of a UNIQUE constraint are skipped:
+-- classes_headquarters.id_class, students_classes.id_student and
+-- classes_attendances.id_student.
+
+-- Students: headquarter FK (RESTRICT check on headquarters delete)
+CREATE INDEX IF NOT EXISTS idx_students_headquarter
+    ON students (id_headquarter);
+
+-- Junction tables: the FK columns not covered by their UNIQUE constraints
+CREATE INDEX IF NOT EXISTS idx_classes_headquarters_headquarter
+    ON classes_headquarters (id_headquarter);
+
+CREATE INDEX IF NOT EXISTS idx_students_classes_class
+    ON students_classes (id_class);
+
+CREATE INDEX IF NOT EXISTS idx_teachers_classes_teacher
+    ON teachers_classes (id_teacher);
+
+CREATE INDEX IF NOT EXISTS idx_teachers_classes_class
+    ON teachers_classes (id_class);
+
+-- Registration fees: FK + ROW_NUMBER() OVER (PARTITION BY id_student
+-- ORDER BY created_at, start_date, id); the tie-breakers make the index cover the whole sort
+DROP INDEX IF EXISTS idx_registration_fees_student_created;
+CREATE INDEX IF NOT EXISTS idx_registration_fees_student_order
+    ON registration_fees (id_student, created_at, start_date, id);
+
+-- Payments: FK + ROW_NUMBER() OVER (PARTITION BY id_registration_fee
+-- ORDER BY created_at, payment_date, id)
+DROP INDEX IF EXISTS idx_payments_registration_created;
+CREATE INDEX IF NOT EXISTS idx_payments_registration_order
+    ON payments (id_registration_fee, created_at, payment_date, id);
+
+-- Classes attendances: per-student stream ordered by date (export_attendance_data.py)
+-- and the class / teacher / headquarter FKs
+CREATE INDEX IF NOT EXISTS idx_classes_attendances_student_date
+    ON classes_attendances (id_student, date, id_class);
+
+CREATE INDEX IF NOT EXISTS idx_classes_attendances_class
+    ON classes_attendances (id_class);
+
+CREATE INDEX IF NOT EXISTS idx_classes_attendances_teacher
+    ON classes_attendances (id_teacher);
+
+CREATE INDEX IF NOT EXISTS idx_classes_attendances_headquarter
+    ON classes_attendances (id_headquarter);
+
+-- Refresh planner statistics for the new indexes
+ANALYZE students, classes_headquarters, students_classes, teachers_classes,
+        registration_fees, payments, classes_attendances;
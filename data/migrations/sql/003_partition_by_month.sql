@@ -0,0 +1,159 @@
+-- Monthly range partitioning of payments and classes_attendances (optional)
+-- Run once, after migrations.sql and 002_foreign_key_indexes.sql. These are the
+-- only tables that grow without bound. Partitioned by month on payment_date /
+-- date, date-bounded queries scan only the matching months, and an old month is
+-- removed by dropping its partition instead of a large DELETE.
+--
+-- Partitions are named <table>_yYYYYmMM and created by ensure_month_partitions().
+-- There is no default partition: a row outside the existing months is rejected,
+-- so the generator and the export scripts create the months they need
+-- (data/scripts/postgres/partitions.py, which also drops old months).
+--
+-- Primary keys become (id, <partition column>), since a unique constraint on a
+-- partitioned table must include the partition key. Nothing references these
+-- tables, so no foreign key depends on id alone. Foreign keys are named
+-- explicitly so they keep the names of migrations.sql.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table
+               WHERE partrelid IN ('payments'::regclass, 'classes_attendances'::regclass)) THEN
+        RAISE EXCEPTION 'payments / classes_attendances are already partitioned';
+    END IF;
+END $$;
+
+-- Create the monthly partitions of parent covering from_date .. to_date (inclusive).
+-- Returns the number of partitions created; existing months are left untouched.
+CREATE OR REPLACE FUNCTION ensure_month_partitions(parent regclass, from_date date, to_date date)
+RETURNS integer AS $$
+DECLARE
+    parent_schema text;
+    parent_name text;
+    month_start date := date_trunc('month', from_date)::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    SELECT n.nspname, c.relname INTO parent_schema, parent_name
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = parent;
+
+    WHILE month_start <= to_date LOOP
+        partition_name := format('%s_y%sm%s', parent_name,
+                                 to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(format('%I.%I', parent_schema, partition_name)) IS NULL THEN
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           parent_schema, partition_name, parent,
+                           month_start, (month_start + interval '1 month')::date);
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move the heap tables aside; their index names are freed for the new parents
+ALTER TABLE payments RENAME TO payments_unpartitioned;
+ALTER INDEX payments_pkey RENAME TO payments_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_payments_registration_created;
+DROP INDEX IF EXISTS idx_payments_registration_order;
+
+ALTER TABLE classes_attendances RENAME TO classes_attendances_unpartitioned;
+ALTER INDEX classes_attendances_pkey RENAME TO classes_attendances_unpartitioned_pkey;
+ALTER INDEX classes_attendances_id_student_id_class_date_key
+    RENAME TO classes_attendances_unpartitioned_id_student_id_class_date_key;
+DROP INDEX IF EXISTS idx_classes_attendances_student_date;
+DROP INDEX IF EXISTS idx_classes_attendances_class;
+DROP INDEX IF EXISTS idx_classes_attendances_teacher;
+DROP INDEX IF EXISTS idx_classes_attendances_headquarter;
+
+-- Payment table, partitioned by payment_date
+CREATE TABLE payments (
+    id UUID DEFAULT uuid_generate_v4(),
+    id_registration_fee UUID NOT NULL,
+    amount DECIMAL(10,2) NOT NULL,
+    payment_date DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    receipt_number VARCHAR(100),
+    concept VARCHAR(200),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, payment_date),
+    CONSTRAINT payments_id_registration_fee_fkey
+        FOREIGN KEY (id_registration_fee) REFERENCES registration_fees(id) ON DELETE CASCADE
+) PARTITION BY RANGE (payment_date);
+
+CREATE TRIGGER update_payments_updated_at
+    BEFORE UPDATE ON payments
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Classes attendances table, partitioned by date
+CREATE TABLE classes_attendances (
+    id UUID DEFAULT uuid_generate_v4(),
+    id_student UUID NOT NULL,
+    id_class UUID NOT NULL,
+    id_headquarter UUID NOT NULL,
+    id_teacher UUID NOT NULL,
+    date DATE NOT NULL,
+    attended BOOLEAN DEFAULT FALSE,
+    observations TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, date),
+    CONSTRAINT classes_attendances_id_student_fkey
+        FOREIGN KEY (id_student) REFERENCES students(id) ON DELETE CASCADE,
+    CONSTRAINT classes_attendances_id_class_fkey
+        FOREIGN KEY (id_class) REFERENCES classes(id) ON DELETE CASCADE,
+    CONSTRAINT classes_attendances_id_headquarter_fkey
+        FOREIGN KEY (id_headquarter) REFERENCES headquarters(id) ON DELETE CASCADE,
+    CONSTRAINT classes_attendances_id_teacher_fkey
+        FOREIGN KEY (id_teacher) REFERENCES teachers(id) ON DELETE CASCADE,
+    UNIQUE (id_student, id_class, date)
+) PARTITION BY RANGE (date);
+
+CREATE TRIGGER update_classes_attendances_updated_at
+    BEFORE UPDATE ON classes_attendances
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Indexes of 002_foreign_key_indexes.sql, now created on every partition
+CREATE INDEX idx_payments_registration_order
+    ON payments (id_registration_fee, created_at, payment_date, id);
+
+CREATE INDEX idx_classes_attendances_student_date
+    ON classes_attendances (id_student, date, id_class);
+
+CREATE INDEX idx_classes_attendances_class
+    ON classes_attendances (id_class);
+
+CREATE INDEX idx_classes_attendances_teacher
+    ON classes_attendances (id_teacher);
+
+CREATE INDEX idx_classes_attendances_headquarter
+    ON classes_attendances (id_headquarter);
+
+-- Months of the existing rows up to the current month, then copy the rows over
+SELECT ensure_month_partitions('payments',
+                               coalesce(min(payment_date), current_date),
+                               greatest(max(payment_date), current_date))
+FROM payments_unpartitioned;
+
+SELECT ensure_month_partitions('classes_attendances',
+                               coalesce(min(date), current_date),
+                               greatest(max(date), current_date))
+FROM classes_attendances_unpartitioned;
+
+INSERT INTO payments SELECT * FROM payments_unpartitioned;
+INSERT INTO classes_attendances SELECT * FROM classes_attendances_unpartitioned;
+
+DROP TABLE payments_unpartitioned;
+DROP TABLE classes_attendances_unpartitioned;
+
+COMMIT;
+
+-- Refresh planner statistics of the parents and their partitions
+ANALYZE payments, classes_attendances;
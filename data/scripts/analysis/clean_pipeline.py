@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Chunked Cleaning Pipeline - Student Payment BI Export
+Scriptable version of the ClearData.ipynb steps (category conversion, outlier
+detection, column drops, median/constant imputation) that processes the export
+in chunks, so memory stays bounded when the file is far larger than RAM.
+
+Passes over the input:
+1. Statistics: counts, nulls, min/max, mean/std (merged per chunk) and value
+   counts for low-cardinality text columns.
+2. Quantiles: fixed-bin histograms between each column's min and max, giving
+   medians and IQR quartiles within one bin width.
+3. Transform: outlier counts, drops, imputation and categoricals, written as
+   Parquet row groups.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+# Default cleaning configuration (mirrors the decisions taken in ClearData.ipynb)
+DEFAULT_CONFIG = {
+    'chunk_rows': 50000,
+    # Text columns with at most this many distinct values become categoricals
+    'category_max_unique': 1000,
+    # Explicit drops and drop-by-null-ratio threshold
+    'drop_columns': [],
+    'drop_null_ratio': 0.95,
+    # (column regex, strategy, fill_value); first matching rule wins
+    'impute': [
+        (r'^amount_\d+_\d+$', 'median', None),
+        (r'^state_\d+$', 'constant', 'S'),
+    ],
+    # Identifier-like columns kept as text even when every value is numeric
+    'text_columns': [r'^document_id$', r'^phone$', r'^receipt_number_\d+_\d+$'],
+    # Bins used by the quantile pass
+    'histogram_bins': 4096,
+    # IQR fence multiplier and sigma rule
+    'iqr_factor': 1.5,
+    'sigma_factor': 3.0,
+}
+
+
+def iter_chunks(path, chunk_rows=DEFAULT_CONFIG['chunk_rows'], columns=None):
+    """
+    Yield DataFrame chunks from a CSV (plain/.gz/.zst) or Parquet export.
+    CSV is read as text so every chunk has the same dtypes.
+    """
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(path, dtype=str, chunksize=chunk_rows, usecols=columns)
+
+
+def read_columns(path):
+    """
+    Column names of an export without reading its rows.
+    """
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def to_numeric_matrix(chunk, columns):
+    """
+    Coerce columns to a float matrix (non-numeric values become NaN).
+    """
+    return np.column_stack([
+        pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=float)
+        for col in columns
+    ]) if columns else np.empty((len(chunk), 0))
+
+
+# ---------------------------------------------------------------------------
+# Pass 1: moments, null counts, numeric detection, value counts
+# ---------------------------------------------------------------------------
+
+def compute_statistics(path, config=DEFAULT_CONFIG):
+    """
+    First pass. Returns a dict of per-column statistics.
+    Means/variances are merged per chunk (Chan et al.) to stay numerically stable.
+    """
+    columns = read_columns(path)
+    n_cols = len(columns)
+
+    rows = 0
+    nulls = np.zeros(n_cols, dtype=np.int64)
+    non_numeric = np.zeros(n_cols, dtype=bool)
+    count = np.zeros(n_cols)
+    mean = np.zeros(n_cols)
+    m2 = np.zeros(n_cols)
+    minimum = np.full(n_cols, np.inf)
+    maximum = np.full(n_cols, -np.inf)
+    value_counts = {col: {} for col in columns}
+
+    for chunk in iter_chunks(path, config['chunk_rows']):
+        rows += len(chunk)
+        present = chunk.notna().to_numpy()
+        nulls += (~present).sum(axis=0)
+
+        X = to_numeric_matrix(chunk, columns)
+        valid = ~np.isnan(X)
+        # A value that is present but does not parse marks the column as text
+        non_numeric |= (present & ~valid).any(axis=0)
+
+        # Merge chunk moments
+        chunk_count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk_mean = np.where(chunk_count > 0, np.nansum(X, axis=0) / chunk_count, 0.0)
+            chunk_m2 = np.nansum((X - chunk_mean) ** 2, axis=0)
+        total = count + chunk_count
+        delta = chunk_mean - mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(total > 0, mean + delta * chunk_count / total, 0.0)
+            m2 = m2 + chunk_m2 + np.where(total > 0, delta ** 2 * count * chunk_count / total, 0.0)
+        count = total
+        if len(chunk):
+            minimum = np.fmin(minimum, np.nanmin(np.where(valid, X, np.inf), axis=0))
+            maximum = np.fmax(maximum, np.nanmax(np.where(valid, X, -np.inf), axis=0))
+
+        # Bounded value counts (used for categories / most_frequent); columns that
+        # exceed the limit, like numeric amounts, stop being tracked
+        for col in columns:
+            counts = value_counts[col]
+            if counts is not None:
+                for value, n in chunk[col].value_counts().items():
+                    counts[value] = counts.get(value, 0) + int(n)
+                if len(counts) > config['category_max_unique']:
+                    value_counts[col] = None
+
+    stats = {}
+    for i, col in enumerate(columns):
+        forced_text = any(re.match(pattern, col) for pattern in config['text_columns'])
+        numeric = not non_numeric[i] and count[i] > 0 and not forced_text
+        entry = {
+            'rows': rows,
+            'nulls': int(nulls[i]),
+            'null_ratio': float(nulls[i] / rows) if rows else 0.0,
+            'numeric': bool(numeric),
+        }
+        if numeric:
+            entry.update({
+                'count': int(count[i]),
+                'mean': float(mean[i]),
+                'std': float(np.sqrt(m2[i] / (count[i] - 1))) if count[i] > 1 else 0.0,
+                'min': float(minimum[i]),
+                'max': float(maximum[i]),
+            })
+        else:
+            entry['value_counts'] = value_counts[col]
+        stats[col] = entry
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Pass 2: histogram quantiles
+# ---------------------------------------------------------------------------
+
+def histogram_quantiles(counts, low, high, quantiles):
+    """
+    Quantiles from a fixed-bin histogram, interpolating inside the target bin.
+    """
+    total = counts.sum()
+    if total == 0:
+        return [float('nan')] * len(quantiles)
+    if high == low:
+        return [float(low)] * len(quantiles)
+
+    width = (high - low) / len(counts)
+    cumulative = np.cumsum(counts)
+    result = []
+    for q in quantiles:
+        rank = q * (total - 1)
+        bin_index = int(np.searchsorted(cumulative, rank, side='right'))
+        bin_index = min(bin_index, len(counts) - 1)
+        before = cumulative[bin_index - 1] if bin_index > 0 else 0
+        inside = (rank - before + 0.5) / counts[bin_index] if counts[bin_index] else 0.5
+        result.append(float(low + (bin_index + min(max(inside, 0.0), 1.0)) * width))
+    return result
+
+
+def compute_quantiles(path, stats, config=DEFAULT_CONFIG, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Second pass: histogram every numeric column and add q25/median/q75 to stats.
+    """
+    columns = [col for col, entry in stats.items() if entry['numeric']]
+    if not columns:
+        return stats
+
+    bins = config['histogram_bins']
+    low = np.array([stats[col]['min'] for col in columns])
+    high = np.array([stats[col]['max'] for col in columns])
+    width = np.where(high > low, (high - low) / bins, 1.0)
+    histograms = np.zeros((len(columns), bins), dtype=np.int64)
+    offsets = np.arange(len(columns)) * bins
+
+    for chunk in iter_chunks(path, config['chunk_rows'], columns=columns):
+        X = to_numeric_matrix(chunk, columns)
+        valid = ~np.isnan(X)
+        scaled = np.where(valid, (X - low) / width, 0.0)
+        index = np.clip(scaled.astype(np.int64), 0, bins - 1)
+        flat = (index + offsets)[valid]
+        histograms += np.bincount(flat, minlength=histograms.size).reshape(histograms.shape)
+
+    for i, col in enumerate(columns):
+        q25, median, q75 = histogram_quantiles(histograms[i], low[i], high[i], quantiles)
+        stats[col].update({'q25': q25, 'median': median, 'q75': q75})
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Pass 3: transform
+# ---------------------------------------------------------------------------
+
+def plan_cleaning(stats, config=DEFAULT_CONFIG):
+    """
+    Turn statistics into concrete cleaning decisions.
+    """
+    drop = [
+        col for col, entry in stats.items()
+        if col in config['drop_columns'] or entry['null_ratio'] > config['drop_null_ratio']
+    ]
+
+    fences = {}
+    for col, entry in stats.items():
+        if not entry['numeric'] or col in drop:
+            continue
+        iqr = entry['q75'] - entry['q25']
+        fences[col] = {
+            'iqr': (entry['q25'] - config['iqr_factor'] * iqr,
+                    entry['q75'] + config['iqr_factor'] * iqr),
+            'sigma': (entry['mean'] - config['sigma_factor'] * entry['std'],
+                      entry['mean'] + config['sigma_factor'] * entry['std']),
+        }
+
+    fill_values = {}
+    for col, entry in stats.items():
+        if col in drop or entry['nulls'] == 0:
+            continue
+        for pattern, strategy, fill_value in config['impute']:
+            if not re.match(pattern, col):
+                continue
+            if strategy == 'median' and entry['numeric']:
+                fill_values[col] = entry['median']
+            elif strategy == 'mean' and entry['numeric']:
+                fill_values[col] = entry['mean']
+            elif strategy == 'most_frequent' and entry.get('value_counts'):
+                fill_values[col] = max(entry['value_counts'].items(), key=lambda kv: kv[1])[0]
+            elif strategy == 'constant':
+                fill_values[col] = fill_value
+            break
+
+    categories = {}
+    for col, entry in stats.items():
+        if col in drop or entry['numeric'] or not entry.get('value_counts'):
+            continue
+        values = set(entry['value_counts'])
+        if col in fill_values:
+            values.add(fill_values[col])
+        categories[col] = sorted(values, key=str)
+
+    return {'drop': drop, 'fences': fences, 'fill_values': fill_values, 'categories': categories}
+
+
+def output_schema(columns, stats, plan):
+    """
+    Fixed Arrow schema so every row group has identical types.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for col in columns:
+        if col in plan['drop']:
+            continue
+        if stats[col]['numeric']:
+            fields.append(pa.field(col, pa.float64()))
+        elif col in plan['categories']:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def transform_chunk(chunk, stats, plan, outlier_counts):
+    """
+    Apply the cleaning plan to one chunk and accumulate outlier counts.
+    """
+    chunk = chunk.drop(columns=[col for col in plan['drop'] if col in chunk.columns])
+
+    for col in chunk.columns:
+        if stats[col]['numeric']:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+    # Outliers are counted on the raw (pre-imputation) values
+    for col, fence in plan['fences'].items():
+        values = chunk[col]
+        for method, (low, high) in fence.items():
+            outlier_counts[method][col] += int(((values < low) | (values > high)).sum())
+
+    chunk = chunk.fillna(value={col: v for col, v in plan['fill_values'].items() if col in chunk.columns})
+
+    for col, categories in plan['categories'].items():
+        chunk[col] = pd.Categorical(chunk[col], categories=categories)
+
+    return chunk
+
+
+def clean_export(path, output, config=DEFAULT_CONFIG, report_path=None):
+    """
+    Run the three passes and write the cleaned Parquet output plus a JSON report.
+    Returns the report dict.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stats = compute_statistics(path, config)
+    stats = compute_quantiles(path, stats, config)
+    plan = plan_cleaning(stats, config)
+
+    columns = list(stats)
+    schema = output_schema(columns, stats, plan)
+    outlier_counts = {method: {col: 0 for col in plan['fences']} for method in ('iqr', 'sigma')}
+
+    rows = 0
+    with pq.ParquetWriter(output, schema, compression='zstd') as writer:
+        for chunk in iter_chunks(path, config['chunk_rows']):
+            cleaned = transform_chunk(chunk, stats, plan, outlier_counts)
+            writer.write_table(pa.Table.from_pandas(cleaned, schema=schema, preserve_index=False))
+            rows += len(cleaned)
+
+    report = {
+        'input': path,
+        'output': output,
+        'rows': rows,
+        'dropped_columns': plan['drop'],
+        'fill_values': plan['fill_values'],
+        'categorical_columns': sorted(plan['categories']),
+        'outliers': outlier_counts,
+        'statistics': {
+            col: {k: v for k, v in entry.items() if k != 'value_counts'}
+            for col, entry in stats.items()
+        },
+    }
+
+    report_path = report_path or os.path.splitext(output)[0] + '.report.json'
+    with open(report_path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, default=str)
+
+    return report
+
+
+def parse_args():
+    """
+    Parse command line options for the cleaning pipeline.
+    """
+    parser = argparse.ArgumentParser(description='Chunked cleaning pipeline for the BI export')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Cleaned Parquet output (default: <input>_clean.parquet)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CONFIG['chunk_rows'])
+    parser.add_argument('--drop', nargs='*', default=[], help='Columns to drop')
+    parser.add_argument('--drop-null-ratio', type=float, default=DEFAULT_CONFIG['drop_null_ratio'],
+                        help='Drop columns whose null ratio exceeds this value')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    config = dict(DEFAULT_CONFIG)
+    config['chunk_rows'] = args.chunk_rows
+    config['drop_columns'] = args.drop
+    config['drop_null_ratio'] = args.drop_null_ratio
+
+    output = args.output or re.sub(r'(\.csv)?(\.gz|\.zst)?$|\.parquet$', '', args.input) + '_clean.parquet'
+
+    try:
+        print("🧹 Cleaning export in chunks...")
+        report = clean_export(args.input, output, config)
+        print(f"✓ Rows: {report['rows']:,}")
+        print(f"✓ Dropped columns: {len(report['dropped_columns'])}")
+        print(f"✓ Imputed columns: {len(report['fill_values'])}")
+        print(f"✓ Categorical columns: {len(report['categorical_columns'])}")
+        print(f"✓ IQR outliers: {sum(report['outliers']['iqr'].values()):,}")
+        print(f"✓ 3σ outliers: {sum(report['outliers']['sigma'].values()):,}")
+        print(f"✅ Cleaned data written to: {output}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
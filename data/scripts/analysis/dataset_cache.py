@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Parsed-Dataset Cache - Student Payment BI Export
+The first load of a CSV export parses it once and stores an uncompressed
+Feather (Arrow IPC) sidecar in the cache directory. Later loads memory-map the
+sidecar: no parsing, and the OS page cache is shared by every notebook kernel
+that opens the same file.
+
+Sidecars are keyed by the SHA-256 of the file contents. The (path, size, mtime)
+-> hash mapping is remembered, so unchanged files are not re-hashed either.
+When the cache directory exceeds its size limit the least recently used
+sidecars are evicted.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import pyarrow.feather as feather
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'DATASET_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.cache')
+)
+
+# Size limit of the cache directory (sidecars only)
+DEFAULT_MAX_BYTES = int(os.getenv('DATASET_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+INDEX_FILE = 'index.json'
+HASH_BLOCK = 8 * 1024 * 1024
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_index(cache_dir):
+    """
+    Cache index: known file signatures and sidecar usage.
+    """
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {'files': {}, 'sidecars': {}}
+
+
+def write_index(cache_dir, index):
+    """
+    Write the index atomically (other kernels may be reading it).
+    """
+    path = os.path.join(cache_dir, INDEX_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(index, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def content_key(path, index):
+    """
+    Content hash of path, reusing the stored hash while size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    signature = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    known = index['files'].get(signature)
+    if known:
+        return known
+
+    key = file_hash(path)
+    # Forget older signatures of the same path
+    prefix = os.path.abspath(path) + '|'
+    index['files'] = {sig: h for sig, h in index['files'].items() if not sig.startswith(prefix)}
+    index['files'][signature] = key
+    return key
+
+
+def sidecar_name(path, key, optimize):
+    """
+    Sidecar file name: readable stem plus content hash (and loader options).
+    """
+    stem = os.path.basename(path).split('.')[0]
+    suffix = '-opt' if optimize else ''
+    return f"{stem}-{key[:16]}{suffix}.feather"
+
+
+def parse_export(path, optimize=False):
+    """
+    Parse the export once (optionally with dtype_optimizer's compact dtypes).
+    """
+    if optimize:
+        from dtype_optimizer import load_optimized
+
+        return load_optimized(path, report=False)
+    return pd.read_csv(path)
+
+
+def evict(cache_dir, index, max_bytes, keep=()):
+    """
+    Remove least recently used sidecars until the directory fits max_bytes.
+    Returns the evicted file names.
+    """
+    sidecars = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.feather'):
+            size = os.path.getsize(os.path.join(cache_dir, name))
+            last_used = index['sidecars'].get(name, {}).get('last_used', 0)
+            sidecars.append((last_used, name, size))
+
+    total = sum(size for _, _, size in sidecars)
+    evicted = []
+    for _, name, size in sorted(sidecars):
+        if total <= max_bytes:
+            break
+        if name in keep:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        index['sidecars'].pop(name, None)
+        total -= size
+        evicted.append(name)
+    return evicted
+
+
+def load_dataset(path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 as_arrow=False, optimize=False, verbose=True):
+    """
+    Load an export through the cache.
+
+    First call: parse the file and write the Feather sidecar (uncompressed, so it
+    can be memory-mapped). Later calls: memory-map the sidecar. Returns a pandas
+    DataFrame, or the zero-copy Arrow Table with as_arrow=True.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    index = read_index(cache_dir)
+    key = content_key(path, index)
+    name = sidecar_name(path, key, optimize)
+    sidecar = os.path.join(cache_dir, name)
+
+    if not os.path.exists(sidecar):
+        started = time.perf_counter()
+        data = parse_export(path, optimize)
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        feather.write_feather(data, tmp, compression='uncompressed')
+        os.replace(tmp, sidecar)
+        if verbose:
+            print(f"✓ Parsed {path} in {time.perf_counter() - started:.2f}s, cached as {name}")
+        for evicted in evict(cache_dir, index, max_bytes, keep={name}):
+            if verbose:
+                print(f"🗑️  Evicted {evicted}")
+    elif verbose:
+        print(f"✓ Memory-mapped cached copy: {name}")
+
+    index['sidecars'][name] = {'source': os.path.abspath(path), 'last_used': time.time()}
+    write_index(cache_dir, index)
+
+    table = feather.read_table(sidecar, memory_map=True)
+    if as_arrow:
+        return table
+    # split_blocks avoids consolidating columns into one copied 2-D block
+    return table.to_pandas(split_blocks=True)
+
+
+def cache_info(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    DataFrame of cached sidecars with size, source file and last use.
+    """
+    index = read_index(cache_dir)
+    rows = []
+    if os.path.isdir(cache_dir):
+        for name in sorted(os.listdir(cache_dir)):
+            if not name.endswith('.feather'):
+                continue
+            entry = index['sidecars'].get(name, {})
+            rows.append({
+                'sidecar': name,
+                'source': entry.get('source'),
+                'size_mb': os.path.getsize(os.path.join(cache_dir, name)) / 1024 ** 2,
+                'last_used': pd.to_datetime(entry.get('last_used', 0), unit='s'),
+            })
+    return pd.DataFrame(rows, columns=['sidecar', 'source', 'size_mb', 'last_used'])
+
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Remove every sidecar and the index.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith('.feather') or name == INDEX_FILE:
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+def parse_args():
+    """
+    Parse command line options for the dataset cache.
+    """
+    parser = argparse.ArgumentParser(description='Parsed-dataset cache for BI exports')
+    parser.add_argument('inputs', nargs='*', help='CSV exports to load (warms the cache)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help='Cache directory size limit in MB')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Cache with dtype_optimizer dtypes')
+    parser.add_argument('--info', action='store_true', help='List cached sidecars')
+    parser.add_argument('--clear', action='store_true', help='Remove every sidecar')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.clear:
+            print(f"✓ Removed {clear_cache(args.cache_dir)} files from {args.cache_dir}")
+
+        for path in args.inputs:
+            started = time.perf_counter()
+            data = load_dataset(path, args.cache_dir, int(args.max_mb * 1024 ** 2), optimize=args.optimize)
+            print(f"  {len(data):,} rows x {len(data.columns)} columns in {time.perf_counter() - started:.2f}s")
+
+        if args.info or not (args.inputs or args.clear):
+            info = cache_info(args.cache_dir)
+            print(info.to_string(index=False) if len(info) else "Cache is empty")
+            print(f"\n📊 Total: {info['size_mb'].sum():,.1f} MB in {args.cache_dir}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate User Detection - Student Payment BI Export
+generate_users() inserts 5% near-duplicates: same name, email and phone with
+document_id bumped by one. drop_duplicates(subset=['document_id']) in the
+exporters cannot see them. This stage finds them without comparing every pair:
+
+1. Blocking: rows sharing a normalized email, a normalized phone (last 10
+   digits, so "+57 310 ...", "0310...", "(310) ..." agree) or an LSH band of
+   the MinHash signature of their full name land in the same block.
+2. Scoring: only pairs inside a block are scored (email, phone, estimated name
+   Jaccard similarity, document_id distance).
+3. Clustering: pairs above the threshold are merged with union-find.
+
+Work is linear in the number of rows plus the number of candidate pairs;
+oversized blocks (very common names, placeholder emails) are skipped.
+"""
+
+import argparse
+import sys
+import zlib
+import numpy as np
+import pandas as pd
+
+# MinHash signature length and LSH banding (bands * rows = NUM_PERM).
+# With 8 bands of 8 rows, pairs with name Jaccard >= ~0.77 are likely to share a band.
+NUM_PERM = 64
+LSH_BANDS = 8
+SHINGLE_SIZE = 3
+
+# Blocks larger than this are skipped (they would add O(k²) pairs)
+MAX_BLOCK_SIZE = 500
+
+# Rows per MinHash batch (bounds the permutation x row x shingle block)
+BATCH_ROWS = 5000
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Score weights and match threshold
+WEIGHTS = {'email': 0.35, 'phone': 0.25, 'name': 0.30, 'document': 0.10}
+THRESHOLD = 0.65
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+
+def normalize_text(values):
+    """
+    Lowercase, strip accents and collapse whitespace (vectorized over a Series).
+    """
+    values = values.astype('string').fillna('').str.normalize('NFKD')
+    values = values.str.replace('[\u0300-\u036f]', '', regex=True).str.lower()
+    return values.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def normalize_emails(emails):
+    """
+    Lowercased emails without '+tag' suffixes; missing values become ''.
+    """
+    emails = emails.astype('string').str.strip().str.lower()
+    emails = emails.str.replace(r'\+[^@]*@', '@', regex=True)
+    return emails.fillna('')
+
+
+def normalize_phones(phones):
+    """
+    Digits only, last 10 (drops the +57 country code and the leading 0 prefix).
+    Numbers with fewer than 7 digits are treated as missing.
+    """
+    digits = phones.astype('string').str.replace(r'\D', '', regex=True).fillna('')
+    digits = digits.str[-10:]
+    return digits.where(digits.str.len() >= 7, '')
+
+
+def full_names(data):
+    """
+    Normalized "name last_name" for every row.
+    """
+    first = data['name'] if 'name' in data else pd.Series('', index=data.index)
+    last = data['last_name'] if 'last_name' in data else pd.Series('', index=data.index)
+    return normalize_text(first.astype('string').fillna('') + ' ' + last.astype('string').fillna(''))
+
+
+# ---------------------------------------------------------------------------
+# MinHash / LSH
+# ---------------------------------------------------------------------------
+
+def minhash_signatures(names, num_perm=NUM_PERM, seed=1, batch_rows=BATCH_ROWS):
+    """
+    MinHash signatures (rows x num_perm, uint64) over character shingles.
+    Rows without a name get a signature of max values (never banded).
+    Each distinct name is hashed once.
+    """
+    codes, unique_names = pd.factorize(pd.Series(names, dtype=object))
+    return unique_signatures(list(unique_names), num_perm, seed, batch_rows)[codes]
+
+
+def unique_signatures(names, num_perm=NUM_PERM, seed=1, batch_rows=BATCH_ROWS):
+    """
+    MinHash signatures of a list of distinct names. Shingles are hashed and
+    permuted once per distinct shingle; each row then takes the minimum over
+    the gathered columns of its shingles.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    vocabulary = {}
+    rows, shingle_ids = [], []
+    for i, name in enumerate(names):
+        padded = f" {name} " if name else ''
+        ids = [vocabulary.setdefault(padded[j:j + SHINGLE_SIZE], len(vocabulary))
+               for j in range(len(padded) - SHINGLE_SIZE + 1)]
+        rows.extend([i] * len(ids))
+        shingle_ids.extend(ids)
+
+    signatures = np.full((num_perm, len(names)), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if not rows:
+        return signatures.T
+
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in vocabulary),
+                         dtype=np.uint64, count=len(vocabulary))
+    # (a*h + b) mod p per permutation and shingle; h < 2^32 and the uint64
+    # product wraps, which is fine for a hash family
+    permuted = (a[:, None] * hashes + b[:, None]) % np.uint64(MERSENNE_PRIME)
+
+    # Padded (row x position) shingle matrix; padding points at an extra
+    # column of max values, so it never wins the minimum
+    permuted = np.hstack([permuted, np.full((num_perm, 1), np.iinfo(np.uint64).max, dtype=np.uint64)])
+    rows = np.asarray(rows)
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    lengths = np.diff(np.append(starts, len(rows)))
+    positions = np.arange(len(rows)) - np.repeat(starts, lengths)
+    padded_ids = np.full((len(names), lengths.max()), len(vocabulary), dtype=np.int64)
+    padded_ids[rows, positions] = shingle_ids
+
+    # Batches of rows bound the gathered (num_perm x rows x positions) block
+    for first in range(0, len(names), batch_rows):
+        block = padded_ids[first:first + batch_rows]
+        signatures[:, first:first + len(block)] = permuted[:, block].min(axis=2)
+    return np.ascontiguousarray(signatures.T)
+
+
+def lsh_band_keys(signatures, bands=LSH_BANDS):
+    """
+    One uint64 key per (row, band): a polynomial hash of the band's values.
+    """
+    rows_per_band = signatures.shape[1] // bands
+    multipliers = np.uint64(0x9E3779B97F4A7C15) ** np.arange(rows_per_band, dtype=np.uint64)
+    keys = np.empty((len(signatures), bands), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            chunk = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+            keys[:, band] = (chunk * multipliers).sum(axis=1)
+    return keys
+
+
+# ---------------------------------------------------------------------------
+# Candidate pairs, scoring and clustering
+# ---------------------------------------------------------------------------
+
+def block_pairs(rows, keys, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Candidate pairs (i < j) of rows sharing a block key.
+    Returns the pairs array and the number of skipped oversized blocks.
+    """
+    keys = pd.DataFrame({'row': rows, 'key': keys})
+    sizes = keys.groupby('key')['row'].transform('size')
+    skipped = int(keys.loc[sizes > max_block_size, 'key'].nunique())
+    keys = keys[(sizes > 1) & (sizes <= max_block_size)]
+    if keys.empty:
+        return np.empty((0, 2), dtype=np.int64), skipped
+
+    pairs = keys.merge(keys, on='key', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['row_a'] < pairs['row_b']]
+    pairs = pairs[['row_a', 'row_b']].drop_duplicates()
+    return pairs.to_numpy(dtype=np.int64), skipped
+
+
+def candidate_pairs(emails, phones, signatures, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Union of the email, phone and name-LSH blocks (each blocked separately).
+    """
+    blockings = []
+    for values in (emails.to_numpy(dtype=object), phones.to_numpy(dtype=object)):
+        present = np.flatnonzero(values != '')
+        blockings.append((present, values[present]))
+
+    named = np.flatnonzero(signatures[:, 0] != np.iinfo(np.uint64).max)
+    if len(named):
+        band_keys = lsh_band_keys(signatures[named])
+        for band in range(band_keys.shape[1]):
+            blockings.append((named, band_keys[:, band]))
+
+    pairs, skipped = [], 0
+    for rows, keys in blockings:
+        block, block_skipped = block_pairs(rows, keys, max_block_size)
+        pairs.append(block)
+        skipped += block_skipped
+
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+    return pairs, skipped
+
+
+def score_pairs(pairs, emails, phones, signatures, documents, weights=WEIGHTS):
+    """
+    Vectorized pair scores in [0, 1] plus the individual signals.
+    """
+    a, b = pairs[:, 0], pairs[:, 1]
+    email_a, email_b = emails.to_numpy()[a], emails.to_numpy()[b]
+    phone_a, phone_b = phones.to_numpy()[a], phones.to_numpy()[b]
+
+    email_match = (email_a == email_b) & (email_a != '')
+    phone_match = (phone_a == phone_b) & (phone_a != '')
+    name_similarity = (signatures[a] == signatures[b]).mean(axis=1)
+    name_similarity[signatures[a, 0] == np.iinfo(np.uint64).max] = 0.0
+
+    doc = pd.to_numeric(documents, errors='coerce').to_numpy(dtype=float)
+    document_distance = np.abs(doc[a] - doc[b])
+    document_close = np.nan_to_num(document_distance <= 1, nan=0).astype(float)
+
+    score = (weights['email'] * email_match + weights['phone'] * phone_match
+             + weights['name'] * name_similarity + weights['document'] * document_close)
+
+    return pd.DataFrame({
+        'row_a': a,
+        'row_b': b,
+        'email_match': email_match,
+        'phone_match': phone_match,
+        'name_similarity': name_similarity,
+        'document_distance': document_distance,
+        'score': score,
+    })
+
+
+def cluster_rows(n, pairs):
+    """
+    Union-find over matched pairs; returns a cluster id per row
+    (the smallest row index of its cluster).
+    """
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return np.array([find(x) for x in range(n)])
+
+
+def find_duplicates(data, threshold=THRESHOLD, max_block_size=MAX_BLOCK_SIZE, weights=WEIGHTS):
+    """
+    Detect near-duplicate users in a DataFrame with name, last_name, email,
+    phone and document_id columns.
+
+    Returns (matches, clusters): the scored pairs above the threshold (row
+    positions plus the original index labels) and a Series with the cluster id
+    of every row.
+    """
+    emails = normalize_emails(data['email'] if 'email' in data else pd.Series('', index=data.index))
+    phones = normalize_phones(data['phone'] if 'phone' in data else pd.Series('', index=data.index))
+    documents = data['document_id'] if 'document_id' in data else pd.Series(np.nan, index=data.index)
+
+    signatures = minhash_signatures(full_names(data).to_numpy(dtype=object))
+    pairs, skipped = candidate_pairs(emails, phones, signatures, max_block_size)
+    scored = score_pairs(pairs, emails, phones, signatures, documents, weights)
+    matches = scored[scored['score'] >= threshold].reset_index(drop=True)
+    matches.insert(0, 'index_b', data.index[matches['row_b']])
+    matches.insert(0, 'index_a', data.index[matches['row_a']])
+
+    clusters = pd.Series(
+        cluster_rows(len(data), matches[['row_a', 'row_b']].to_numpy()),
+        index=data.index, name='duplicate_cluster'
+    )
+    matches.attrs.update({'candidate_pairs': len(pairs), 'skipped_blocks': skipped})
+    return matches, clusters
+
+
+def deduplicate(data, **options):
+    """
+    Keep the first row of every duplicate cluster.
+    """
+    _, clusters = find_duplicates(data, **options)
+    return data[~clusters.duplicated()]
+
+
+def parse_args():
+    """
+    Parse command line options for the duplicate detection.
+    """
+    parser = argparse.ArgumentParser(description='Near-duplicate user detection with blocking and MinHash/LSH')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--max-block-size', type=int, default=MAX_BLOCK_SIZE)
+    parser.add_argument('--pairs', default=None, help='Write the matched pairs to CSV')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Write the deduplicated rows to Parquet')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        columns = ['name', 'last_name', 'document_id', 'email', 'phone']
+        if args.input.lower().endswith('.parquet'):
+            data = pd.read_parquet(args.input)
+        else:
+            data = pd.read_csv(args.input, dtype={col: str for col in columns})
+
+        matches, clusters = find_duplicates(data, args.threshold, args.max_block_size)
+        duplicates = int(clusters.duplicated().sum())
+
+        print(f"✓ Rows: {len(data):,}")
+        print(f"✓ Candidate pairs scored: {matches.attrs['candidate_pairs']:,}")
+        print(f"✓ Oversized blocks skipped: {matches.attrs['skipped_blocks']:,}")
+        print(f"✓ Matched pairs: {len(matches):,}")
+        print(f"✓ Duplicate rows: {duplicates:,}")
+
+        if args.pairs:
+            matches.to_csv(args.pairs, index=False)
+            print(f"✅ Pairs written to: {args.pairs}")
+        if args.output:
+            data[~clusters.duplicated()].to_parquet(args.output, index=False, compression='zstd')
+            print(f"✅ Deduplicated data written to: {args.output}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
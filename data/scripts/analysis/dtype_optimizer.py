@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Automatic dtype Optimizer - Student Payment BI Export
+Loads an export and shrinks it in memory: each column's cardinality and numeric
+range is profiled once, low-cardinality text becomes categorical, numbers are
+downcast to the smallest exact type and text can optionally use Arrow strings.
+
+The chosen schema is cached next to the export (<export>.schema.json), so later
+loads pass it straight to the reader and skip the profiling load. The cache is
+tied to the file's size and modification time, and cached narrow numeric types
+are range-checked after the read, so a re-export never wraps values silently.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+DEFAULT_CONFIG = {
+    # Text columns become categorical when they have at most this many distinct
+    # values and distinct/non-null stays under the ratio
+    'category_max_unique': 1000,
+    'category_max_ratio': 0.5,
+    # Always categorical (when under category_max_unique), whatever the ratio
+    'category_columns': [
+        r'^payment_method_\d+_\d+$',
+        r'^concept_\d+_\d+$',
+        r'^state_\d+$',
+        r'^registration_state(_\d+)?$',
+        r'^student_state$',
+        r'^headquarter_name$',
+        r'^type_document_id$',
+    ],
+    # Identifier-like columns kept as text even when every value is numeric
+    'text_columns': [r'^document_id$', r'^phone$', r'^receipt_number_\d+_\d+$'],
+    # Store text as Arrow-backed strings ('string[pyarrow]')
+    'arrow_strings': False,
+}
+
+# Signed integer types tried in order
+INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# Integers up to 2**24 are exact in float32 (used for integral columns with nulls)
+FLOAT32_EXACT_INT = 2 ** 24
+
+SCHEMA_VERSION = 2
+
+
+def matches(column, patterns):
+    """
+    True if the column name matches any regex in patterns.
+    """
+    return any(re.match(pattern, column) for pattern in patterns)
+
+
+def read_export(path, dtype=None):
+    """
+    Read a CSV (plain/.gz/.zst) or Parquet export, optionally with explicit dtypes.
+    """
+    if path.lower().endswith('.parquet'):
+        data = pd.read_parquet(path)
+        return apply_schema(data, dtype) if dtype else data
+    return pd.read_csv(path, dtype=dtype)
+
+
+def read_header(path):
+    """
+    Column names of an export without reading its rows.
+    """
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+# ---------------------------------------------------------------------------
+# Profiling and schema choice
+# ---------------------------------------------------------------------------
+
+def profile_columns(data, config=DEFAULT_CONFIG):
+    """
+    Per-column profile: original dtype, nulls, distinct values and, for numeric
+    columns, min/max and whether every value is integral.
+    """
+    profile = {}
+    for col in data.columns:
+        series = data[col]
+        entry = {
+            'dtype': str(series.dtype),
+            'nulls': int(series.isna().sum()),
+            'non_null': int(series.notna().sum()),
+            'unique': int(series.nunique(dropna=True)),
+            'numeric': bool(pd.api.types.is_numeric_dtype(series)
+                            and not pd.api.types.is_bool_dtype(series)),
+        }
+        if entry['numeric'] and entry['non_null']:
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            entry['min'] = float(values.min())
+            entry['max'] = float(values.max())
+            entry['integral'] = bool(np.all(np.mod(values, 1) == 0))
+            entry['float32_exact'] = bool(np.array_equal(
+                values.astype(np.float32).astype(np.float64), values
+            ))
+        profile[col] = entry
+    return profile
+
+
+def smallest_integer(low, high):
+    """
+    Smallest signed numpy integer type holding [low, high].
+    """
+    for candidate in INTEGER_TYPES:
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return np.dtype(candidate).name
+    return 'int64'
+
+
+def choose_dtype(column, entry, config=DEFAULT_CONFIG):
+    """
+    Target dtype for one profiled column (None keeps the reader's default).
+    """
+    string_dtype = 'string[pyarrow]' if config['arrow_strings'] else None
+
+    if matches(column, config['text_columns']):
+        return string_dtype or 'str'
+
+    if entry['numeric']:
+        if not entry['non_null']:
+            return 'float32'
+        if entry['integral'] and entry['nulls'] == 0:
+            return smallest_integer(entry['min'], entry['max'])
+        # NaN must survive, so integral columns with nulls stay float
+        if entry['integral'] and max(abs(entry['min']), abs(entry['max'])) <= FLOAT32_EXACT_INT:
+            return 'float32'
+        if entry.get('float32_exact'):
+            return 'float32'
+        return 'float64'
+
+    if entry['dtype'] in ('bool', 'boolean'):
+        return None
+
+    if entry['unique'] <= config['category_max_unique']:
+        ratio = entry['unique'] / entry['non_null'] if entry['non_null'] else 0.0
+        if matches(column, config['category_columns']) or ratio <= config['category_max_ratio']:
+            return 'category'
+
+    return string_dtype
+
+
+def choose_schema(profile, config=DEFAULT_CONFIG):
+    """
+    Map of column -> dtype for every column whose type should change.
+    """
+    schema = {}
+    for col, entry in profile.items():
+        dtype = choose_dtype(col, entry, config)
+        if dtype is not None:
+            schema[col] = dtype
+    return schema
+
+
+def apply_schema(data, schema):
+    """
+    Cast an already loaded DataFrame to the chosen schema.
+    """
+    casts = {col: dtype for col, dtype in schema.items() if col in data.columns}
+    return data.astype(casts) if casts else data
+
+
+def widen_schema(schema):
+    """
+    Schema to read with before the range check: narrow integers as int64 and
+    float32 as float64, so out-of-range values are not wrapped or rounded by the reader.
+    """
+    wide = {}
+    for col, dtype in schema.items():
+        if dtype in ('int8', 'int16', 'int32'):
+            wide[col] = 'int64'
+        elif dtype == 'float32':
+            wide[col] = 'float64'
+        else:
+            wide[col] = dtype
+    return wide
+
+
+def check_ranges(data, schema):
+    """
+    Raise OverflowError if a column no longer fits its narrow schema type:
+    integers outside the type's min/max, or floats not exact in float32.
+    """
+    for col, dtype in schema.items():
+        if col not in data.columns or dtype not in ('int8', 'int16', 'int32', 'float32'):
+            continue
+        values = data[col].to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            continue
+        if dtype == 'float32':
+            if not np.array_equal(values.astype(np.float32).astype(np.float64), values):
+                raise OverflowError(f"{col}: values are not exact in float32")
+            continue
+        info = np.iinfo(dtype)
+        low, high = values.min(), values.max()
+        if low < info.min or high > info.max:
+            raise OverflowError(f"{col}: range [{low:g}, {high:g}] does not fit {dtype}")
+
+
+# ---------------------------------------------------------------------------
+# Schema cache
+# ---------------------------------------------------------------------------
+
+def schema_cache_path(path):
+    """
+    Sidecar file holding the cached schema of an export.
+    """
+    return path + '.schema.json'
+
+
+def source_signature(path):
+    """
+    Size and modification time of the export; a re-export to the same path changes them.
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def config_fingerprint(path, columns, config=DEFAULT_CONFIG):
+    """
+    Hash of the export's size/mtime, the header and the options that influence
+    the schema; a cached schema is only reused when it matches.
+    """
+    payload = json.dumps({'source': source_signature(path), 'columns': list(columns),
+                          'config': config, 'version': SCHEMA_VERSION},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_cached_schema(path, columns, config=DEFAULT_CONFIG):
+    """
+    Cached schema entry for this export, or None if missing or stale.
+    """
+    cache_path = schema_cache_path(path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as fh:
+            cached = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if cached.get('fingerprint') != config_fingerprint(path, columns, config):
+        return None
+    return cached
+
+
+def save_schema(path, columns, schema, before_bytes, config=DEFAULT_CONFIG):
+    """
+    Store the chosen schema (plus the unoptimized memory size for reports).
+    """
+    cached = {
+        'fingerprint': config_fingerprint(path, columns, config),
+        'columns': list(columns),
+        'schema': schema,
+        'before_bytes': before_bytes,
+    }
+    with open(schema_cache_path(path), 'w', encoding='utf-8') as fh:
+        json.dump(cached, fh, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# Loading and reporting
+# ---------------------------------------------------------------------------
+
+def memory_report(before, after):
+    """
+    Per-column memory before/after (bytes, deep) as a DataFrame; `before` may be
+    a DataFrame or a precomputed {column: bytes} mapping.
+    """
+    before_bytes = before if isinstance(before, dict) else before.memory_usage(deep=True, index=False).to_dict()
+    after_bytes = after.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        'before_dtype': None,
+        'after_dtype': after.dtypes.astype(str),
+        'before_bytes': pd.Series(before_bytes, dtype='float64'),
+        'after_bytes': after_bytes.astype('float64'),
+    })
+    if not isinstance(before, dict):
+        report['before_dtype'] = before.dtypes.astype(str)
+    report['saved_pct'] = (1 - report['after_bytes'] / report['before_bytes']) * 100
+    return report.sort_values('before_bytes', ascending=False)
+
+
+def print_memory_report(report, top=15):
+    """
+    Print the largest columns and the before/after totals.
+    """
+    before, after = report['before_bytes'].sum(), report['after_bytes'].sum()
+    columns = [col for col in ('before_dtype', 'after_dtype', 'before_bytes', 'after_bytes', 'saved_pct')
+               if report[col].notna().any()]
+    print(report[columns].head(top).to_string(float_format=lambda v: f"{v:,.1f}"))
+    print(f"\n📊 Memory: {before / 1024 ** 2:,.2f} MB -> {after / 1024 ** 2:,.2f} MB "
+          f"({(1 - after / before) * 100 if before else 0:.1f}% saved)")
+
+
+def load_optimized(path, config=DEFAULT_CONFIG, cache=True, refresh=False, report=True):
+    """
+    Load an export with optimized dtypes.
+
+    First load: read with default inference, profile, choose and cache the schema.
+    Later loads (same file size and mtime): read directly with the cached dtypes
+    (no profiling, lower peak memory). Narrow numeric columns are read wide and
+    range-checked before the cast; if the cached schema no longer fits the data
+    (e.g. a value overflows an integer type) the export is profiled again.
+    """
+    columns = read_header(path)
+    cached = None if refresh or not cache else load_cached_schema(path, columns, config)
+
+    if cached is not None:
+        try:
+            data = read_export(path, dtype=widen_schema(cached['schema']))
+            check_ranges(data, cached['schema'])
+            data = apply_schema(data, cached['schema'])
+            if report:
+                print(f"✓ Schema loaded from cache: {schema_cache_path(path)}")
+                print_memory_report(memory_report(cached['before_bytes'], data))
+            return data
+        except (ValueError, TypeError, OverflowError) as e:
+            print(f"⚠️  Cached schema does not fit the data ({e}); profiling again")
+
+    raw = read_export(path)
+    schema = choose_schema(profile_columns(raw, config), config)
+    data = apply_schema(raw, schema)
+
+    if report:
+        print_memory_report(memory_report(raw, data))
+    if cache:
+        before_bytes = {col: int(v) for col, v in raw.memory_usage(deep=True, index=False).items()}
+        save_schema(path, columns, schema, before_bytes, config)
+    return data
+
+
+def parse_args():
+    """
+    Parse command line options for the dtype optimizer.
+    """
+    parser = argparse.ArgumentParser(description='Load a BI export with optimized dtypes')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--arrow-strings', action='store_true',
+                        help='Store text columns as Arrow-backed strings')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore the cached schema and profile again')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the schema cache')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Optionally write the optimized data to Parquet')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    config = dict(DEFAULT_CONFIG)
+    config['arrow_strings'] = args.arrow_strings
+
+    try:
+        data = load_optimized(args.input, config, cache=not args.no_cache, refresh=args.refresh)
+        print(f"✓ Rows: {len(data):,}, columns: {len(data.columns)}")
+        if args.output:
+            data.to_parquet(args.output, index=False, compression='zstd')
+            print(f"✅ Optimized data written to: {args.output}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
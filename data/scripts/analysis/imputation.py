@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Grouped Imputation Engine - Student Payment BI Export
+Replaces the notebook's one-column-at-a-time SimpleImputer fits. Columns are
+grouped into families by name pattern (amount_{r}_{p}, payment_method_{r}_{p},
+state_{r}) and every family is fitted and transformed in one vectorized pass
+over its block of columns.
+
+Fitted statistics can be saved to JSON and reused to transform later exports,
+so new data is imputed with the same values the model was trained with.
+"""
+
+import argparse
+import json
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+# family name -> (column regex, strategy, fill_value, scope)
+# strategy: median | mean | most_frequent | constant
+# scope: 'column' fits one statistic per column, 'family' one for the whole family
+DEFAULT_FAMILIES = {
+    'amount': (r'^amount_\d+_\d+$', 'median', None, 'column'),
+    'payment_method': (r'^payment_method_\d+_\d+$', 'most_frequent', None, 'column'),
+    'state': (r'^state_\d+$', 'constant', 'S', 'column'),
+}
+
+NUMERIC_STRATEGIES = ('median', 'mean')
+
+
+class FamilyImputer:
+    """
+    SimpleImputer-style fit/transform over column families.
+    """
+
+    def __init__(self, families=None):
+        self.families = dict(DEFAULT_FAMILIES if families is None else families)
+        self.statistics_ = {}
+        self.columns_ = {}
+
+    def family_columns(self, columns):
+        """
+        Assign columns to families (first matching family wins).
+        """
+        assigned = {family: [] for family in self.families}
+        for col in columns:
+            for family, (pattern, _, _, _) in self.families.items():
+                if re.match(pattern, col):
+                    assigned[family].append(col)
+                    break
+        return {family: cols for family, cols in assigned.items() if cols}
+
+    def fit(self, data):
+        """
+        Fit one statistic per column (or per family) for every family present.
+        """
+        self.statistics_ = {}
+        self.columns_ = self.family_columns(data.columns)
+
+        for family, columns in self.columns_.items():
+            _, strategy, fill_value, scope = self.families[family]
+            block = data[columns]
+
+            if strategy in NUMERIC_STRATEGIES:
+                values = fit_numeric(block, strategy, scope)
+            elif strategy == 'most_frequent':
+                values = fit_most_frequent(block, scope)
+            elif strategy == 'constant':
+                values = {col: fill_value for col in columns}
+            else:
+                raise ValueError(f"Unknown strategy '{strategy}' for family '{family}'")
+
+            self.statistics_[family] = values
+        return self
+
+    def transform(self, data):
+        """
+        Fill missing values with the fitted statistics. Columns of a fitted family
+        that were not seen during fit use the family-wide value.
+        """
+        if not self.statistics_:
+            raise ValueError("FamilyImputer is not fitted; call fit() or load() first")
+
+        data = data.copy()
+        for family, columns in self.family_columns(data.columns).items():
+            if family not in self.statistics_:
+                continue
+            fitted = self.statistics_[family]
+            fallback = family_fallback(fitted)
+            fills = {col: fitted.get(col, fallback) for col in columns}
+            fills = {col: value for col, value in fills.items() if not is_missing(value)}
+            if not fills:
+                continue
+
+            _, strategy, _, _ = self.families[family]
+            if strategy in NUMERIC_STRATEGIES:
+                # One np.where over the whole family block
+                cols = list(fills)
+                block = data[cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+                values = np.array([fills[col] for col in cols], dtype=float)
+                # Keep downcast float dtypes (e.g. float32 from dtype_optimizer)
+                dtypes = {col: data[col].dtype for col in cols if pd.api.types.is_float_dtype(data[col])}
+                data[cols] = np.where(np.isnan(block), values, block)
+                data = data.astype(dtypes)
+            else:
+                for col, value in fills.items():
+                    if isinstance(data[col].dtype, pd.CategoricalDtype) \
+                            and value not in data[col].cat.categories:
+                        data[col] = data[col].cat.add_categories([value])
+                data = data.fillna(value=fills)
+        return data
+
+    def fit_transform(self, data):
+        return self.fit(data).transform(data)
+
+    def save(self, path):
+        """
+        Store families and fitted statistics as JSON.
+        """
+        state = {
+            'families': {family: list(spec) for family, spec in self.families.items()},
+            'columns': self.columns_,
+            'statistics': self.statistics_,
+        }
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(state, fh, indent=2, default=to_json)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Rebuild a fitted imputer from save().
+        """
+        with open(path, 'r', encoding='utf-8') as fh:
+            state = json.load(fh)
+        imputer = cls({family: tuple(spec) for family, spec in state['families'].items()})
+        imputer.columns_ = state['columns']
+        imputer.statistics_ = state['statistics']
+        return imputer
+
+
+def fit_numeric(block, strategy, scope):
+    """
+    Median/mean of every column of a numeric block in one matrix reduction.
+    """
+    X = block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    reduce = np.nanmedian if strategy == 'median' else np.nanmean
+
+    if scope == 'family':
+        value = float(reduce(X)) if np.isfinite(X).any() else None
+        return {col: value for col in block.columns}
+
+    present = ~np.isnan(X).all(axis=0)
+    result = np.full(X.shape[1], np.nan)
+    if present.any():
+        result[present] = reduce(X[:, present], axis=0)
+    return {col: (float(v) if not np.isnan(v) else None) for col, v in zip(block.columns, result)}
+
+
+def fit_most_frequent(block, scope):
+    """
+    Mode of every column (or of the whole family) from one stacked value count.
+    Ties resolve to the smallest value, as in SimpleImputer.
+    """
+    stacked = block.astype(object).stack()
+    if stacked.empty:
+        return {col: None for col in block.columns}
+
+    if scope == 'family':
+        counts = stacked.value_counts()
+        top = counts[counts == counts.max()].index
+        value = sorted(top, key=str)[0]
+        return {col: value for col in block.columns}
+
+    counts = stacked.groupby([stacked.index.get_level_values(-1), stacked.values]).size()
+    counts = counts.rename('n').reset_index()
+    counts.columns = ['column', 'value', 'n']
+    counts['key'] = counts['value'].astype(str)
+    modes = counts.sort_values(['column', 'n', 'key'], ascending=[True, False, True]) \
+                  .drop_duplicates('column').set_index('column')['value']
+    return {col: modes.get(col) for col in block.columns}
+
+
+def family_fallback(fitted):
+    """
+    Family-wide value for unseen columns: the most common fitted value.
+    """
+    values = [v for v in fitted.values() if not is_missing(v)]
+    if not values:
+        return None
+    if all(isinstance(v, (int, float)) for v in values):
+        return float(np.median(values))
+    return pd.Series(values, dtype=object).value_counts().index[0]
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def to_json(value):
+    """
+    JSON encoder for numpy scalars in the fitted statistics.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def parse_args():
+    """
+    Parse command line options for the imputation engine.
+    """
+    parser = argparse.ArgumentParser(description='Fit and apply grouped imputation to a BI export')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--fit', default=None, metavar='STATS_JSON',
+                        help='Fit on the input and save the statistics here')
+    parser.add_argument('--apply', default=None, metavar='STATS_JSON',
+                        help='Reuse statistics saved by --fit instead of fitting')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Write the imputed data to Parquet')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.input.lower().endswith('.parquet'):
+            data = pd.read_parquet(args.input)
+        else:
+            data = pd.read_csv(args.input)
+
+        if args.apply:
+            imputer = FamilyImputer.load(args.apply)
+            print(f"✓ Statistics loaded from: {args.apply}")
+        else:
+            imputer = FamilyImputer().fit(data)
+            if args.fit:
+                imputer.save(args.fit)
+                print(f"✓ Statistics saved to: {args.fit}")
+
+        before = int(data.isna().sum().sum())
+        imputed = imputer.transform(data)
+        after = int(imputed.isna().sum().sum())
+
+        for family, columns in imputer.columns_.items():
+            print(f"✓ {family:15}: {len(columns):>4} columns ({imputer.families[family][1]})")
+        print(f"✓ Missing values: {before:,} -> {after:,}")
+
+        if args.output:
+            imputed.to_parquet(args.output, index=False, compression='zstd')
+            print(f"✅ Imputed data written to: {args.output}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Vectorized Outlier Engine - Student Payment BI Export
+Computes the IQR and 3σ outlier rules from ClearData.ipynb for every numeric
+column at once: quartiles, mean and std come from single matrix operations over
+the whole numeric block, and the per-column masks are kept bit-packed.
+
+For data that does not fit in memory, StreamingOutlierSketch keeps a t-digest
+style centroid summary per column and estimates the same fences and counts in
+one pass over the chunks.
+"""
+
+import argparse
+import os
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dtype_optimizer import DEFAULT_CONFIG, matches
+
+IQR_FACTOR = 1.5
+SIGMA_FACTOR = 3.0
+
+# t-digest compression: larger keeps more centroids (more accurate tails)
+DEFAULT_COMPRESSION = 200
+
+# Values buffered per column before merging them into the digest
+DIGEST_BUFFER = 50000
+
+# Numeric-looking identifiers (document_id, phone, receipt numbers) are not measures
+IDENTIFIER_COLUMNS = DEFAULT_CONFIG['text_columns']
+
+
+def numeric_columns(data):
+    """
+    Columns summarized by the outlier and plot reports, in both the in-memory and
+    the streaming paths: numeric, non-boolean columns that are not identifiers.
+    Text columns (iter_chunks reads CSV as str) count as numeric when every
+    non-null value parses as a number, which is how read_csv infers them.
+    """
+    columns = []
+    for col in data.columns:
+        if matches(col, IDENTIFIER_COLUMNS):
+            continue
+        series = data[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            columns.append(col)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            values = series.dropna()
+            if pd.to_numeric(values, errors='coerce').notna().all():
+                columns.append(col)
+    return columns
+
+
+class OutlierReport:
+    """
+    Result of outlier_report(): a per-column summary DataFrame plus bit-packed
+    masks (one bit per row and column) for both rules.
+    """
+
+    def __init__(self, summary, iqr_bits, sigma_bits, index):
+        self.summary = summary
+        self._bits = {'iqr': iqr_bits, 'sigma': sigma_bits}
+        self._index = index
+
+    def mask(self, column, method='iqr'):
+        """
+        Boolean Series marking the outliers of one column.
+        """
+        position = self.summary.index.get_loc(column)
+        bits = np.unpackbits(self._bits[method][:, position], count=len(self._index))
+        return pd.Series(bits.astype(bool), index=self._index, name=column)
+
+    def masks(self, method='iqr'):
+        """
+        Boolean DataFrame with the masks of every column.
+        """
+        bits = np.unpackbits(self._bits[method], axis=0, count=len(self._index))
+        return pd.DataFrame(bits.astype(bool), index=self._index, columns=self.summary.index)
+
+    def outliers(self, data, column, method='iqr'):
+        """
+        Outlier values of a column (what the notebook stored in outliers[col]).
+        """
+        return data.loc[self.mask(column, method).to_numpy(), column]
+
+
+def outlier_report(data, columns=None, iqr_factor=IQR_FACTOR, sigma_factor=SIGMA_FACTOR):
+    """
+    IQR and 3σ outliers for all numeric columns in one pass over a float matrix.
+    Columns default to numeric_columns(data). NaNs are ignored (the notebook's
+    np.percentile returned NaN for columns with nulls).
+    """
+    if columns is None:
+        columns = numeric_columns(data)
+    columns = list(columns)
+    X = data[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    # All-NaN columns simply yield NaN statistics
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, q3 = np.nanquantile(X, [0.25, 0.75], axis=0)
+        mean = np.nanmean(X, axis=0)
+        std = np.nanstd(X, axis=0, ddof=1)
+
+    iqr = q3 - q1
+    iqr_low, iqr_high = q1 - iqr_factor * iqr, q3 + iqr_factor * iqr
+    sigma_low, sigma_high = mean - sigma_factor * std, mean + sigma_factor * std
+
+    # NaN comparisons are False, so missing values are never outliers
+    iqr_mask = (X < iqr_low) | (X > iqr_high)
+    sigma_mask = (X < sigma_low) | (X > sigma_high)
+
+    summary = pd.DataFrame({
+        'count': (~np.isnan(X)).sum(axis=0),
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'iqr_lower': iqr_low,
+        'iqr_upper': iqr_high,
+        'iqr_outliers': iqr_mask.sum(axis=0),
+        'mean': mean,
+        'std': std,
+        'sigma_lower': sigma_low,
+        'sigma_upper': sigma_high,
+        'sigma_outliers': sigma_mask.sum(axis=0),
+    }, index=pd.Index(columns, name='column'))
+
+    return OutlierReport(
+        summary,
+        np.packbits(iqr_mask, axis=0),
+        np.packbits(sigma_mask, axis=0),
+        data.index
+    )
+
+
+# ---------------------------------------------------------------------------
+# Streaming (approximate) variant
+# ---------------------------------------------------------------------------
+
+class MergingDigest:
+    """
+    Minimal merging t-digest: centroids (mean, weight) whose maximum size
+    shrinks towards the tails, so extreme quantiles stay accurate.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.buffer = []
+        self.buffered = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values):
+        """
+        Add a 1-D array of values (NaNs are ignored).
+        """
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.buffer.append(values)
+        self.buffered += len(values)
+        if self.buffered >= DIGEST_BUFFER:
+            self._merge()
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        values = np.concatenate(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+
+        # k1 scale function: centroids are the runs of values sharing the same
+        # integer k(q), which keeps tail centroids small; merged with reduceat
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+        starts = np.flatnonzero(np.diff(k, prepend=k[0] - 1))
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+
+        self.means = merged_means
+        self.weights = merged_weights
+
+    @property
+    def count(self):
+        """
+        Number of values added so far.
+        """
+        self._merge()
+        return float(self.weights.sum())
+
+    def quantile(self, q):
+        """
+        Estimated value at quantile q.
+        """
+        self._merge()
+        if not len(self.means):
+            return float('nan')
+        centers = np.cumsum(self.weights) - self.weights / 2
+        points = np.concatenate([[0.0], centers, [self.weights.sum()]])
+        values = np.concatenate([[self.minimum], self.means, [self.maximum]])
+        return float(np.interp(q * self.weights.sum(), points, values))
+
+    def cdf(self, x):
+        """
+        Estimated fraction of values below x.
+        """
+        self._merge()
+        if not len(self.means):
+            return float('nan')
+        if x <= self.minimum:
+            return 0.0
+        if x >= self.maximum:
+            return 1.0
+        centers = np.cumsum(self.weights) - self.weights / 2
+        points = np.concatenate([[0.0], centers, [self.weights.sum()]])
+        values = np.concatenate([[self.minimum], self.means, [self.maximum]])
+        return float(np.interp(x, values, points) / self.weights.sum())
+
+
+class StreamingOutlierSketch:
+    """
+    One-pass approximate outlier report over DataFrame chunks.
+    Keeps a MergingDigest plus running mean/variance per numeric column.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.digests = {}
+        self.moments = {}
+        self.rejected = set()
+
+    def update(self, chunk, columns=None):
+        """
+        Add a chunk. Columns default to numeric_columns() of the chunk; a column
+        with non-numeric values in any chunk is dropped from the sketch, as it
+        would not be numeric in the fully loaded export either.
+        """
+        if columns is None:
+            candidates = chunk.drop(columns=[col for col in chunk.columns if col in self.rejected])
+            columns = numeric_columns(candidates)
+            for col in candidates.columns:
+                if col not in columns and not matches(col, IDENTIFIER_COLUMNS):
+                    self.rejected.add(col)
+                    self.digests.pop(col, None)
+                    self.moments.pop(col, None)
+        columns = list(columns)
+        X = chunk[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+        for i, col in enumerate(columns):
+            digest = self.digests.setdefault(col, MergingDigest(self.compression))
+            digest.update(X[:, i])
+
+            values = X[:, i][~np.isnan(X[:, i])]
+            if not len(values):
+                continue
+            count, mean, m2 = self.moments.get(col, (0, 0.0, 0.0))
+            chunk_count, chunk_mean = len(values), float(values.mean())
+            chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+            total = count + chunk_count
+            delta = chunk_mean - mean
+            self.moments[col] = (
+                total,
+                mean + delta * chunk_count / total,
+                m2 + chunk_m2 + delta ** 2 * count * chunk_count / total
+            )
+
+    def report(self, iqr_factor=IQR_FACTOR, sigma_factor=SIGMA_FACTOR):
+        """
+        Per-column summary with the same columns as outlier_report().summary;
+        outlier counts are estimated from the digest CDF.
+        """
+        rows = []
+        for col, digest in self.digests.items():
+            count, mean, m2 = self.moments.get(col, (0, float('nan'), 0.0))
+            std = float(np.sqrt(m2 / (count - 1))) if count > 1 else float('nan')
+            q1, q3 = digest.quantile(0.25), digest.quantile(0.75)
+            iqr = q3 - q1
+            iqr_low, iqr_high = q1 - iqr_factor * iqr, q3 + iqr_factor * iqr
+            sigma_low, sigma_high = mean - sigma_factor * std, mean + sigma_factor * std
+            rows.append({
+                'column': col,
+                'count': count,
+                'q1': q1,
+                'q3': q3,
+                'iqr': iqr,
+                'iqr_lower': iqr_low,
+                'iqr_upper': iqr_high,
+                'iqr_outliers': round(count * (digest.cdf(iqr_low) + 1 - digest.cdf(iqr_high))) if count else 0,
+                'mean': mean,
+                'std': std,
+                'sigma_lower': sigma_low,
+                'sigma_upper': sigma_high,
+                'sigma_outliers': round(count * (digest.cdf(sigma_low) + 1 - digest.cdf(sigma_high))) if count else 0,
+            })
+        return pd.DataFrame(rows).set_index('column')
+
+
+def parse_args():
+    """
+    Parse command line options for the outlier report.
+    """
+    parser = argparse.ArgumentParser(description='IQR and 3σ outlier report for every numeric column')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Approximate one-pass report for files larger than memory')
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.streaming:
+            from clean_pipeline import iter_chunks
+
+            sketch = StreamingOutlierSketch()
+            for chunk in iter_chunks(args.input, args.chunk_rows):
+                sketch.update(chunk)
+            summary = sketch.report()
+        else:
+            if args.input.lower().endswith('.parquet'):
+                data = pd.read_parquet(args.input)
+            else:
+                data = pd.read_csv(args.input)
+            summary = outlier_report(data).summary
+
+        pd.set_option('display.max_rows', None)
+        pd.set_option('display.width', None)
+        print(summary[['count', 'iqr_lower', 'iqr_upper', 'iqr_outliers',
+                       'sigma_lower', 'sigma_upper', 'sigma_outliers']])
+        print(f"\n✓ IQR outliers: {int(summary['iqr_outliers'].sum()):,}")
+        print(f"✓ 3σ outliers: {int(summary['sigma_outliers'].sum()):,}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
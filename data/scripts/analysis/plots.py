@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Batched Distribution Plots - Student Payment BI Export
+Replaces the notebook's one-figure-per-column boxplots and full-column
+histograms. Each column is reduced once to a small summary (quartiles,
+whiskers, a capped sample of fliers and fixed-bin histogram counts). Pages of
+small multiples are then drawn from those summaries, off-screen (Agg), by a
+pool of worker processes that write image files.
+
+The raw rows never reach matplotlib or the workers. Only the summaries (a few
+KB per column) are pickled to the pool.
+"""
+
+import argparse
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from outliers import StreamingOutlierSketch, numeric_columns
+
+# Columns per page and grid width
+PER_PAGE = 24
+NCOLS = 4
+
+# Fliers drawn per column (random subset, extremes always kept)
+MAX_FLIERS = 200
+
+HIST_BINS = 50
+IQR_FACTOR = 1.5
+
+
+def column_summaries(data, columns=None, bins=HIST_BINS, max_fliers=MAX_FLIERS, seed=0):
+    """
+    Plot summaries for numeric columns (numeric_columns() by default): boxplot
+    statistics (matplotlib bxp format), a downsampled set of fliers and
+    histogram counts. Quartiles are computed for all columns in one matrix operation.
+    """
+    if columns is None:
+        columns = numeric_columns(data)
+    columns = list(columns)
+    X = data[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, median, q3 = np.nanquantile(X, [0.25, 0.5, 0.75], axis=0)
+        mean = np.nanmean(X, axis=0)
+    low_fence = q1 - IQR_FACTOR * (q3 - q1)
+    high_fence = q3 + IQR_FACTOR * (q3 - q1)
+
+    rng = np.random.default_rng(seed)
+    summaries = []
+    for i, col in enumerate(columns):
+        values = X[:, i][~np.isnan(X[:, i])]
+        if not len(values):
+            continue
+        inside = values[(values >= low_fence[i]) & (values <= high_fence[i])]
+        fliers = values[(values < low_fence[i]) | (values > high_fence[i])]
+        summaries.append({
+            'label': col,
+            'count': int(len(values)),
+            'mean': float(mean[i]),
+            'q1': float(q1[i]),
+            'med': float(median[i]),
+            'q3': float(q3[i]),
+            'whislo': float(inside.min()) if len(inside) else float(q1[i]),
+            'whishi': float(inside.max()) if len(inside) else float(q3[i]),
+            'fliers': downsample(fliers, max_fliers, rng),
+            'flier_count': int(len(fliers)),
+            'hist': np.histogram(values, bins=bins),
+        })
+    return summaries
+
+
+def digest_summaries(sketch, bins=HIST_BINS):
+    """
+    Plot summaries from a StreamingOutlierSketch (outliers.py), for exports that
+    were never loaded in memory. Whiskers are the IQR fences clipped to the
+    observed range; histogram counts come from the digest CDF.
+    """
+    summaries = []
+    report = sketch.report()
+    for col, digest in sketch.digests.items():
+        if not digest.count:
+            continue
+        row = report.loc[col]
+        edges = np.linspace(digest.minimum, digest.maximum, bins + 1)
+        cdf = np.array([digest.cdf(edge) for edge in edges])
+        counts = np.diff(cdf) * digest.count
+        summaries.append({
+            'label': col,
+            'count': int(digest.count),
+            'mean': float(row['mean']),
+            'q1': float(row['q1']),
+            'med': digest.quantile(0.5),
+            'q3': float(row['q3']),
+            'whislo': max(float(row['iqr_lower']), digest.minimum),
+            'whishi': min(float(row['iqr_upper']), digest.maximum),
+            'fliers': np.empty(0),
+            'flier_count': int(row['iqr_outliers']),
+            'hist': (counts, edges),
+        })
+    return summaries
+
+
+def downsample(values, limit, rng):
+    """
+    At most `limit` values: the minimum and maximum plus a random subset.
+    """
+    if len(values) <= limit:
+        return values
+    extremes = [values.argmin(), values.argmax()]
+    rest = rng.choice(len(values), size=limit - 2, replace=False)
+    return values[np.unique(np.concatenate([extremes, rest]))]
+
+
+def render_page(summaries, kind, path, ncols=NCOLS, dpi=100):
+    """
+    Draw one page of small multiples to an image file (runs in a worker).
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    nrows = -(-len(summaries) // ncols)
+    height = 1.2 if kind == 'box' else 2.2
+    fig, axes = plt.subplots(nrows, ncols, figsize=(4 * ncols, height * nrows), squeeze=False)
+
+    for ax, summary in zip(axes.flat, summaries):
+        if kind == 'box':
+            ax.bxp([summary], orientation='horizontal', showmeans=True, showfliers=True,
+                   flierprops={'markersize': 2, 'alpha': 0.5})
+            ax.set_yticks([])
+        else:
+            counts, edges = summary['hist']
+            ax.stairs(counts, edges, fill=True, alpha=0.7)
+        ax.set_title(f"{summary['label']} (n={summary['count']:,}, outliers={summary['flier_count']:,})",
+                     fontsize=8)
+        ax.tick_params(labelsize=7)
+
+    for ax in list(axes.flat)[len(summaries):]:
+        ax.set_visible(False)
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path
+
+
+def render_pages(summaries, output_dir, kind='box', per_page=PER_PAGE, ncols=NCOLS,
+                 workers=None, fmt='png', dpi=100):
+    """
+    Split summaries into pages and render them in a process pool.
+    Returns the image paths in page order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pages = [summaries[i:i + per_page] for i in range(0, len(summaries), per_page)]
+    paths = [os.path.join(output_dir, f"{kind}_{number:03d}.{fmt}") for number in range(1, len(pages) + 1)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(render_page, page, kind, path, ncols, dpi)
+            for page, path in zip(pages, paths)
+        ]
+        return [future.result() for future in futures]
+
+
+def parse_args():
+    """
+    Parse command line options for the batched plots.
+    """
+    parser = argparse.ArgumentParser(description='Render per-column distribution plots to image files')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--kind', choices=['box', 'hist', 'both'], default='both')
+    parser.add_argument('--out-dir', default='plots')
+    parser.add_argument('--per-page', type=int, default=PER_PAGE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--streaming', action='store_true',
+                        help='Summarize in chunks with the t-digest sketch (no full load)')
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.streaming:
+            from clean_pipeline import iter_chunks
+
+            sketch = StreamingOutlierSketch()
+            for chunk in iter_chunks(args.input, args.chunk_rows):
+                sketch.update(chunk)
+            summaries = digest_summaries(sketch)
+        else:
+            if args.input.lower().endswith('.parquet'):
+                data = pd.read_parquet(args.input)
+            else:
+                data = pd.read_csv(args.input)
+            summaries = column_summaries(data)
+
+        print(f"✓ Summarized {len(summaries)} columns")
+        kinds = ['box', 'hist'] if args.kind == 'both' else [args.kind]
+        for kind in kinds:
+            paths = render_pages(summaries, args.out_dir, kind, args.per_page, workers=args.workers)
+            print(f"✅ {len(paths)} {kind} pages written to: {args.out_dir}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
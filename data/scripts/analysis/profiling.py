@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+One-Pass Data Profiler - Student Payment BI Export
+Replaces the notebook's separate info(), describe(), describe(include=['O']),
+isna() and isna().sum() scans with one pass that gathers, for every column:
+null counts, distinct counts (exact, or HyperLogLog past a limit), min/max,
+mean/std, quantiles (t-digest from outliers.py) and top-k values.
+
+Columns can be split into groups profiled in parallel processes. Reports are
+cached by dataset fingerprint (content hash for files, data hash for
+DataFrames), so reopening the notebook reads the report instead of the data.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from outliers import MergingDigest
+
+DEFAULT_OPTIONS = {
+    'chunk_rows': 50000,
+    # 'exact' keeps value sets up to exact_limit, then switches to HyperLogLog;
+    # 'hll' always uses HyperLogLog
+    'distinct': 'exact',
+    'exact_limit': 100000,
+    # HyperLogLog precision (2**p registers, ~1.04 / sqrt(2**p) relative error)
+    'hll_precision': 14,
+    'top_k': 10,
+    # Value counters are pruned to this many entries (heavy hitters survive)
+    'top_k_capacity': 10000,
+    'quantiles': (0.25, 0.5, 0.75),
+}
+
+REPORT_VERSION = 1
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over pandas-hashed values.
+    """
+
+    def __init__(self, precision=DEFAULT_OPTIONS['hll_precision']):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        """
+        Add 64-bit hashes (uint64 array).
+        """
+        if not len(hashes):
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes << np.uint64(p)
+        # rank = leading zeros of the remaining bits + 1
+        with np.errstate(divide='ignore'):
+            highest = np.floor(np.log2(rest.astype(np.float64)))
+        rank = np.where(rest == 0, 64 - p + 1, 64 - highest).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self):
+        """
+        Estimated number of distinct values (with small-range correction).
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnProfile:
+    """
+    Streaming accumulator for one column.
+    """
+
+    def __init__(self, name, options=DEFAULT_OPTIONS):
+        self.name = name
+        self.options = options
+        self.count = 0
+        self.nulls = 0
+        self.numeric = True
+        self.dtype = None
+        self.distinct_values = set() if options['distinct'] == 'exact' else None
+        self.hll = HyperLogLog(options['hll_precision']) if options['distinct'] == 'hll' else None
+        self.counts = {}
+        self.digest = MergingDigest()
+        self.moments = (0, 0.0, 0.0)
+        self.minimum = None
+        self.maximum = None
+        self.text_min = None
+        self.text_max = None
+
+    def update(self, series):
+        """
+        Add one chunk of the column.
+        """
+        if self.dtype is None:
+            self.dtype = str(series.dtype)
+        present = series.dropna()
+        self.count += len(series)
+        self.nulls += len(series) - len(present)
+        if not len(present):
+            return
+
+        self._update_distinct(present)
+        self._update_counts(present)
+
+        if pd.api.types.is_numeric_dtype(present) and not pd.api.types.is_bool_dtype(present):
+            if self.numeric:
+                self._update_numeric(present.to_numpy(dtype=float))
+            return
+
+        # Text (or CSV read as text): track text min/max, and numeric stats
+        # while every present value parses as a number
+        text = present.astype(str)
+        low, high = text.min(), text.max()
+        self.text_min = low if self.text_min is None else min(self.text_min, low)
+        self.text_max = high if self.text_max is None else max(self.text_max, high)
+        if self.numeric:
+            parsed = pd.to_numeric(present, errors='coerce')
+            if parsed.isna().any():
+                self.numeric = False
+                self.digest = None
+            else:
+                self._update_numeric(parsed.to_numpy(dtype=float))
+
+    def _update_distinct(self, present):
+        if self.distinct_values is not None:
+            self.distinct_values.update(present.unique().tolist())
+            if len(self.distinct_values) > self.options['exact_limit']:
+                # Too many values to keep: continue with HyperLogLog
+                self.hll = HyperLogLog(self.options['hll_precision'])
+                self.hll.update_hashes(pd.util.hash_array(
+                    np.array([str(v) for v in self.distinct_values], dtype=object)))
+                self.distinct_values = None
+        else:
+            self.hll.update_hashes(pd.util.hash_array(present.astype(str).to_numpy(dtype=object)))
+
+    def _update_counts(self, present):
+        for value, n in present.value_counts(sort=False).items():
+            self.counts[value] = self.counts.get(value, 0) + int(n)
+        capacity = self.options['top_k_capacity']
+        if len(self.counts) > capacity:
+            # Keep the heaviest half; frequent values survive the pruning
+            kept = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:capacity // 2]
+            self.counts = dict(kept)
+
+    def _update_numeric(self, values):
+        self.digest.update(values)
+        low, high = float(values.min()), float(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+        count, mean, m2 = self.moments
+        chunk_count, chunk_mean = len(values), float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = count + chunk_count
+        delta = chunk_mean - mean
+        self.moments = (total, mean + delta * chunk_count / total,
+                        m2 + chunk_m2 + delta ** 2 * count * chunk_count / total)
+
+    def result(self):
+        """
+        Profile of the column as a plain dict.
+        """
+        present = self.count - self.nulls
+        if self.distinct_values is not None:
+            distinct, method = len(self.distinct_values), 'exact'
+        else:
+            distinct, method = self.hll.count(), 'hll'
+
+        top = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:self.options['top_k']]
+        entry = {
+            'column': self.name,
+            'dtype': self.dtype,
+            'kind': 'numeric' if self.numeric and present else 'text',
+            'count': present,
+            'nulls': self.nulls,
+            'null_pct': 100.0 * self.nulls / self.count if self.count else 0.0,
+            'distinct': distinct,
+            'distinct_method': method,
+            'min': self.minimum if self.numeric else self.text_min,
+            'max': self.maximum if self.numeric else self.text_max,
+            'top': [[to_builtin(value), n] for value, n in top],
+        }
+        if entry['kind'] == 'numeric':
+            count, mean, m2 = self.moments
+            entry['mean'] = mean
+            entry['std'] = float(np.sqrt(m2 / (count - 1))) if count > 1 else float('nan')
+            for q in self.options['quantiles']:
+                entry[f'q{int(q * 100)}'] = self.digest.quantile(q)
+        return entry
+
+
+def to_builtin(value):
+    """
+    numpy scalars to Python values (JSON cache).
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# ---------------------------------------------------------------------------
+# Passes
+# ---------------------------------------------------------------------------
+
+def iter_source(source, columns, chunk_rows):
+    """
+    Chunks of the selected columns from a DataFrame or an export path.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows][columns]
+    else:
+        from clean_pipeline import iter_chunks
+
+        yield from iter_chunks(source, chunk_rows, columns=columns)
+
+
+def profile_columns(source, columns, options=DEFAULT_OPTIONS):
+    """
+    Single pass over `columns` of the source; returns (rows, column profiles).
+    """
+    accumulators = {col: ColumnProfile(col, options) for col in columns}
+    rows = 0
+    for chunk in iter_source(source, columns, options['chunk_rows']):
+        rows += len(chunk)
+        for col, accumulator in accumulators.items():
+            accumulator.update(chunk[col])
+    return rows, [accumulator.result() for accumulator in accumulators.values()]
+
+
+def source_columns(source):
+    """
+    Column names of a DataFrame or export path.
+    """
+    if isinstance(source, pd.DataFrame):
+        return list(source.columns)
+    from clean_pipeline import read_columns
+
+    return read_columns(source)
+
+
+def fingerprint(source, options=DEFAULT_OPTIONS):
+    """
+    Dataset fingerprint: content hash for files (via the dataset cache index,
+    so unchanged files are not re-read), data hash for DataFrames.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'options': options, 'version': REPORT_VERSION},
+                             sort_keys=True, default=str).encode('utf-8'))
+    if isinstance(source, pd.DataFrame):
+        digest.update(json.dumps([list(map(str, source.columns)),
+                                  list(map(str, source.dtypes))]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(source, index=True).to_numpy().tobytes())
+    else:
+        from dataset_cache import DEFAULT_CACHE_DIR, content_key, read_index, write_index
+
+        os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+        index = read_index(DEFAULT_CACHE_DIR)
+        digest.update(content_key(source, index).encode('utf-8'))
+        write_index(DEFAULT_CACHE_DIR, index)
+    return digest.hexdigest()
+
+
+def profile_dataset(source, options=None, workers=None, cache=True, cache_dir=None):
+    """
+    Profile every column of a DataFrame or export path in one pass.
+
+    workers > 1 splits the columns into groups profiled in parallel processes
+    (each reads only its own columns). The report is cached by fingerprint.
+    Returns the report dict; see to_frame() for a tabular view.
+    """
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    if cache:
+        from dataset_cache import DEFAULT_CACHE_DIR
+
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        key = fingerprint(source, options)
+        cache_path = os.path.join(cache_dir, f"profile-{key[:16]}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as fh:
+                report = json.load(fh)
+            report['cached'] = True
+            return report
+
+    columns = source_columns(source)
+    if workers and workers > 1 and len(columns) > 1:
+        groups = [list(group) for group in np.array_split(columns, min(workers, len(columns)))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(profile_columns, [source] * len(groups), groups,
+                                        [options] * len(groups)))
+        rows = results[0][0]
+        profiles = [entry for _, group_profiles in results for entry in group_profiles]
+    else:
+        rows, profiles = profile_columns(source, columns, options)
+
+    report = {
+        'source': source if isinstance(source, str) else 'DataFrame',
+        'rows': rows,
+        'columns': profiles,
+        'cached': False,
+    }
+    if cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, default=str)
+        os.replace(tmp, cache_path)
+    return report
+
+
+def to_frame(report):
+    """
+    Report as a DataFrame indexed by column (top values as a compact string).
+    """
+    frame = pd.DataFrame(report['columns']).set_index('column')
+    frame['top'] = frame['top'].map(lambda top: ', '.join(f"{value} ({n})" for value, n in top[:3]))
+    return frame
+
+
+def parse_args():
+    """
+    Parse command line options for the profiler.
+    """
+    parser = argparse.ArgumentParser(description='One-pass profiling report for a BI export')
+    parser.add_argument('input', help='Export file (.csv, .csv.gz, .csv.zst or .parquet)')
+    parser.add_argument('--distinct', choices=['exact', 'hll'], default=DEFAULT_OPTIONS['distinct'])
+    parser.add_argument('--top-k', type=int, default=DEFAULT_OPTIONS['top_k'])
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_OPTIONS['chunk_rows'])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Profile column groups in parallel processes')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--json', default=None, help='Also write the report to this JSON file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    options = {'distinct': args.distinct, 'top_k': args.top_k, 'chunk_rows': args.chunk_rows}
+
+    try:
+        report = profile_dataset(args.input, options, workers=args.workers, cache=not args.no_cache)
+        pd.set_option('display.max_rows', None)
+        pd.set_option('display.width', None)
+        frame = to_frame(report)
+        print(frame[[col for col in ('kind', 'count', 'nulls', 'distinct', 'min', 'max', 'mean', 'q50', 'top')
+                     if col in frame.columns]])
+        source = "cache" if report['cached'] else "one pass"
+        print(f"\n✓ {report['rows']:,} rows, {len(report['columns'])} columns ({source})")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2, default=str)
+            print(f"✅ Report written to: {args.json}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Cross-Backend Consistency Checker - PostgreSQL vs MongoDB
+Compares two exports (CSV, compressed CSV or Parquet) or the two source databases
+without loading either side into memory.
+
+Both sides are streamed once to build a Merkle tree of chunk hashes: every row
+is hashed and folded into a chunk picked by the hash of its key, so the result
+does not depend on the order in which each backend returns rows. The trees are
+compared top-down and only the chunks that differ are re-streamed and diffed
+row by row.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import re
+import sys
+from decimal import Decimal, InvalidOperation
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Leaves of the Merkle tree (chunks) and children per internal node
+DEFAULT_CHUNKS = 4096
+TREE_FANOUT = 16
+
+# Rows read per batch from files and database cursors
+DEFAULT_BATCH_ROWS = 10000
+
+# Key columns per comparison mode
+FILE_KEY_COLUMNS = ['document_id']
+SOURCE_KEY_COLUMNS = ['document_id', 'reg_number', 'payment_number']
+
+# Long-format columns compared between the source databases (ids differ per backend)
+SOURCE_COLUMNS = [
+    'name', 'last_name', 'type_document_id', 'document_id', 'email', 'phone',
+    'student_state', 'headquarter_name', 'reg_number', 'registration_state',
+    'payment_number', 'amount', 'payment_method', 'receipt_number', 'concept'
+]
+
+# Numeric-looking strings are canonicalized; leading zeros (phones) are left alone
+NUMERIC_PATTERN = re.compile(r'^-?(0|[1-9]\d*)(\.\d+)?$')
+
+# Mismatching rows kept per category in the report
+MAX_SAMPLES = 20
+
+
+def load_script_module(name, relative_path):
+    """
+    Import one of the repository scripts by path (they are not packages).
+    """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def normalize_value(value, precision=2):
+    """
+    Canonical string for a value so both backends hash identically:
+    nulls/NaN -> '', integral numbers -> '123', other numbers -> fixed precision.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and math.isnan(value):
+        return ''
+    if hasattr(value, 'to_decimal'):  # bson Decimal128
+        value = value.to_decimal()
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, str):
+        if not NUMERIC_PATTERN.match(value):
+            return value
+    elif not isinstance(value, (int, float, Decimal)):
+        return str(value)
+
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        return str(value)
+    if number == number.to_integral_value():
+        return str(int(number))
+    return f'{number:.{precision}f}'
+
+
+def stable_hash(text, size=16):
+    """
+    Deterministic digest (unlike hash(), not salted per process).
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=size).digest()
+
+
+class MerkleChunks:
+    """
+    Fixed number of chunks; each chunk folds its rows with an order-independent
+    sum of row digests, plus a row count.
+    """
+
+    MODULUS = 1 << 128
+
+    def __init__(self, chunks=DEFAULT_CHUNKS):
+        self.chunks = chunks
+        self.sums = [0] * chunks
+        self.counts = [0] * chunks
+
+    def chunk_of(self, key):
+        """
+        Chunk index for a key.
+        """
+        return int.from_bytes(stable_hash(key, 8), 'big') % self.chunks
+
+    def add(self, key, row_digest):
+        """
+        Fold a row digest into the chunk of its key.
+        """
+        chunk = self.chunk_of(key)
+        self.sums[chunk] = (self.sums[chunk] + int.from_bytes(row_digest, 'big')) % self.MODULUS
+        self.counts[chunk] += 1
+
+    def levels(self):
+        """
+        Tree levels from the leaves up to the root (last level has one node).
+        """
+        level = [
+            stable_hash(f'{self.counts[i]}:{self.sums[i]}')
+            for i in range(self.chunks)
+        ]
+        levels = [level]
+        while len(level) > 1:
+            level = [
+                hashlib.blake2b(b''.join(level[i:i + TREE_FANOUT]), digest_size=16).digest()
+                for i in range(0, len(level), TREE_FANOUT)
+            ]
+            levels.append(level)
+        return levels
+
+
+def differing_chunks(left_levels, right_levels):
+    """
+    Walk both trees from the root, descending only into differing nodes.
+    Returns (differing leaf indices, number of node comparisons).
+    """
+    comparisons = 0
+    frontier = [0]
+    for depth in range(len(left_levels) - 1, -1, -1):
+        next_frontier = []
+        for node in frontier:
+            comparisons += 1
+            if left_levels[depth][node] == right_levels[depth][node]:
+                continue
+            if depth == 0:
+                next_frontier.append(node)
+            else:
+                first_child = node * TREE_FANOUT
+                last_child = min(first_child + TREE_FANOUT, len(left_levels[depth - 1]))
+                next_frontier.extend(range(first_child, last_child))
+        frontier = next_frontier
+    return frontier, comparisons
+
+
+# ---------------------------------------------------------------------------
+# Row sources: each returns (columns, iterator of dict rows)
+# ---------------------------------------------------------------------------
+
+def file_rows(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Stream an export file: CSV (plain/.gz/.zst) or Parquet.
+    """
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+
+        def parquet_iter():
+            for batch in parquet.iter_batches(batch_size=batch_rows):
+                yield from batch.to_pylist()
+
+        return list(parquet.schema_arrow.names), parquet_iter()
+
+    import pandas as pd
+
+    header = pd.read_csv(path, nrows=0)
+    columns = list(header.columns)
+
+    def csv_iter():
+        # Read as text so both sides are normalized from the same representation
+        for chunk in pd.read_csv(path, dtype=str, chunksize=batch_rows):
+            for row in chunk.to_dict('records'):
+                yield row
+
+    return columns, csv_iter()
+
+
+def postgres_rows(batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Stream the export long-format rows from PostgreSQL with a server-side cursor.
+    """
+    import psycopg
+
+    exporter = load_script_module('postgres_export', 'postgres/export/export_student_data.py')
+
+    def pg_iter():
+        with psycopg.connect(**exporter.DB_CONFIG) as conn:
+            with conn.cursor(name='consistency_check') as cursor:
+                cursor.itersize = batch_rows
+                cursor.execute(exporter.STUDENT_PAYMENT_QUERY)
+                names = None
+                for record in cursor:
+                    if names is None:
+                        names = [column.name for column in cursor.description]
+                    yield dict(zip(names, record))
+
+    return SOURCE_COLUMNS, pg_iter()
+
+
+def mongo_rows(batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Stream the export long-format rows from MongoDB with the export pipeline.
+    """
+    from pymongo import MongoClient
+
+    exporter = load_script_module('mongodb_export', 'mongodb/export/export_student_data.py')
+
+    def mongo_iter():
+        client = MongoClient(exporter.MONGO_URI)
+        try:
+            cursor = client[exporter.DB_NAME].students.aggregate(
+                exporter.STUDENT_PAYMENT_PIPELINE, allowDiskUse=True, batchSize=batch_rows
+            )
+            yield from cursor
+        finally:
+            client.close()
+
+    return SOURCE_COLUMNS, mongo_iter()
+
+
+def open_source(spec, batch_rows):
+    """
+    'postgres', 'mongodb' or a path to an export file.
+    """
+    if spec == 'postgres':
+        return postgres_rows(batch_rows)
+    if spec == 'mongodb':
+        return mongo_rows(batch_rows)
+    return file_rows(spec, batch_rows)
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def row_key(row, key_columns, precision):
+    """
+    Normalized composite key of a row.
+    """
+    return '\x1f'.join(normalize_value(row.get(column), precision) for column in key_columns)
+
+
+def row_values(row, columns, precision):
+    """
+    Normalized values of a row in column order.
+    """
+    return tuple(normalize_value(row.get(column), precision) for column in columns)
+
+
+def build_tree(rows, key_columns, columns, chunks, precision):
+    """
+    First pass: hash every row into its chunk. Returns (tree, row count).
+    """
+    tree = MerkleChunks(chunks)
+    total = 0
+    for row in rows:
+        values = row_values(row, columns, precision)
+        tree.add(row_key(row, key_columns, precision), stable_hash('\x1f'.join(values)))
+        total += 1
+    return tree, total
+
+
+def collect_chunks(rows, key_columns, columns, chunk_ids, tree, precision):
+    """
+    Second pass: keep only the rows that fall into the differing chunks.
+    """
+    wanted = set(chunk_ids)
+    selected = {}
+    for row in rows:
+        key = row_key(row, key_columns, precision)
+        if tree.chunk_of(key) in wanted:
+            selected.setdefault(key, []).append(row_values(row, columns, precision))
+    return selected
+
+
+def diff_rows(left, right, columns):
+    """
+    Row-level diff of the selected chunks.
+    """
+    only_left = sorted(set(left) - set(right))
+    only_right = sorted(set(right) - set(left))
+    mismatched = []
+
+    for key in sorted(set(left) & set(right)):
+        left_rows = sorted(left[key])
+        right_rows = sorted(right[key])
+        if left_rows == right_rows:
+            continue
+        differences = {}
+        for left_row, right_row in zip(left_rows, right_rows):
+            for column, a, b in zip(columns, left_row, right_row):
+                if a != b:
+                    differences[column] = {'left': a, 'right': b}
+        if len(left_rows) != len(right_rows):
+            differences['_rows'] = {'left': len(left_rows), 'right': len(right_rows)}
+        mismatched.append({'key': key, 'differences': differences})
+
+    return only_left, only_right, mismatched
+
+
+def compare(left_spec, right_spec, key_columns=None, chunks=DEFAULT_CHUNKS,
+            precision=2, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Compare two sources and return a structured report.
+    """
+    from_files = left_spec not in ('postgres', 'mongodb') and right_spec not in ('postgres', 'mongodb')
+    key_columns = key_columns or (FILE_KEY_COLUMNS if from_files else SOURCE_KEY_COLUMNS)
+
+    left_columns, left_iter = open_source(left_spec, batch_rows)
+    right_columns, right_iter = open_source(right_spec, batch_rows)
+
+    # Union of columns: a column missing on one side hashes as empty
+    columns = sorted(set(left_columns) | set(right_columns))
+
+    left_tree, left_total = build_tree(left_iter, key_columns, columns, chunks, precision)
+    right_tree, right_total = build_tree(right_iter, key_columns, columns, chunks, precision)
+
+    chunk_ids, comparisons = differing_chunks(left_tree.levels(), right_tree.levels())
+
+    report = {
+        'left': left_spec,
+        'right': right_spec,
+        'key_columns': key_columns,
+        'rows': {'left': left_total, 'right': right_total},
+        'columns_only_left': sorted(set(left_columns) - set(right_columns)),
+        'columns_only_right': sorted(set(right_columns) - set(left_columns)),
+        'chunks': chunks,
+        'node_comparisons': comparisons,
+        'differing_chunks': len(chunk_ids),
+        'only_left': [],
+        'only_right': [],
+        'mismatched': [],
+        'consistent': not chunk_ids,
+    }
+    if not chunk_ids:
+        return report
+
+    # Drill down: re-stream both sides keeping only the differing chunks
+    _, left_iter = open_source(left_spec, batch_rows)
+    _, right_iter = open_source(right_spec, batch_rows)
+    left_rows = collect_chunks(left_iter, key_columns, columns, chunk_ids, left_tree, precision)
+    right_rows = collect_chunks(right_iter, key_columns, columns, chunk_ids, right_tree, precision)
+
+    only_left, only_right, mismatched = diff_rows(left_rows, right_rows, columns)
+    report['counts'] = {
+        'only_left': len(only_left),
+        'only_right': len(only_right),
+        'mismatched': len(mismatched),
+    }
+    report['only_left'] = only_left[:MAX_SAMPLES]
+    report['only_right'] = only_right[:MAX_SAMPLES]
+    report['mismatched'] = mismatched[:MAX_SAMPLES]
+    return report
+
+
+def print_report(report):
+    """
+    Print the report as a human-readable summary.
+    """
+    print("\n🔍 CONSISTENCY CHECK:")
+    print("=" * 50)
+    print(f"  Left:  {report['left']} ({report['rows']['left']:,} rows)")
+    print(f"  Right: {report['right']} ({report['rows']['right']:,} rows)")
+    print(f"  Key:   {', '.join(report['key_columns'])}")
+    print(f"  Chunks differing: {report['differing_chunks']:,} of {report['chunks']:,} "
+          f"({report['node_comparisons']:,} node comparisons)")
+
+    if report['columns_only_left']:
+        print(f"  Columns only in left: {', '.join(report['columns_only_left'])}")
+    if report['columns_only_right']:
+        print(f"  Columns only in right: {', '.join(report['columns_only_right'])}")
+
+    if report['consistent']:
+        print("\n✅ Both sides are consistent")
+        return
+
+    counts = report['counts']
+    print(f"\n❌ Keys only in left:  {counts['only_left']:,}")
+    print(f"❌ Keys only in right: {counts['only_right']:,}")
+    print(f"❌ Mismatched keys:    {counts['mismatched']:,}")
+    for item in report['mismatched'][:5]:
+        print(f"  {item['key']}: {', '.join(sorted(item['differences']))}")
+
+
+def parse_args():
+    """
+    Parse command line options for the consistency check.
+    """
+    parser = argparse.ArgumentParser(description='Compare PostgreSQL and MongoDB exports with chunked checksums')
+    parser.add_argument('left', help="Export file, or 'postgres' / 'mongodb' to read the source tables")
+    parser.add_argument('right', help="Export file, or 'postgres' / 'mongodb' to read the source tables")
+    parser.add_argument('--key', nargs='+', default=None,
+                        help='Key columns (default: document_id for files, '
+                             'document_id reg_number payment_number for sources)')
+    parser.add_argument('--chunks', type=int, default=DEFAULT_CHUNKS,
+                        help='Number of Merkle leaves (chunks)')
+    parser.add_argument('--precision', type=int, default=2,
+                        help='Decimals used when comparing non-integral numbers')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS,
+                        help='Rows read per batch')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        report = compare(args.left, args.right, key_columns=args.key, chunks=args.chunks,
+                         precision=args.precision, batch_rows=args.batch_rows)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(2)
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+    sys.exit(0 if report['consistent'] else 1)
+
+
+if __name__ == "__main__":
+    main()
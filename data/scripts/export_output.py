@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Export Output Writers - Shared by the PostgreSQL and MongoDB exporters
+Streams a dataframe to CSV or Parquet, optionally compressed with gzip or zstd.
+The format is picked from the file extension (.csv, .csv.gz, .csv.zst, .parquet)
+or forced with explicit format/compression arguments.
+"""
+
+import gzip
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+FORMATS = ('csv', 'parquet')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+# Extension -> compression for CSV output
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+}
+
+# Default codec when writing Parquet without an explicit compression
+DEFAULT_PARQUET_COMPRESSION = 'zstd'
+
+# Rows serialized per chunk when streaming CSV / Parquet row groups
+DEFAULT_CHUNK_ROWS = 10000
+
+# Uncompressed bytes handed to each parallel gzip worker
+GZIP_BLOCK_SIZE = 1 << 20
+
+
+def resolve_output_format(filename=None, fmt=None, compression=None):
+    """
+    Resolve (format, compression) from explicit arguments or the filename extension.
+    Explicit arguments always win over the extension.
+    """
+    ext_format = None
+    ext_compression = None
+
+    if filename:
+        root, ext = os.path.splitext(filename.lower())
+        if ext in COMPRESSION_EXTENSIONS:
+            ext_compression = COMPRESSION_EXTENSIONS[ext]
+            root, ext = os.path.splitext(root)
+        if ext == '.parquet':
+            ext_format = 'parquet'
+        elif ext == '.csv':
+            ext_format = 'csv'
+
+    fmt = fmt or ext_format or 'csv'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    compression = compression or ext_compression
+    if compression is None:
+        compression = DEFAULT_PARQUET_COMPRESSION if fmt == 'parquet' else 'none'
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    return fmt, compression
+
+
+def build_filename(prefix, fmt='csv', compression='none'):
+    """
+    Build a timestamped filename like prefix_YYYYMMDD_HHMMSS.csv.zst
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'{prefix}_{timestamp}.{fmt}'
+    if fmt == 'csv' and compression == 'gzip':
+        filename += '.gz'
+    elif fmt == 'csv' and compression == 'zstd':
+        filename += '.zst'
+    return filename
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """
+    Binary writer producing a multi-member gzip file.
+
+    Input is cut into fixed-size blocks that are compressed independently on a
+    thread pool (zlib releases the GIL), then written in order. Concatenated
+    gzip members are a valid gzip stream, so any gzip reader can consume it.
+    """
+
+    def __init__(self, fileobj, level=6, threads=None):
+        self.fileobj = fileobj
+        self.level = level
+        self.threads = threads or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.buffer = bytearray()
+        self.pending = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= GZIP_BLOCK_SIZE:
+            block = bytes(self.buffer[:GZIP_BLOCK_SIZE])
+            del self.buffer[:GZIP_BLOCK_SIZE]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(gzip.compress, block, self.level))
+        # Keep a bounded number of blocks in flight
+        while len(self.pending) > self.threads * 2:
+            self.fileobj.write(self.pending.pop(0).result())
+
+    def close(self):
+        if self.closed:
+            return
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        for future in self.pending:
+            self.fileobj.write(future.result())
+        self.pending = []
+        self.executor.shutdown()
+        self.fileobj.close()
+        super().close()
+
+
+def open_compressed(filename, compression='none', threads=None, level=None):
+    """
+    Open a binary write stream for the given compression.
+    """
+    raw = open(filename, 'wb')
+
+    if compression == 'none':
+        return raw
+
+    if compression == 'gzip':
+        return ParallelGzipWriter(raw, level=level or 6, threads=threads)
+
+    if compression == 'zstd':
+        import zstandard
+
+        # threads=-1 lets zstd use one worker per logical CPU
+        compressor = zstandard.ZstdCompressor(
+            level=level or 3,
+            threads=threads if threads is not None else -1
+        )
+        return compressor.stream_writer(raw, closefd=True)
+
+    raw.close()
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def write_csv(df, filename, compression='none', threads=None, level=None,
+              chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Stream a dataframe to (compressed) CSV in row chunks.
+    """
+    with open_compressed(filename, compression, threads, level) as stream:
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            chunk.to_csv(text, index=False, header=(start == 0))
+        text.flush()
+        text.detach()
+
+
+def write_parquet(df, filename, compression=DEFAULT_PARQUET_COMPRESSION, level=None,
+                  chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Stream a dataframe to Parquet, one row group per chunk.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    codec = None if compression == 'none' else compression
+
+    with pq.ParquetWriter(filename, schema, compression=codec,
+                          compression_level=level) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_dataframe(df, filename=None, prefix='student_payment_bi_export', fmt=None,
+                     compression=None, threads=None, level=None):
+    """
+    Export a dataframe choosing format and compression from the arguments or the
+    filename extension. Returns the written filename.
+    """
+    fmt, compression = resolve_output_format(filename, fmt, compression)
+
+    if filename is None:
+        filename = build_filename(prefix, fmt, compression)
+
+    if fmt == 'parquet':
+        write_parquet(df, filename, compression=compression, level=level)
+    else:
+        write_csv(df, filename, compression=compression, threads=threads, level=level)
+
+    return filename
+
+
+def add_output_arguments(parser):
+    """
+    Register the shared --output / --format / --compression / --threads flags.
+    """
+    parser.add_argument('--output', '-o', default=None,
+                        help='Output file; format is inferred from the extension '
+                             '(.csv, .csv.gz, .csv.zst, .parquet)')
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help='Output format (overrides the extension)')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default=None,
+                        help='Output compression (overrides the extension)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Compression threads (default: all cores)')
+    return parser
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Student Feature Store - Incrementally Refreshed (SQLite)
+Keeps the per-student feature matrix of export_student_features.py on disk,
+keyed by student_id, so training and scoring runs do not recompute every
+student from payments and classes_attendances.
+
+Each row stores the version it was computed at: the watermark (latest
+updated_at over the student's source rows) and the source row count. A refresh
+reads the current versions with one light grouped query and recomputes features
+only for new or changed students; students that disappeared are deleted.
+Features that depend on the reference date (days since, windowed rates) are
+recomputed for everyone when the refresh date changes.
+
+APIs: get() for point lookups by primary key, iter_batches() for keyset-paginated
+bulk scans, to_frame() for the whole matrix.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from student_features import FEATURE_COLUMNS, ID_COLUMN, LABEL_COLUMN
+
+DEFAULT_STORE_PATH = 'models/student_features.sqlite'
+SELECT_COLUMNS = f"{ID_COLUMN}, {LABEL_COLUMN}, vector"
+
+# Students per filtered feature query during a refresh
+REFRESH_CHUNK = 1000
+
+# Above this share of changed students, one unfiltered feature query is cheaper
+FULL_QUERY_RATIO = 0.5
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_CHUNK = 900
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _watermark(updated_at):
+    """
+    Stored text form of an updated_at value.
+    """
+    if updated_at is None:
+        return ''
+    return updated_at.isoformat() if isinstance(updated_at, datetime) else str(updated_at)
+
+
+class FeatureStore:
+    """
+    SQLite table of student feature rows with their source version. The
+    FEATURE_COLUMNS values are stored as one float32 vector (BLOB) per student,
+    the column order is recorded in the meta table.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create()
+
+    def _create(self):
+        self.conn.executescript(f"""
+CREATE TABLE IF NOT EXISTS features (
+    {ID_COLUMN} TEXT PRIMARY KEY,
+    {LABEL_COLUMN} INTEGER,
+    vector BLOB NOT NULL,
+    watermark TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    computed_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+""")
+        stored = self.get_meta('feature_columns')
+        if stored is None:
+            self.set_meta('feature_columns', json.dumps(FEATURE_COLUMNS))
+        elif json.loads(stored) != FEATURE_COLUMNS:
+            raise ValueError(f"Feature layout of {self.path} differs from student_features.py; "
+                             "delete the store and refresh")
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    @property
+    def as_of(self):
+        value = self.get_meta('as_of')
+        return date.fromisoformat(value) if value else None
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM features").fetchone()[0]
+
+    def upsert(self, features, versions):
+        """
+        Insert or replace feature rows (finalize_features layout) with their versions.
+        """
+        computed_at = datetime.now().isoformat(timespec='seconds')
+        names = [ID_COLUMN, LABEL_COLUMN, 'vector', 'watermark', 'row_count', 'computed_at']
+        updates = ", ".join(f"{name} = excluded.{name}" for name in names[1:])
+        sql = (f"INSERT INTO features ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+               f"ON CONFLICT({ID_COLUMN}) DO UPDATE SET {updates}")
+
+        ids = features[ID_COLUMN].astype(str).tolist()
+        labels = features[LABEL_COLUMN].astype(int).tolist()
+        matrix = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        rows = (
+            (student_id, label, vector.tobytes(), _watermark(versions[student_id][0]),
+             int(versions[student_id][1]), computed_at)
+            for student_id, label, vector in zip(ids, labels, matrix)
+        )
+        with self.conn:
+            self.conn.executemany(sql, rows)
+        return len(ids)
+
+    def delete(self, student_ids):
+        with self.conn:
+            for chunk in _chunks(list(student_ids), LOOKUP_CHUNK):
+                self.conn.execute(f"DELETE FROM features WHERE {ID_COLUMN} IN ({', '.join('?' * len(chunk))})",
+                                  chunk)
+
+    def versions(self, student_ids=None):
+        """
+        {student_id: (watermark, row_count)} stored for all or the given students.
+        """
+        sql = f"SELECT {ID_COLUMN}, watermark, row_count FROM features"
+        if student_ids is None:
+            return {sid: (watermark, count) for sid, watermark, count in self.conn.execute(sql)}
+        versions = {}
+        for chunk in _chunks(list(student_ids), LOOKUP_CHUNK):
+            rows = self.conn.execute(f"{sql} WHERE {ID_COLUMN} IN ({', '.join('?' * len(chunk))})", chunk)
+            versions.update((sid, (watermark, count)) for sid, watermark, count in rows)
+        return versions
+
+    def _frame(self, rows):
+        """
+        finalize_features() layout from (student_id, label, vector) rows.
+        """
+        matrix = np.frombuffer(b''.join(row[2] for row in rows), dtype=np.float32)
+        frame = pd.DataFrame(matrix.reshape(len(rows), len(FEATURE_COLUMNS)), columns=FEATURE_COLUMNS)
+        frame.insert(0, ID_COLUMN, [row[0] for row in rows])
+        frame[LABEL_COLUMN] = np.array([row[1] for row in rows], dtype=np.int8)
+        return frame
+
+    def get(self, student_ids):
+        """
+        Point lookup: feature rows of the given students (unknown ids are omitted).
+        """
+        rows = []
+        for chunk in _chunks(list(student_ids), LOOKUP_CHUNK):
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(self.conn.execute(
+                f"SELECT {SELECT_COLUMNS} FROM features WHERE {ID_COLUMN} IN ({placeholders})", chunk))
+        return self._frame(rows)
+
+    def iter_batches(self, batch_rows=10000):
+        """
+        Bulk scan in primary-key order, batch_rows at a time (keyset pagination).
+        """
+        last = ''
+        while True:
+            rows = self.conn.execute(
+                f"SELECT {SELECT_COLUMNS} FROM features WHERE {ID_COLUMN} > ? ORDER BY {ID_COLUMN} LIMIT ?",
+                (last, batch_rows)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            yield self._frame(rows)
+
+    def to_frame(self):
+        batches = list(self.iter_batches(100000))
+        return pd.concat(batches, ignore_index=True) if batches else self._frame([])
+
+    def refresh(self, conn, as_of=None, full=False, verbose=True):
+        """
+        Bring the store up to date with PostgreSQL: recompute new/changed
+        students (all of them if the reference date changed or full=True) and
+        drop removed ones. Versions are read before the features, so a row
+        changing mid-refresh is picked up again by the next refresh.
+        """
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'postgres', 'export'))
+        from export_student_features import get_student_features, get_student_versions
+
+        start = time.perf_counter()
+        as_of = as_of or date.today()
+        full = full or self.as_of != as_of
+
+        current = get_student_versions(conn)
+        current = {sid: (_watermark(updated_at), int(count)) for sid, (updated_at, count) in current.items()}
+        stored = self.versions()
+        changed = [sid for sid, version in current.items() if full or stored.get(sid) != version]
+        removed = [sid for sid in stored if sid not in current]
+
+        if changed and len(changed) > FULL_QUERY_RATIO * len(current):
+            features = get_student_features(conn, as_of)
+            features = features[features[ID_COLUMN].isin(set(changed))]
+            self.upsert(features, current)
+        else:
+            for chunk in _chunks(changed, REFRESH_CHUNK):
+                self.upsert(get_student_features(conn, as_of, chunk), current)
+        self.delete(removed)
+        self.set_meta('as_of', as_of.isoformat())
+        self.set_meta('refreshed_at', datetime.now().isoformat(timespec='seconds'))
+
+        summary = {
+            'students': len(current),
+            'recomputed': len(changed),
+            'removed': len(removed),
+            'full': full,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+        if verbose:
+            print(f"✓ Refresh ({'full' if full else 'incremental'}, as of {as_of}): "
+                  f"{summary['recomputed']:,} of {summary['students']:,} students recomputed, "
+                  f"{summary['removed']:,} removed in {summary['seconds']}s")
+        return summary
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_args():
+    """
+    Parse command line options for the feature store.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH,
+                        help=f'SQLite store path (default: {DEFAULT_STORE_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    refresh = commands.add_parser('refresh', help='Recompute new/changed students from PostgreSQL')
+    refresh.add_argument('--as-of', type=date.fromisoformat, default=None,
+                         help='Reference date (YYYY-MM-DD, default: today)')
+    refresh.add_argument('--full', action='store_true', help='Recompute every student')
+
+    get = commands.add_parser('get', help='Print the feature rows of some students')
+    get.add_argument('student_ids', nargs='+')
+
+    export = commands.add_parser('export', help='Write the whole store to Parquet')
+    export.add_argument('output')
+
+    commands.add_parser('info', help='Row count, reference date and last refresh')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Refresh, query or export the feature store.
+    """
+    args = parse_args()
+
+    try:
+        store = FeatureStore(args.store)
+        if args.command == 'refresh':
+            import psycopg
+            sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'postgres', 'export'))
+            from export_student_data import DB_CONFIG
+
+            print("🔌 Connecting to database...")
+            with psycopg.connect(**DB_CONFIG) as conn:
+                store.refresh(conn, args.as_of, args.full)
+        elif args.command == 'get':
+            print(store.get(args.student_ids).set_index(ID_COLUMN).T.to_string())
+        elif args.command == 'export':
+            store.to_frame().to_parquet(args.output, index=False, compression='zstd')
+            print(f"✅ Features exported to: {args.output}")
+        else:
+            print(f"📊 {args.store}: {len(store):,} students, as of {store.as_of}, "
+                  f"refreshed at {store.get_meta('refreshed_at')}")
+        store.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Student State Scoring Service - Local HTTP API
+Keeps a model trained by train_model.py loaded and scores students on demand
+for the BI dashboard. Runs locally against PostgreSQL, the feature store
+(feature_store.py) or an offline Parquet feature export; no external services.
+
+- Micro-batching: concurrent requests are collected for up to --max-wait-ms
+  (or --max-batch students) and scored with one feature lookup and one
+  predict_proba call
+- Feature cache: LRU of per-student feature vectors keyed by a version
+  (PostgreSQL: latest updated_at and row count of the student's source rows;
+  feature store: stored watermark and row count; Parquet: file modification
+  time), so changed students are recomputed
+- Latency percentiles and cache/batch counters at GET /stats
+
+Endpoints:
+    GET  /score?student_id=<id>[&student_id=<id>...]
+    POST /score            {"student_ids": ["<id>", ...]}
+    GET  /stats
+    GET  /health
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from student_features import FEATURE_COLUMNS, ID_COLUMN
+from train_model import DEFAULT_MODEL_PATH, STORE_SUFFIXES, load_model
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 5
+DEFAULT_CACHE_SIZE = 100000
+LATENCY_WINDOW = 10000
+
+
+class LatencyTracker:
+    """
+    Request latencies over the last `window` requests.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def percentiles(self):
+        """
+        p50/p90/p95/p99/max in milliseconds over the window.
+        """
+        with self.lock:
+            samples = np.array(self.samples)
+            count = self.count
+        if not len(samples):
+            return {'requests': count}
+        p50, p90, p95, p99 = np.percentile(samples, [50, 90, 95, 99]) * 1000
+        return {
+            'requests': count,
+            'window': len(samples),
+            'p50_ms': round(p50, 3),
+            'p90_ms': round(p90, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'max_ms': round(samples.max() * 1000, 3),
+        }
+
+
+class FeatureCache:
+    """
+    LRU cache of student_id -> (version, feature vector). An entry whose
+    version differs from the current one is dropped and counted as stale.
+    Only the batching thread touches it, so no locking is needed.
+    """
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, student_id, version):
+        entry = self.entries.get(student_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != version:
+            del self.entries[student_id]
+            self.stale += 1
+            return None
+        self.entries.move_to_end(student_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, student_id, version, vector):
+        self.entries[student_id] = (version, vector)
+        self.entries.move_to_end(student_id)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.stale
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class ParquetFeatureSource:
+    """
+    Offline source: a feature export (.parquet) loaded once and reloaded when
+    the file changes. The version of every student is the file mtime.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.index = {}
+        self.matrix = None
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return
+        features = pd.read_parquet(self.path, columns=[ID_COLUMN] + FEATURE_COLUMNS)
+        self.matrix = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        self.index = {student_id: row for row, student_id in enumerate(features[ID_COLUMN].astype(str))}
+        self.mtime = mtime
+
+    def versions(self, student_ids):
+        self._reload_if_changed()
+        return {student_id: self.mtime for student_id in student_ids if student_id in self.index}
+
+    def features(self, student_ids):
+        return {student_id: self.matrix[self.index[student_id]] for student_id in student_ids
+                if student_id in self.index}
+
+
+def uuid_ids(student_ids):
+    """
+    The ids that parse as UUIDs. A malformed id would fail the ::uuid[] cast of
+    the whole batch, so it is dropped here and reported as an unknown student.
+    """
+    valid = []
+    for student_id in student_ids:
+        try:
+            uuid.UUID(student_id)
+        except ValueError:
+            continue
+        valid.append(student_id)
+    return valid
+
+
+class PostgresFeatureSource:
+    """
+    Live source: versions from get_student_versions(), features from the
+    student-filtered feature query. The reference date is part of the version,
+    so recency features roll over at midnight. Ids that are not UUIDs are
+    never sent to PostgreSQL.
+    """
+
+    def __init__(self, as_of=None):
+        import psycopg
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'postgres', 'export'))
+        from export_student_data import DB_CONFIG
+        import export_student_features
+
+        self.queries = export_student_features
+        self.as_of = as_of
+        self.conn = psycopg.connect(**DB_CONFIG, autocommit=True)
+
+    def versions(self, student_ids):
+        as_of = self.as_of or date.today()
+        student_ids = uuid_ids(student_ids)
+        if not student_ids:
+            return {}
+        return {student_id: (as_of, *version)
+                for student_id, version in self.queries.get_student_versions(self.conn, student_ids).items()}
+
+    def features(self, student_ids):
+        features = self.queries.get_student_features(self.conn, self.as_of, uuid_ids(student_ids))
+        matrix = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        return dict(zip(features[ID_COLUMN].astype(str), matrix))
+
+
+class StoreFeatureSource:
+    """
+    Feature store source (feature_store.py): point lookups by primary key, with
+    the stored watermark and row count as version, so vectors are recomputed
+    after a store refresh changed the student.
+    """
+
+    def __init__(self, path):
+        from feature_store import FeatureStore
+        self.store = FeatureStore(path)
+
+    def versions(self, student_ids):
+        as_of = self.store.as_of
+        return {student_id: (as_of, *version) for student_id, version in self.store.versions(student_ids).items()}
+
+    def features(self, student_ids):
+        features = self.store.get(student_ids)
+        matrix = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        return dict(zip(features[ID_COLUMN], matrix))
+
+
+class Scorer:
+    """
+    Scores a batch of student ids: one version lookup, one feature query for
+    cache misses, one predict_proba.
+    """
+
+    def __init__(self, bundle, source, cache):
+        if list(bundle['features']) != FEATURE_COLUMNS:
+            raise ValueError("Model was trained on a different feature layout")
+        self.scaler = bundle['scaler']
+        self.model = bundle['model']
+        self.labels = {code: state for state, code in bundle['labels'].items()}
+        self.source = source
+        self.cache = cache
+
+    def score_batch(self, student_ids):
+        """
+        {student_id: result} for the unique ids of the batch.
+        """
+        student_ids = list(dict.fromkeys(student_ids))
+        versions = self.source.versions(student_ids)
+
+        vectors = {}
+        missing = []
+        for student_id in student_ids:
+            if student_id not in versions:
+                continue
+            vector = self.cache.get(student_id, versions[student_id])
+            if vector is None:
+                missing.append(student_id)
+            else:
+                vectors[student_id] = vector
+        if missing:
+            for student_id, vector in self.source.features(missing).items():
+                self.cache.put(student_id, versions[student_id], vector)
+                vectors[student_id] = vector
+
+        results = {student_id: {'student_id': student_id, 'error': 'unknown student'}
+                   for student_id in student_ids if student_id not in vectors}
+        if vectors:
+            known = list(vectors)
+            proba = self.model.predict_proba(self.scaler.transform(np.vstack([vectors[s] for s in known])))
+            classes = [self.labels[int(code)] for code in self.model.classes_]
+            for student_id, row in zip(known, proba):
+                results[student_id] = {
+                    'student_id': student_id,
+                    'state': classes[int(row.argmax())],
+                    'probabilities': {state: round(float(p), 6) for state, p in zip(classes, row)},
+                }
+        return results
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches of up to max_batch student ids,
+    waiting at most max_wait_ms after the first request, and scores each batch
+    on a single worker thread.
+    """
+
+    def __init__(self, scorer, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.worker = threading.Thread(target=self._run, name='scoring-batcher', daemon=True)
+        self.worker.start()
+
+    def submit(self, student_ids):
+        """
+        Queue a request; the returned Future resolves to a list of results in request order.
+        """
+        future = Future()
+        self.requests.put((list(student_ids), future))
+        return future
+
+    def _collect(self):
+        pending = [self.requests.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            student_ids = [student_id for ids, _ in pending for student_id in ids]
+            try:
+                results = self.scorer.score_batch(student_ids)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batch_sizes.append(len(student_ids))
+            for ids, future in pending:
+                future.set_result([results[student_id] for student_id in ids])
+
+    def stats(self):
+        sizes = np.array(self.batch_sizes)
+        return {
+            'batches': self.batches,
+            'mean_batch_size': round(float(sizes.mean()), 2) if len(sizes) else None,
+            'max_batch_size': int(sizes.max()) if len(sizes) else None,
+            'queued': self.requests.qsize(),
+        }
+
+
+class ScoringService:
+    """
+    Model, cache, batcher and latency tracker behind the HTTP handler.
+    """
+
+    def __init__(self, model_path, source, max_batch=DEFAULT_MAX_BATCH,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, cache_size=DEFAULT_CACHE_SIZE):
+        self.cache = FeatureCache(cache_size)
+        self.scorer = Scorer(load_model(model_path), source, self.cache)
+        self.batcher = MicroBatcher(self.scorer, max_batch, max_wait_ms)
+        self.latency = LatencyTracker()
+        self.started = time.time()
+
+    def score(self, student_ids, timeout=30):
+        start = time.perf_counter()
+        try:
+            return self.batcher.submit(student_ids).result(timeout=timeout)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    def stats(self):
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'latency': self.latency.percentiles(),
+            'batching': self.batcher.stats(),
+            'feature_cache': self.cache.stats(),
+        }
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """
+    One thread per connection, with a listen backlog sized for bursts of dashboard requests.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_handler(service):
+    """
+    Request handler class bound to a ScoringService.
+    """
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _score(self, student_ids):
+            if not student_ids:
+                self._send(400, {'error': 'no student ids'})
+                return
+            try:
+                self._send(200, {'results': service.score([str(s) for s in student_ids])})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/score':
+                self._score(parse_qs(url.query).get('student_id', []))
+            elif url.path == '/stats':
+                self._send(200, service.stats())
+            elif url.path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/score':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send(400, {'error': 'invalid JSON body'})
+                return
+            if not isinstance(payload, dict):
+                self._send(400, {'error': 'JSON body must be an object'})
+                return
+            student_ids = payload.get('student_ids', [])
+            if not isinstance(student_ids, list):
+                self._send(400, {'error': 'student_ids must be a list'})
+                return
+            self._score(student_ids)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+def build_source(source, as_of=None):
+    """
+    'postgres', a feature store (.sqlite) or the path of a Parquet feature export.
+    """
+    if source == 'postgres':
+        return PostgresFeatureSource(as_of)
+    if source.endswith(STORE_SUFFIXES):
+        return StoreFeatureSource(source)
+    return ParquetFeatureSource(source)
+
+
+def parse_args():
+    """
+    Parse command line options for the scoring service.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH,
+                        help=f'Model bundle from train_model.py (default: {DEFAULT_MODEL_PATH})')
+    parser.add_argument('--source', default='postgres',
+                        help="'postgres' (default), a feature store (.sqlite) or a Parquet feature export")
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help="Fixed reference date for 'postgres' features (default: today)")
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f'Students per scoring batch (default: {DEFAULT_MAX_BATCH})')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f'Batch collection window in ms (default: {DEFAULT_MAX_WAIT_MS})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'Feature vectors kept in the LRU cache (default: {DEFAULT_CACHE_SIZE})')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Load the model and serve scoring requests until interrupted.
+    """
+    args = parse_args()
+
+    try:
+        service = ScoringService(args.model, build_source(args.source, args.as_of),
+                                 args.max_batch, args.max_wait_ms, args.cache_size)
+        server = ScoringServer((args.host, args.port), make_handler(service))
+        print(f"✅ Scoring service on http://{args.host}:{args.port} (source: {args.source})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n📊 " + json.dumps(service.stats(), default=str))
+        finally:
+            server.server_close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Baseline Model Training - Student State (Out-of-Core)
+Trains an incremental classifier (SGDClassifier, logistic loss) that predicts
+students.state (active / inactive / suspended) from the per-student payment and
+attendance features of export_student_features.py. Features are streamed in
+batches from a Parquet/CSV feature export, the feature store (feature_store.py)
+or straight from PostgreSQL and fed
+to partial_fit, so the dataset never has to fit in memory.
+
+Passes over the stream:
+1. Scaling pass: StandardScaler.partial_fit and label counts (class weights)
+2. Training epochs: each batch is scored before it is trained on (progressive
+   validation), then partial_fit; throughput and loss are reported per batch
+3. Holdout pass after each epoch: a fixed hash-based share of students is never
+   trained on and gives the per-epoch convergence curve (early stopping)
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import log_loss
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from student_features import FEATURE_COLUMNS, ID_COLUMN, LABEL_COLUMN, STATE_LABELS, feature_matrix
+
+CLASSES = np.array(sorted(STATE_LABELS.values()))
+
+DEFAULT_BATCH_ROWS = 10000
+DEFAULT_MODEL_PATH = 'models/student_state_sgd.joblib'
+STORE_SUFFIXES = ('.sqlite', '.db')
+
+
+def iter_file_batches(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Yield DataFrame batches from a Parquet or (optionally compressed) CSV feature export.
+    """
+    columns = [ID_COLUMN, LABEL_COLUMN] + FEATURE_COLUMNS
+    if path.endswith('.parquet'):
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_rows,
+                               dtype={ID_COLUMN: str})
+
+
+def iter_database_batches(batch_rows=DEFAULT_BATCH_ROWS, as_of=None):
+    """
+    Yield DataFrame batches of the PostgreSQL feature query through a server-side cursor.
+    """
+    import psycopg
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'postgres', 'export'))
+    from export_student_data import DB_CONFIG
+    from export_student_features import build_feature_query
+    from student_features import finalize_features
+
+    with psycopg.connect(**DB_CONFIG) as conn:
+        with conn.cursor(name='student_feature_stream') as cursor:
+            cursor.itersize = batch_rows
+            cursor.execute(build_feature_query(), {'as_of': as_of or date.today()})
+            columns = None
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                columns = columns or [desc.name for desc in cursor.description]
+                yield finalize_features(pd.DataFrame(rows, columns=columns))
+
+
+def batch_source(source, batch_rows=DEFAULT_BATCH_ROWS, as_of=None):
+    """
+    Callable returning a fresh batch iterator; each pass re-reads the source.
+    """
+    if source == 'postgres':
+        return lambda: iter_database_batches(batch_rows, as_of)
+    if source.endswith(STORE_SUFFIXES):
+        from feature_store import FeatureStore
+        store = FeatureStore(source)
+        return lambda: store.iter_batches(batch_rows)
+    return lambda: iter_file_batches(source, batch_rows)
+
+
+def holdout_mask(ids, holdout_percent):
+    """
+    Deterministic holdout split by hashed student id (stable across passes and runs).
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(ids, dtype=str), index=False).to_numpy()
+    return (hashes % 100) < holdout_percent
+
+
+def split_batch(batch, holdout_percent):
+    """
+    (X_train, y_train, X_holdout, y_holdout) of a batch; unlabeled rows are dropped.
+    """
+    X, y, ids = feature_matrix(batch)
+    labeled = np.isin(y, CLASSES)
+    X, y, ids = X[labeled], y[labeled], ids[labeled]
+    holdout = holdout_mask(ids, holdout_percent)
+    return X[~holdout], y[~holdout], X[holdout], y[holdout]
+
+
+class StreamTrainer:
+    """
+    Scaler + SGDClassifier trained with partial_fit over repeated batch streams.
+    """
+
+    def __init__(self, batches, holdout_percent=10, alpha=1e-4, random_state=0, verbose=True):
+        self.batches = batches
+        self.holdout_percent = holdout_percent
+        self.scaler = StandardScaler()
+        self.model = SGDClassifier(loss='log_loss', alpha=alpha, learning_rate='optimal',
+                                   random_state=random_state)
+        self.class_weights = None
+        self._weight_lookup = None
+        self.history = []
+        self.verbose = verbose
+
+    def fit_scaler(self):
+        """
+        First pass: feature scaling statistics and label counts of the training rows.
+        """
+        counts = np.zeros(len(CLASSES), dtype=np.int64)
+        rows = 0
+        start = time.perf_counter()
+        for batch in self.batches():
+            X, y, _, _ = split_batch(batch, self.holdout_percent)
+            if len(X):
+                self.scaler.partial_fit(X)
+                counts += np.bincount(y, minlength=len(CLASSES))[:len(CLASSES)]
+                rows += len(X)
+        if rows == 0:
+            raise ValueError("No labeled training rows in the source")
+
+        # 'balanced' weights, computed from the counts (partial_fit cannot do it per batch)
+        present = counts > 0
+        weights = np.ones(len(CLASSES))
+        weights[present] = rows / (present.sum() * counts[present])
+        self.class_weights = dict(zip(CLASSES.tolist(), weights))
+        self._weight_lookup = weights
+        self._log(f"📊 Scaling pass: {rows:,} training rows in {time.perf_counter() - start:.1f}s, "
+                  f"class counts {dict(zip(CLASSES.tolist(), counts.tolist()))}")
+        return self
+
+    def train_epoch(self, epoch):
+        """
+        One pass of progressive validation + partial_fit. Returns the epoch summary.
+        """
+        rows = 0
+        loss_sum = 0.0
+        correct = 0
+        evaluated = 0
+        epoch_start = time.perf_counter()
+        for number, batch in enumerate(self.batches(), start=1):
+            batch_start = time.perf_counter()
+            X, y, _, _ = split_batch(batch, self.holdout_percent)
+            if not len(X):
+                continue
+            X = self.scaler.transform(X)
+            weights = self._weight_lookup[y]
+
+            batch_loss = batch_accuracy = None
+            if hasattr(self.model, 'coef_'):
+                proba = self.model.predict_proba(X)
+                batch_loss = log_loss(y, proba, labels=CLASSES)
+                batch_accuracy = float((CLASSES[proba.argmax(axis=1)] == y).mean())
+                loss_sum += batch_loss * len(y)
+                correct += batch_accuracy * len(y)
+                evaluated += len(y)
+                previous = self.model.coef_.copy()
+            self.model.partial_fit(X, y, classes=CLASSES, sample_weight=weights)
+            change = (np.linalg.norm(self.model.coef_ - previous) / max(np.linalg.norm(previous), 1e-12)
+                      if batch_loss is not None else None)
+
+            rows += len(X)
+            elapsed = time.perf_counter() - batch_start
+            self._log(f"  epoch {epoch} batch {number}: {len(X):,} rows, "
+                      f"{len(X) / elapsed:,.0f} rows/s"
+                      + (f", loss {batch_loss:.4f}, acc {batch_accuracy:.3f}, Δw {change:.4f}"
+                         if batch_loss is not None else ""))
+
+        elapsed = time.perf_counter() - epoch_start
+        return {
+            'epoch': epoch,
+            'rows': rows,
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed else None,
+            'progressive_loss': loss_sum / evaluated if evaluated else None,
+            'progressive_accuracy': correct / evaluated if evaluated else None,
+        }
+
+    def evaluate_holdout(self):
+        """
+        Streamed log loss and accuracy over the holdout students.
+        """
+        loss_sum = 0.0
+        correct = 0
+        rows = 0
+        for batch in self.batches():
+            _, _, X, y = split_batch(batch, self.holdout_percent)
+            if not len(X):
+                continue
+            proba = self.model.predict_proba(self.scaler.transform(X))
+            loss_sum += log_loss(y, proba, labels=CLASSES) * len(y)
+            correct += int((CLASSES[proba.argmax(axis=1)] == y).sum())
+            rows += len(y)
+        if rows == 0:
+            return {'holdout_rows': 0, 'holdout_loss': None, 'holdout_accuracy': None}
+        return {'holdout_rows': rows, 'holdout_loss': loss_sum / rows, 'holdout_accuracy': correct / rows}
+
+    def fit(self, epochs=5, tol=1e-3, patience=2):
+        """
+        Scaling pass, then up to `epochs` training epochs; stops when the holdout
+        loss has not improved by `tol` for `patience` epochs.
+        """
+        self.fit_scaler()
+        best = np.inf
+        stale = 0
+        for epoch in range(1, epochs + 1):
+            summary = self.train_epoch(epoch)
+            summary.update(self.evaluate_holdout())
+            self.history.append(summary)
+            self._log(f"✓ Epoch {epoch}: {summary['rows']:,} rows in {summary['seconds']:.1f}s "
+                      f"({summary['rows_per_second']:,.0f} rows/s), "
+                      f"holdout loss {_fmt(summary['holdout_loss'])}, "
+                      f"holdout acc {_fmt(summary['holdout_accuracy'], 3)}")
+
+            loss = summary['holdout_loss']
+            if loss is None:
+                continue
+            if loss < best - tol:
+                best = loss
+                stale = 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    self._log(f"✓ Converged after {epoch} epochs")
+                    break
+        return self
+
+    def save(self, path):
+        """
+        Store scaler, model and feature layout with joblib.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({
+            'scaler': self.scaler,
+            'model': self.model,
+            'features': FEATURE_COLUMNS,
+            'labels': STATE_LABELS,
+            'history': self.history,
+        }, path)
+        return path
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+
+def _fmt(value, digits=4):
+    return 'n/a' if value is None else f"{value:.{digits}f}"
+
+
+def load_model(path):
+    """
+    Load a bundle written by StreamTrainer.save().
+    """
+    return joblib.load(path)
+
+
+def parse_args():
+    """
+    Parse command line options for training.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source',
+                        help="Feature export (.parquet / .csv[.gz|.zst]), feature store (.sqlite) "
+                             "or 'postgres' to read the database")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS,
+                        help=f'Rows per partial_fit batch (default: {DEFAULT_BATCH_ROWS})')
+    parser.add_argument('--epochs', type=int, default=5, help='Maximum training epochs (default: 5)')
+    parser.add_argument('--holdout', type=int, default=10,
+                        help='Percent of students held out for convergence checks (default: 10)')
+    parser.add_argument('--alpha', type=float, default=1e-4, help='SGD regularization (default: 1e-4)')
+    parser.add_argument('--as-of', default=None,
+                        help="Reference date for 'postgres' features (YYYY-MM-DD, default: today)")
+    parser.add_argument('-o', '--output', default=DEFAULT_MODEL_PATH,
+                        help=f'Model output path (default: {DEFAULT_MODEL_PATH})')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Train the student state model out of core and save it.
+    """
+    args = parse_args()
+
+    try:
+        as_of = date.fromisoformat(args.as_of) if args.as_of else None
+        trainer = StreamTrainer(batch_source(args.source, args.batch_rows, as_of),
+                                holdout_percent=args.holdout, alpha=args.alpha)
+        trainer.fit(epochs=args.epochs)
+        path = trainer.save(args.output)
+        print(f"✅ Model saved to: {path}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
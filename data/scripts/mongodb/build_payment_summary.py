@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Per-Student Payment Summary - MongoDB
+Maintains the pre-aggregated student_payment_summary collection with $merge:
+one document per registration with total revenue, payment count and last
+payment date. Supports a full rebuild or an incremental refresh of the
+registrations whose payments changed inside an updated_at window.
+
+A rebuild writes through $out, which replaces the collection only when the
+aggregation has finished, so readers never see an empty or partial summary.
+Watermarks are UTC, like refreshed_at ($$NOW) and the generator's updated_at.
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+import pandas as pd
+from bson import Decimal128
+from pymongo import MongoClient, ASCENDING
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from export_output import add_output_arguments, export_dataframe
+
+load_dotenv()
+
+MONGO_URI = os.getenv('DB_URI_MONGO', 'mongodb://localhost:27017/')
+DB_NAME = 'football_school_db'
+
+SUMMARY_COLLECTION = 'student_payment_summary'
+WATERMARK_COLLECTION = 'summary_watermarks'
+
+# Registration ids per incremental $merge batch
+REFRESH_CHUNK_SIZE = 1000
+
+
+def ensure_indexes(db):
+    """
+    Indexes used by the summary: updated_at windows and per-student reads.
+    """
+    db.payments.create_index([("updated_at", ASCENDING)])
+    db.registration_fees.create_index([("updated_at", ASCENDING)])
+    db[SUMMARY_COLLECTION].create_index([("student_id", ASCENDING)])
+
+
+def summary_pipeline(registration_ids=None, replace=False):
+    """
+    Aggregation over payments grouped by registration, merged into the summary.
+    When registration_ids is given only those registrations are recomputed.
+    With replace=True the result replaces the whole collection ($out) instead.
+    """
+    pipeline = []
+    if registration_ids is not None:
+        pipeline.append({'$match': {'registration_fee_id': {'$in': registration_ids}}})
+
+    pipeline += [
+        {'$group': {
+            '_id': '$registration_fee_id',
+            'total_revenue': {'$sum': '$amount'},
+            'payment_count': {'$sum': 1},
+            'last_payment_date': {'$max': '$payment_date'},
+            'source_updated_at': {'$max': '$updated_at'}
+        }},
+        {'$lookup': {
+            'from': 'registration_fees',
+            'localField': '_id',
+            'foreignField': '_id',
+            'pipeline': [{'$project': {'student_id': 1, 'state': 1, 'created_at': 1}}],
+            'as': 'registration'
+        }},
+        {'$unwind': '$registration'},
+        {'$project': {
+            'student_id': '$registration.student_id',
+            'registration_state': '$registration.state',
+            'registration_created_at': '$registration.created_at',
+            'total_revenue': 1,
+            'payment_count': 1,
+            'last_payment_date': 1,
+            'source_updated_at': 1,
+            'refreshed_at': '$$NOW'
+        }},
+    ]
+    if replace:
+        # $out writes a temporary collection and swaps it in at the end,
+        # keeping the existing indexes
+        pipeline.append({'$out': SUMMARY_COLLECTION})
+    else:
+        pipeline.append({'$merge': {
+            'into': SUMMARY_COLLECTION,
+            'on': '_id',
+            'whenMatched': 'replace',
+            'whenNotMatched': 'insert'
+        }})
+    return pipeline
+
+
+def get_watermark(db):
+    """
+    Return the start time of the last successful build/refresh, or None.
+    """
+    doc = db[WATERMARK_COLLECTION].find_one({'_id': SUMMARY_COLLECTION})
+    return doc['refreshed_at'] if doc else None
+
+
+def set_watermark(db, refreshed_at):
+    """
+    Store the start time of the current build/refresh as the next window start.
+    """
+    db[WATERMARK_COLLECTION].update_one(
+        {'_id': SUMMARY_COLLECTION},
+        {'$set': {'refreshed_at': refreshed_at}},
+        upsert=True
+    )
+
+
+def build_summary(db):
+    """
+    Rebuild the whole summary from payments; the previous summary stays
+    readable until the new one replaces it.
+    """
+    started_at = datetime.now(timezone.utc)
+    db.payments.aggregate(summary_pipeline(replace=True), allowDiskUse=True)
+    set_watermark(db, started_at)
+    return db[SUMMARY_COLLECTION].estimated_document_count()
+
+
+def changed_registration_ids(db, since):
+    """
+    Registrations whose payments or own document changed since the watermark.
+    """
+    changed = set()
+    for doc in db.payments.aggregate([
+        {'$match': {'updated_at': {'$gte': since}}},
+        {'$group': {'_id': '$registration_fee_id'}}
+    ], allowDiskUse=True):
+        changed.add(doc['_id'])
+    for doc in db.registration_fees.find({'updated_at': {'$gte': since}}, {'_id': 1}):
+        changed.add(doc['_id'])
+    return list(changed)
+
+
+def stale_registration_ids(db):
+    """
+    Summary documents whose registration was deleted or no longer has any
+    payment. MongoDB does not cascade, so a deleted registration can leave its
+    payments behind; both sides are checked. Deletions leave no updated_at
+    behind, so they are found by indexed existence lookups per summary document.
+    """
+    return [doc['_id'] for doc in db[SUMMARY_COLLECTION].aggregate([
+        {'$project': {'_id': 1}},
+        {'$lookup': {
+            'from': 'registration_fees',
+            'localField': '_id',
+            'foreignField': '_id',
+            'pipeline': [{'$project': {'_id': 1}}],
+            'as': 'registration'
+        }},
+        {'$lookup': {
+            'from': 'payments',
+            'localField': '_id',
+            'foreignField': 'registration_fee_id',
+            'pipeline': [{'$limit': 1}, {'$project': {'_id': 1}}],
+            'as': 'payment'
+        }},
+        {'$match': {'$or': [{'registration': []}, {'payment': []}]}},
+        {'$project': {'_id': 1}}
+    ], allowDiskUse=True)]
+
+
+def refresh_summary(db, since=None):
+    """
+    Recompute only the registrations touched inside the updated_at window and
+    remove the summaries of registrations that were deleted or left without payments.
+    Falls back to a full build when no watermark exists yet.
+    Returns (recomputed, removed).
+    """
+    since = since or get_watermark(db)
+    if since is None:
+        return build_summary(db), 0
+
+    started_at = datetime.now(timezone.utc)
+    registration_ids = changed_registration_ids(db, since)
+
+    for start in range(0, len(registration_ids), REFRESH_CHUNK_SIZE):
+        chunk = registration_ids[start:start + REFRESH_CHUNK_SIZE]
+        db.payments.aggregate(summary_pipeline(chunk), allowDiskUse=True)
+
+    stale = stale_registration_ids(db)
+    for start in range(0, len(stale), REFRESH_CHUNK_SIZE):
+        db[SUMMARY_COLLECTION].delete_many({'_id': {'$in': stale[start:start + REFRESH_CHUNK_SIZE]}})
+
+    set_watermark(db, started_at)
+    return len(registration_ids), len(stale)
+
+
+def load_summary(db, student_ids=None):
+    """
+    Read the summary as a DataFrame (one row per registration).
+    ObjectIds become strings and Decimal128 totals become floats.
+    """
+    query = {'student_id': {'$in': student_ids}} if student_ids is not None else {}
+    rows = list(db[SUMMARY_COLLECTION].find(query))
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+
+    df = df.rename(columns={'_id': 'registration_id'})
+    df['registration_id'] = df['registration_id'].astype(str)
+    df['student_id'] = df['student_id'].astype(str)
+    df['total_revenue'] = df['total_revenue'].map(
+        lambda value: float(value.to_decimal()) if isinstance(value, Decimal128) else value
+    )
+    return df.sort_values(['student_id', 'registration_created_at']).reset_index(drop=True)
+
+
+def parse_since(value):
+    """
+    ISO date/time for --since; naive values are taken as UTC.
+    """
+    since = datetime.fromisoformat(value)
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+
+def parse_args():
+    """
+    Parse command line options for the summary job.
+    """
+    parser = argparse.ArgumentParser(description='Build or refresh student_payment_summary')
+    parser.add_argument('mode', choices=['build', 'refresh', 'export'],
+                        help='build: full rebuild; refresh: incremental by updated_at; '
+                             'export: write the summary to a file')
+    parser.add_argument('--since', type=parse_since, default=None,
+                        help='Refresh window start (ISO date, UTC unless an offset is given); '
+                             'defaults to the stored watermark')
+    add_output_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+
+    try:
+        ensure_indexes(db)
+
+        if args.mode == 'build':
+            count = build_summary(db)
+            print(f"✓ Resumen reconstruido: {count:,} matrículas")
+        elif args.mode == 'refresh':
+            count, removed = refresh_summary(db, args.since)
+            print(f"✓ Resumen actualizado: {count:,} matrículas recalculadas, {removed:,} eliminadas")
+        else:
+            df = load_summary(db)
+            if df.empty:
+                print("❌ El resumen está vacío; ejecute primero 'build'")
+                sys.exit(1)
+            filename = export_dataframe(df, args.output, prefix='student_payment_summary',
+                                        fmt=args.format, compression=args.compression,
+                                        threads=args.threads)
+            print(f"✅ Resumen exportado a: {filename} ({len(df):,} filas)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,18 @@ Exports denormalized student data with registration fees and payments in wide fo
 One row per student with all their registration fees and associated payments.
 """
 
+import argparse
 import os
 import pandas as pd
 import sys
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from bson import Decimal128
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from export_output import add_output_arguments, export_dataframe
+
 # Load environment variables
 load_dotenv()
 
@@ -20,19 +24,123 @@ load_dotenv()
 MONGO_URI = os.getenv('DB_URI_MONGO', 'mongodb://localhost:27017/')
 DB_NAME = 'football_school_db'
 
+# Student base columns of the wide export, in output order
+STUDENT_COLUMNS = ['name', 'last_name', 'type_document_id', 'document_id',
+                   'email', 'phone', 'student_state', 'headquarter_name']
+
+
+# Slot order of registrations per student and payments per registration
+REGISTRATION_ORDER = {'created_at': 1, 'start_date': 1, '_id': 1}
+PAYMENT_ORDER = {'created_at': 1, 'payment_date': 1, '_id': 1}
 
-def get_student_payment_data(db):
+# Aggregation pipeline producing one long-format row per (student, registration, payment)
+STUDENT_PAYMENT_PIPELINE = [
+    # Student base data (inner joins: students without user/headquarter are skipped)
+    {'$lookup': {
+        'from': 'users',
+        'localField': 'user_id',
+        'foreignField': '_id',
+        'pipeline': [
+            {'$project': {'name': 1, 'last_name': 1, 'type_document_id': 1,
+                          'document_id': 1, 'email': 1, 'phone': 1}}
+        ],
+        'as': 'user'
+    }},
+    {'$unwind': '$user'},
+    {'$lookup': {
+        'from': 'headquarters',
+        'localField': 'headquarter_id',
+        'foreignField': '_id',
+        'pipeline': [{'$project': {'name': 1}}],
+        'as': 'headquarter'
+    }},
+    {'$unwind': '$headquarter'},
+    # Registrations ordered by creation, each with its first 10 payments. Ties on
+    # created_at (millisecond BSON dates) are broken as in the PostgreSQL export:
+    # registrations by start_date, _id; payments by payment_date, _id
+    {'$lookup': {
+        'from': 'registration_fees',
+        'localField': '_id',
+        'foreignField': 'student_id',
+        'pipeline': [
+            {'$sort': REGISTRATION_ORDER},
+            {'$project': {'state': 1, 'created_at': 1}},
+            {'$lookup': {
+                'from': 'payments',
+                'localField': '_id',
+                'foreignField': 'registration_fee_id',
+                'pipeline': [
+                    {'$sort': PAYMENT_ORDER},
+                    {'$limit': 10},
+                    {'$project': {'amount': 1, 'payment_method': 1, 'receipt_number': 1,
+                                  'concept': 1, 'created_at': 1}}
+                ],
+                'as': 'payments'
+            }}
+        ],
+        'as': 'registrations'
+    }},
+    # Flatten to long format, keeping students/registrations without children
+    {'$unwind': {'path': '$registrations', 'includeArrayIndex': 'reg_index',
+                 'preserveNullAndEmptyArrays': True}},
+    {'$unwind': {'path': '$registrations.payments', 'includeArrayIndex': 'payment_index',
+                 'preserveNullAndEmptyArrays': True}},
+    {'$project': {
+        '_id': 0,
+        'student_id': '$_id',
+        'name': '$user.name',
+        'last_name': '$user.last_name',
+        'type_document_id': '$user.type_document_id',
+        'document_id': '$user.document_id',
+        'email': '$user.email',
+        'phone': '$user.phone',
+        'student_state': '$state',
+        'headquarter_name': '$headquarter.name',
+        'reg_number': {'$add': ['$reg_index', 1]},
+        'registration_id': '$registrations._id',
+        'registration_state': '$registrations.state',
+        'registration_created_at': '$registrations.created_at',
+        'payment_number': {'$add': ['$payment_index', 1]},
+        'payment_id': '$registrations.payments._id',
+        'amount': '$registrations.payments.amount',
+        'payment_method': '$registrations.payments.payment_method',
+        'receipt_number': '$registrations.payments.receipt_number',
+        'concept': '$registrations.payments.concept',
+        'payment_created_at': '$registrations.payments.created_at'
+    }}
+]
+
+
+def fetch_rows_aggregate(db, batch_size=5000, student_filter=None):
     """
-    Extract student data with registration fees and payments in denormalized format.
-    One row per student, with columns expanding based on number of registrations and payments.
+    Compute the long-format rows with a single aggregation pipeline.
+    Joins, ordering and the 10-payment limit run server-side; the cursor returns
+    the rows in batches of batch_size instead of issuing queries per student and
+    registration. All rows are collected in memory for the pivot.
+    Requires MongoDB 5.0+ ($lookup with localField/foreignField and pipeline).
+    """
+    pipeline = STUDENT_PAYMENT_PIPELINE
+    if student_filter:
+        pipeline = [{'$match': student_filter}] + pipeline
     
-    This function replicates the PostgreSQL query logic using MongoDB queries.
-    Uses a simpler approach to avoid memory issues with large aggregations.
+    cursor = db.students.aggregate(
+        pipeline,
+        allowDiskUse=True,
+        batchSize=batch_size
+    )
+    # Missing registrations/payments come back as null numbers (NaN in pandas)
+    return list(cursor)
+
+
+def fetch_rows_iterative(db, student_filter=None):
+    """
+    Compute the long-format rows with per-student and per-registration queries.
+    Kept for servers that cannot run the aggregation pipeline (MongoDB < 5.0).
     """
     
     # Fetch all students with their user and headquarter data
     students = []
-    for student in db.students.find():
+    for student in db.students.find(student_filter or {}):
         user = db.users.find_one({'_id': student['user_id']})
         headquarter = db.headquarters.find_one({'_id': student['headquarter_id']})
         
@@ -50,8 +158,7 @@ def get_student_payment_data(db):
             })
     
     if not students:
-        print("⚠️  No students found in database")
-        return pd.DataFrame()
+        return []
     
     # Build complete dataset with registrations and payments
     all_rows = []
@@ -62,7 +169,7 @@ def get_student_payment_data(db):
         # Get registrations for this student
         registrations = list(db.registration_fees.find(
             {'student_id': student_id}
-        ).sort('created_at', 1))
+        ).sort(list(REGISTRATION_ORDER.items())))
         
         if not registrations:
             # Student with no registrations
@@ -73,7 +180,7 @@ def get_student_payment_data(db):
             # Get payments for this registration (limit to 10 as per spec)
             payments = list(db.payments.find(
                 {'registration_fee_id': registration['_id']}
-            ).sort('created_at', 1).limit(10))
+            ).sort(list(PAYMENT_ORDER.items())).limit(10))
             
             if not payments:
                 # Registration with no payments
@@ -100,6 +207,142 @@ def get_student_payment_data(db):
                 row['payment_created_at'] = payment.get('created_at')
                 all_rows.append(row)
     
+    return all_rows
+
+
+def chunked(values, size):
+    """
+    Yield successive lists of at most size items.
+    """
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_rows_hashjoin(db, chunk_size=1000, student_filter=None):
+    """
+    Compute the long-format rows with client-side hash joins.
+    Each collection is read once with a projection, using batched $in queries
+    over chunks of ids, and joined in memory against dict indexes. Round trips
+    grow with the number of chunks, not rows, and no $lookup runs on the server.
+    """
+    students = list(db.students.find(
+        student_filter or {}, {'user_id': 1, 'headquarter_id': 1, 'state': 1}
+    ))
+    if not students:
+        return []
+    
+    # Dimension indexes: user_id -> user, headquarter_id -> name
+    users = {}
+    user_ids = list({s['user_id'] for s in students})
+    for ids in chunked(user_ids, chunk_size):
+        for user in db.users.find(
+            {'_id': {'$in': ids}},
+            {'name': 1, 'last_name': 1, 'type_document_id': 1,
+             'document_id': 1, 'email': 1, 'phone': 1}
+        ):
+            users[user['_id']] = user
+    
+    headquarters = {}
+    headquarter_ids = list({s['headquarter_id'] for s in students})
+    for ids in chunked(headquarter_ids, chunk_size):
+        for headquarter in db.headquarters.find({'_id': {'$in': ids}}, {'name': 1}):
+            headquarters[headquarter['_id']] = headquarter.get('name')
+    
+    # student_id -> registrations in REGISTRATION_ORDER
+    registrations = {}
+    student_ids = [s['_id'] for s in students]
+    for ids in chunked(student_ids, chunk_size):
+        for registration in db.registration_fees.find(
+            {'student_id': {'$in': ids}},
+            {'student_id': 1, 'state': 1, 'created_at': 1}
+        ).sort([('student_id', 1)] + list(REGISTRATION_ORDER.items())):
+            registrations.setdefault(registration['student_id'], []).append(registration)
+    
+    # registration_id -> first 10 payments in PAYMENT_ORDER
+    payments = {}
+    registration_ids = [r['_id'] for regs in registrations.values() for r in regs]
+    for ids in chunked(registration_ids, chunk_size):
+        for payment in db.payments.find(
+            {'registration_fee_id': {'$in': ids}},
+            {'registration_fee_id': 1, 'amount': 1, 'payment_method': 1,
+             'receipt_number': 1, 'concept': 1, 'created_at': 1}
+        ).sort([('registration_fee_id', 1)] + list(PAYMENT_ORDER.items())):
+            reg_payments = payments.setdefault(payment['registration_fee_id'], [])
+            if len(reg_payments) < 10:
+                reg_payments.append(payment)
+    
+    # Probe the indexes to build the rows
+    all_rows = []
+    for student in students:
+        user = users.get(student['user_id'])
+        if user is None or student['headquarter_id'] not in headquarters:
+            continue
+        
+        base = {
+            'student_id': student['_id'],
+            'name': user.get('name'),
+            'last_name': user.get('last_name'),
+            'type_document_id': user.get('type_document_id'),
+            'document_id': user.get('document_id'),
+            'email': user.get('email'),
+            'phone': user.get('phone'),
+            'student_state': student.get('state'),
+            'headquarter_name': headquarters[student['headquarter_id']]
+        }
+        
+        student_registrations = registrations.get(student['_id'], [])
+        if not student_registrations:
+            all_rows.append(base)
+            continue
+        
+        for reg_idx, registration in enumerate(student_registrations, 1):
+            reg_row = dict(base)
+            reg_row['reg_number'] = reg_idx
+            reg_row['registration_id'] = registration['_id']
+            reg_row['registration_state'] = registration.get('state')
+            reg_row['registration_created_at'] = registration.get('created_at')
+            
+            reg_payments = payments.get(registration['_id'], [])
+            if not reg_payments:
+                all_rows.append(reg_row)
+                continue
+            
+            for pay_idx, payment in enumerate(reg_payments, 1):
+                row = dict(reg_row)
+                row['payment_number'] = pay_idx
+                row['payment_id'] = payment['_id']
+                row['amount'] = payment.get('amount')
+                row['payment_method'] = payment.get('payment_method')
+                row['receipt_number'] = payment.get('receipt_number')
+                row['concept'] = payment.get('concept')
+                row['payment_created_at'] = payment.get('created_at')
+                all_rows.append(row)
+    
+    return all_rows
+
+
+FETCH_STRATEGIES = {
+    'aggregate': fetch_rows_aggregate,
+    'hashjoin': fetch_rows_hashjoin,
+    'iterative': fetch_rows_iterative,
+}
+
+
+def get_student_payment_data(db, strategy='aggregate', **fetch_options):
+    """
+    Extract student data with registration fees and payments in denormalized format.
+    One row per student, with columns expanding based on number of registrations and payments.
+    
+    This function replicates the PostgreSQL query logic using MongoDB queries.
+    The strategy selects how the long-format rows are fetched (see FETCH_STRATEGIES).
+    """
+    
+    all_rows = FETCH_STRATEGIES[strategy](db, **fetch_options)
+    
+    if not all_rows:
+        print("⚠️  No students found in database")
+        return pd.DataFrame()
+    
     # Convert to DataFrame
     df = pd.DataFrame(all_rows)
     
@@ -117,6 +360,76 @@ def get_student_payment_data(db):
     return wide_df
 
 
+def compute_id_ranges(db, partitions):
+    """
+    Split the students _id space into roughly equal ranges using $bucketAuto.
+    Returns a list of (lower, upper) bounds; lower is inclusive, upper exclusive,
+    and the last range is open-ended (upper is None).
+    """
+    buckets = list(db.students.aggregate([
+        {'$bucketAuto': {'groupBy': '$_id', 'buckets': partitions}}
+    ], allowDiskUse=True))
+    lower_bounds = [bucket['_id']['min'] for bucket in buckets]
+    return [
+        (lower, lower_bounds[i + 1] if i + 1 < len(lower_bounds) else None)
+        for i, lower in enumerate(lower_bounds)
+    ]
+
+
+def export_partition(id_range, strategy, fetch_options):
+    """
+    Worker entry point: join and pivot one _id range with its own MongoClient.
+    """
+    lower, upper = id_range
+    student_filter = {'_id': {'$gte': lower}}
+    if upper is not None:
+        student_filter['_id']['$lt'] = upper
+    
+    client = MongoClient(MONGO_URI)
+    try:
+        return get_student_payment_data(
+            client[DB_NAME], strategy=strategy, student_filter=student_filter, **fetch_options
+        )
+    finally:
+        client.close()
+
+
+def get_student_payment_data_parallel(db, workers, strategy='aggregate', **fetch_options):
+    """
+    Range-partitioned export: each students _id range is fetched and pivoted in a
+    separate worker process, then the wide partitions are merged in document_id order.
+    """
+    id_ranges = compute_id_ranges(db, workers)
+    if not id_ranges:
+        print("⚠️  No students found in database")
+        return pd.DataFrame()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(
+            export_partition,
+            id_ranges,
+            [strategy] * len(id_ranges),
+            [fetch_options] * len(id_ranges)
+        ))
+    
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    
+    result_df = pd.concat(frames, ignore_index=True, sort=False)
+    result_df = result_df.sort_values('document_id', kind='stable')
+    
+    # One row per document_id, as in the serial path: a document_id shared by
+    # students in different ranges keeps the row of the lowest _id range
+    result_df = result_df.drop_duplicates(subset=['document_id']).reset_index(drop=True)
+    
+    # Partitions may have different registration/payment columns: restore the layout
+    student_cols = [col for col in STUDENT_COLUMNS if col in result_df.columns]
+    reg_payment_cols = sorted([col for col in result_df.columns if col not in student_cols])
+    
+    return result_df[student_cols + reg_payment_cols]
+
+
 def denormalize_student_data(df):
     """
     Convert long format data to wide format with one row per student.
@@ -126,8 +439,7 @@ def denormalize_student_data(df):
     """
     
     # Get student base columns
-    student_columns = ['name', 'last_name', 'type_document_id', 'document_id', 
-                      'email', 'phone', 'student_state', 'headquarter_name']
+    student_columns = STUDENT_COLUMNS
     
     # Group by student to create one row per student
     students = df[student_columns].drop_duplicates(subset=['document_id'])
@@ -185,22 +497,39 @@ def denormalize_student_data(df):
     return result_df
 
 
-def export_to_csv(df, filename=None):
+def export_to_csv(df, filename=None, fmt=None, compression=None, threads=None):
     """
-    Export dataframe to CSV file.
+    Export dataframe to CSV (optionally gzip/zstd compressed) or Parquet.
+    Format and compression come from the arguments or the filename extension;
+    without either, writes an uncompressed timestamped CSV as before.
     """
-    if filename is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'student_payment_bi_export_mongodb_{timestamp}.csv'
-    
-    df.to_csv(filename, index=False, encoding='utf-8')
-    return filename
+    return export_dataframe(df, filename, prefix='student_payment_bi_export_mongodb', fmt=fmt,
+                            compression=compression, threads=threads)
+
+
+def parse_args():
+    """
+    Parse command line options for the export.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--strategy', choices=sorted(FETCH_STRATEGIES), default='aggregate',
+                        help='How rows are fetched: one aggregation pipeline (default), '
+                             'client-side hash joins over batched $in queries, '
+                             'or per-document queries')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Ids per $in query for the hashjoin strategy')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parallel worker processes over students _id ranges')
+    add_output_arguments(parser)
+    return parser.parse_args()
 
 
 def main():
     """
     Main function to connect to MongoDB, extract data, and export to CSV.
     """
+    args = parse_args()
+
     try:
         print("🔌 Connecting to MongoDB...")
         client = MongoClient(MONGO_URI)
@@ -211,7 +540,12 @@ def main():
         print(f"✓ Connected to database: {DB_NAME}")
         
         print("📊 Extracting and transforming student payment data...")
-        df = get_student_payment_data(db)
+        fetch_options = {'chunk_size': args.chunk_size} if args.strategy == 'hashjoin' else {}
+        if args.workers > 1:
+            df = get_student_payment_data_parallel(db, args.workers, strategy=args.strategy,
+                                                   **fetch_options)
+        else:
+            df = get_student_payment_data(db, strategy=args.strategy, **fetch_options)
         
         if df.empty:
             print("❌ No data to export")
@@ -241,9 +575,10 @@ def main():
         state_cols = [col for col in df.columns if col.startswith('state_')]
         print(f"  Registration columns: {len(state_cols)}")
         
-        # Export to CSV
-        print("\n💾 Exporting to CSV...")
-        filename = export_to_csv(df)
+        # Export to CSV / Parquet
+        print("\n💾 Exporting data...")
+        filename = export_to_csv(df, args.output, fmt=args.format,
+                                 compression=args.compression, threads=args.threads)
         print(f"✅ Data successfully exported to: {filename}")
         
         # Display sample data
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Model Feature Export Script - Student Features (MongoDB)
+Computes per-student model features with aggregation pipelines ($group,
+$setWindowFields, $dateDiff) and exports a compact numeric matrix: one row
+per student, no pivoting or cleaning of the sparse wide BI table.
+Requires MongoDB 5.0+ ($setWindowFields / $dateDiff).
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+import pandas as pd
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from export_output import add_output_arguments, export_dataframe
+from export_student_data import DB_NAME, MONGO_URI
+from student_features import (ATTENDANCE_WINDOWS, FEATURE_COLUMNS, PAYMENT_METHODS,
+                              RECENT_PAYMENT_DAYS, finalize_features, method_column)
+
+
+def count_if(condition):
+    """
+    $sum expression counting documents that match condition.
+    """
+    return {'$sum': {'$cond': [condition, 1, 0]}}
+
+
+def days_between(start, as_of):
+    """
+    Whole days from start to the reference date.
+    """
+    return {'$dateDiff': {'startDate': start, 'endDate': as_of, 'unit': 'day'}}
+
+
+def end_of_day(as_of):
+    """
+    Exclusive upper bound of the data used: documents dated after the
+    reference day are left out, as with PostgreSQL's `<= as_of` filters.
+    """
+    return as_of + timedelta(days=1)
+
+
+def students_pipeline():
+    """
+    Exported students (same inner joins as the BI export) with their state.
+    """
+    return [
+        {'$lookup': {'from': 'users', 'localField': 'user_id', 'foreignField': '_id',
+                     'pipeline': [{'$project': {'_id': 1}}], 'as': 'user'}},
+        {'$match': {'user': {'$ne': []}}},
+        {'$lookup': {'from': 'headquarters', 'localField': 'headquarter_id', 'foreignField': '_id',
+                     'pipeline': [{'$project': {'_id': 1}}], 'as': 'headquarter'}},
+        {'$match': {'headquarter': {'$ne': []}}},
+        {'$project': {'_id': 1, 'student_state': '$state'}},
+    ]
+
+
+def registration_pipeline(as_of):
+    """
+    registration_fees created up to as_of, grouped by student; the
+    (student_id, created_at, start_date, _id) index serves the sort, so $last is
+    the latest registration, with created_at ties broken by the later start_date
+    as in the PostgreSQL recency ranking.
+    """
+    return [
+        {'$match': {'created_at': {'$lt': end_of_day(as_of)}}},
+        {'$sort': {'student_id': 1, 'created_at': 1, 'start_date': 1, '_id': 1}},
+        {'$group': {
+            '_id': '$student_id',
+            'registration_count': {'$sum': 1},
+            'registrations_active': count_if({'$eq': ['$state', 'active']}),
+            'registrations_expired': count_if({'$eq': ['$state', 'expired']}),
+            'registrations_cancelled': count_if({'$eq': ['$state', 'cancelled']}),
+            'latest_state': {'$last': '$state'},
+            'last_created': {'$last': '$created_at'},
+        }},
+        {'$project': {
+            'registration_count': 1,
+            'registrations_active': 1,
+            'registrations_expired': 1,
+            'registrations_cancelled': 1,
+            'latest_registration_active': {'$cond': [{'$eq': ['$latest_state', 'active']}, 1, 0]},
+            'days_since_last_registration': days_between('$last_created', as_of),
+        }},
+    ]
+
+
+def payment_pipeline(as_of):
+    """
+    Payments up to as_of joined to their registration's student (registration_fee_id
+    index), gaps between consecutive payments via $setWindowFields, then grouped per student.
+    """
+    recent = as_of - timedelta(days=RECENT_PAYMENT_DAYS)
+    method_counts = {
+        f'count_{method}': count_if({'$eq': ['$payment_method', method]})
+        for method in PAYMENT_METHODS
+    }
+    return [
+        {'$project': {'student_id': 1}},
+        {'$lookup': {
+            'from': 'payments',
+            'localField': '_id',
+            'foreignField': 'registration_fee_id',
+            'pipeline': [
+                {'$match': {'payment_date': {'$lt': end_of_day(as_of)}}},
+                {'$project': {'_id': 0, 'amount': {'$toDouble': '$amount'},
+                              'payment_date': 1, 'payment_method': 1}},
+            ],
+            'as': 'payment'
+        }},
+        {'$unwind': '$payment'},
+        {'$replaceWith': {'$mergeObjects': ['$payment', {'student_id': '$student_id'}]}},
+        {'$setWindowFields': {
+            'partitionBy': '$student_id',
+            'sortBy': {'payment_date': 1},
+            'output': {'previous_date': {'$shift': {'output': '$payment_date', 'by': -1}}},
+        }},
+        {'$group': {
+            '_id': '$student_id',
+            'payment_count': {'$sum': 1},
+            'payment_total': {'$sum': '$amount'},
+            'payment_mean': {'$avg': '$amount'},
+            'payment_max': {'$max': '$amount'},
+            'payment_std': {'$stdDevSamp': '$amount'},
+            'first_payment': {'$min': '$payment_date'},
+            'last_payment': {'$max': '$payment_date'},
+            'mean_days_between_payments': {'$avg': {'$cond': [
+                {'$eq': ['$previous_date', None]}, None,
+                {'$dateDiff': {'startDate': '$previous_date', 'endDate': '$payment_date', 'unit': 'day'}}
+            ]}},
+            'payments_recent': count_if({'$gt': ['$payment_date', recent]}),
+            'amount_recent': {'$sum': {'$cond': [{'$gt': ['$payment_date', recent]}, '$amount', 0]}},
+            **method_counts,
+        }},
+        {'$project': {
+            'payment_count': 1,
+            'payment_total': 1,
+            'payment_mean': 1,
+            'payment_max': 1,
+            'payment_std': 1,
+            'days_since_first_payment': days_between('$first_payment', as_of),
+            'days_since_last_payment': days_between('$last_payment', as_of),
+            'mean_days_between_payments': 1,
+            'payments_recent': 1,
+            'amount_recent': 1,
+            **{method_column(method): {'$divide': [f'$count_{method}', '$payment_count']}
+               for method in PAYMENT_METHODS},
+        }},
+    ]
+
+
+def attendance_pipeline(as_of):
+    """
+    classes_attendances up to as_of grouped by student with attendance rates per window.
+    """
+    window_counts = {}
+    window_rates = {}
+    for days in ATTENDANCE_WINDOWS:
+        cutoff = as_of - timedelta(days=days)
+        in_window = {'$gt': ['$date', cutoff]}
+        window_counts[f'total_{days}d'] = count_if(in_window)
+        window_counts[f'attended_{days}d'] = count_if({'$and': [in_window, '$attended']})
+        window_rates[f'attendance_rate_{days}d'] = {'$cond': [
+            {'$gt': [f'$total_{days}d', 0]},
+            {'$divide': [f'$attended_{days}d', f'$total_{days}d']},
+            None
+        ]}
+
+    return [
+        {'$match': {'date': {'$lt': end_of_day(as_of)}}},
+        {'$group': {
+            '_id': '$student_id',
+            'attendance_count': {'$sum': 1},
+            'attended': count_if('$attended'),
+            'last_attendance': {'$max': '$date'},
+            **window_counts,
+        }},
+        {'$project': {
+            'attendance_count': 1,
+            'attendance_rate': {'$divide': ['$attended', '$attendance_count']},
+            'days_since_last_attendance': days_between('$last_attendance', as_of),
+            **window_rates,
+        }},
+    ]
+
+
+def aggregate_frame(collection, pipeline):
+    """
+    Run a per-student pipeline and return a DataFrame keyed by student_id.
+    """
+    rows = list(collection.aggregate(pipeline, allowDiskUse=True))
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=['student_id'])
+    df['student_id'] = df.pop('_id').astype(str)
+    return df
+
+
+def get_student_features(db, as_of=None):
+    """
+    Run the four aggregations in MongoDB and join their small per-student results.
+    """
+    as_of = as_of or datetime.combine(datetime.now().date(), datetime.min.time())
+
+    students = aggregate_frame(db.students, students_pipeline())
+    features = students
+    for collection, pipeline in (
+        (db.registration_fees, registration_pipeline(as_of)),
+        (db.registration_fees, payment_pipeline(as_of)),
+        (db.classes_attendances, attendance_pipeline(as_of)),
+    ):
+        features = features.merge(aggregate_frame(collection, pipeline), on='student_id', how='left')
+
+    return finalize_features(features.sort_values('student_id'))
+
+
+def parse_args():
+    """
+    Parse command line options for the feature export.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_output_arguments(parser)
+    parser.add_argument('--as-of', type=datetime.fromisoformat, default=None,
+                        help='Reference date: recency, windows and the last day of data used (YYYY-MM-DD, default: today)')
+    return parser.parse_args()
+
+
+def main():
+    """
+    Compute the features in MongoDB and export them (Parquet by default).
+    """
+    args = parse_args()
+
+    client = MongoClient(MONGO_URI)
+    try:
+        print("🧮 Computing student features in MongoDB...")
+        features = get_student_features(client[DB_NAME], args.as_of)
+
+        print(f"✓ Students: {len(features):,}")
+        print(f"✓ Features: {len(FEATURE_COLUMNS)}")
+
+        fmt = args.format or (None if args.output else 'parquet')
+        filename = export_dataframe(features, args.output, prefix='student_features', fmt=fmt,
+                                    compression=args.compression, threads=args.threads)
+        print(f"✅ Features exported to: {filename}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,7 @@ Características implementadas:
 
 import os
 import random
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 from faker import Faker
 import sys
 from bson import ObjectId, Decimal128
@@ -138,12 +138,27 @@ class FootballSchoolMongoDBGenerator:
         self.db.teachers_classes.create_index([("teacher_role", ASCENDING)])
         
         # Registration_fees indexes
-        self.db.registration_fees.create_index([("student_id", ASCENDING)])
+        # Compuesto para la exportación: filtro por student_id, orden por
+        # created_at, start_date, _id y proyección cubierta (state) sin leer documentos
+        self.db.registration_fees.create_index([
+            ("student_id", ASCENDING),
+            ("created_at", ASCENDING),
+            ("start_date", ASCENDING),
+            ("_id", ASCENDING),
+            ("state", ASCENDING)
+        ])
         self.db.registration_fees.create_index([("state", ASCENDING)])
         self.db.registration_fees.create_index([("start_date", ASCENDING), ("end_date", ASCENDING)])
         
         # Payments indexes
-        self.db.payments.create_index([("registration_fee_id", ASCENDING)])
+        # Compuesto para la exportación: primeros 10 pagos por matrícula
+        # (created_at, payment_date, _id) sin SORT en memoria
+        self.db.payments.create_index([
+            ("registration_fee_id", ASCENDING),
+            ("created_at", ASCENDING),
+            ("payment_date", ASCENDING),
+            ("_id", ASCENDING)
+        ])
         self.db.payments.create_index([("payment_date", ASCENDING)])
         self.db.payments.create_index([("payment_method", ASCENDING)])
         
@@ -155,6 +170,8 @@ class FootballSchoolMongoDBGenerator:
         ], unique=True)
         self.db.classes_attendances.create_index([("student_id", ASCENDING)])
         self.db.classes_attendances.create_index([("class_id", ASCENDING)])
+        self.db.classes_attendances.create_index([("headquarter_id", ASCENDING)])
+        self.db.classes_attendances.create_index([("teacher_id", ASCENDING)])
         self.db.classes_attendances.create_index([("date", ASCENDING)])
         self.db.classes_attendances.create_index([("attended", ASCENDING)])
         
@@ -216,8 +233,8 @@ class FootballSchoolMongoDBGenerator:
                 'name': name,
                 'address': address,
                 'legal_name': legal_name,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             documents.append(document)
         
@@ -262,8 +279,8 @@ class FootballSchoolMongoDBGenerator:
                 'phone': phone,
                 'birthday': birthday,
                 'user_type': 'pending',  # Will be updated when creating students/teachers
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             
             documents.append(user_data)
@@ -304,15 +321,15 @@ class FootballSchoolMongoDBGenerator:
                 'user_id': user_id,
                 'headquarter_id': headquarter_id,
                 'state': state,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             documents.append(document)
             
             # Update user type
             self.db.users.update_one(
                 {'_id': user_id},
-                {'$set': {'user_type': 'student', 'updated_at': datetime.now()}}
+                {'$set': {'user_type': 'student', 'updated_at': datetime.now(timezone.utc)}}
             )
         
         self.db.students.insert_many(documents)
@@ -339,15 +356,15 @@ class FootballSchoolMongoDBGenerator:
                 'user_id': user_id,
                 'studies': studies,
                 'professional_license': professional_license,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             documents.append(document)
             
             # Update user type
             self.db.users.update_one(
                 {'_id': user_id},
-                {'$set': {'user_type': 'teacher', 'updated_at': datetime.now()}}
+                {'$set': {'user_type': 'teacher', 'updated_at': datetime.now(timezone.utc)}}
             )
         
         self.db.teachers.insert_many(documents)
@@ -378,8 +395,8 @@ class FootballSchoolMongoDBGenerator:
                 'capacity': capacity,
                 'schedule': schedule,
                 'class_type': class_type,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             documents.append(document)
         
@@ -404,7 +421,7 @@ class FootballSchoolMongoDBGenerator:
                     'headquarter_id': hq_id,
                     'start_date': datetime.combine(start_date, datetime.min.time()),
                     'end_date': datetime.combine(end_date, datetime.min.time()),
-                    'created_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
         
@@ -429,8 +446,8 @@ class FootballSchoolMongoDBGenerator:
                     'student_id': student_id,
                     'class_id': class_id,
                     'state': state,
-                    'created_at': datetime.now(),
-                    'updated_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc),
+                    'updated_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
         
@@ -459,7 +476,7 @@ class FootballSchoolMongoDBGenerator:
                     'teacher_role': role,
                     'start_date': datetime.combine(start_date, datetime.min.time()),
                     'end_date': datetime.combine(end_date_val, datetime.min.time()) if end_date_val else None,
-                    'created_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
         
@@ -490,8 +507,8 @@ class FootballSchoolMongoDBGenerator:
                     'start_date': datetime.combine(start_date, datetime.min.time()),
                     'end_date': datetime.combine(end_date, datetime.min.time()),
                     'state': state,
-                    'created_at': datetime.now(),
-                    'updated_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc),
+                    'updated_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
         
@@ -534,8 +551,8 @@ class FootballSchoolMongoDBGenerator:
                     'payment_method': payment_method,
                     'receipt_number': receipt_number,
                     'concept': concept,
-                    'created_at': datetime.now(),
-                    'updated_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc),
+                    'updated_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
                 
@@ -594,8 +611,8 @@ class FootballSchoolMongoDBGenerator:
                     'date': datetime.combine(attendance_date, datetime.min.time()),
                     'attended': attended,
                     'observations': observations,
-                    'created_at': datetime.now(),
-                    'updated_at': datetime.now()
+                    'created_at': datetime.now(timezone.utc),
+                    'updated_at': datetime.now(timezone.utc)
                 }
                 documents.append(document)
                 
@@ -684,14 +701,27 @@ class FootballSchoolMongoDBGenerator:
             self.db.teachers_classes.create_index([("teacher_id", ASCENDING), ("class_id", ASCENDING)])
             self.db.teachers_classes.create_index([("class_id", ASCENDING)])
             self.db.teachers_classes.create_index([("teacher_role", ASCENDING)])
-            self.db.registration_fees.create_index([("student_id", ASCENDING)])
+            self.db.registration_fees.create_index([
+                ("student_id", ASCENDING),
+                ("created_at", ASCENDING),
+                ("start_date", ASCENDING),
+                ("_id", ASCENDING),
+                ("state", ASCENDING)
+            ])
             self.db.registration_fees.create_index([("state", ASCENDING)])
             self.db.registration_fees.create_index([("start_date", ASCENDING), ("end_date", ASCENDING)])
-            self.db.payments.create_index([("registration_fee_id", ASCENDING)])
+            self.db.payments.create_index([
+                ("registration_fee_id", ASCENDING),
+                ("created_at", ASCENDING),
+                ("payment_date", ASCENDING),
+                ("_id", ASCENDING)
+            ])
             self.db.payments.create_index([("payment_date", ASCENDING)])
             self.db.payments.create_index([("payment_method", ASCENDING)])
             self.db.classes_attendances.create_index([("student_id", ASCENDING)])
             self.db.classes_attendances.create_index([("class_id", ASCENDING)])
+            self.db.classes_attendances.create_index([("headquarter_id", ASCENDING)])
+            self.db.classes_attendances.create_index([("teacher_id", ASCENDING)])
             self.db.classes_attendances.create_index([("date", ASCENDING)])
             self.db.classes_attendances.create_index([("attended", ASCENDING)])
             print("✓ Índices adicionales creados")
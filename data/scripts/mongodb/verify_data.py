@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 """
 Script to verify MongoDB data generation
+
+Modes:
+- fast: estimated_document_count on every collection, run in parallel
+  (reads collection metadata, no scan)
+- deep: fast counts plus exact orphan-reference checks for every foreign key,
+  run in parallel as index-backed aggregations
 """
 
+import argparse
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
@@ -12,20 +23,165 @@ load_dotenv()
 MONGO_URI = os.getenv('DB_URI_MONGO', 'mongodb://localhost:27017/')
 DB_NAME = 'football_school_db'
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-
-print("\n📊 RESUMEN DE DATOS EN MONGODB:")
-print("=" * 50)
-
-collections = [
+COLLECTIONS = [
     'users', 'headquarters', 'students', 'teachers', 'classes',
     'classes_headquarters', 'students_classes', 'teachers_classes',
     'registration_fees', 'payments', 'classes_attendances'
 ]
 
-for collection in collections:
-    count = db[collection].count_documents({})
-    print(f"{collection:25}: {count:>8,} registros")
+# (collection, field, referenced collection): field must match an _id there
+REFERENCES = [
+    ('students', 'user_id', 'users'),
+    ('students', 'headquarter_id', 'headquarters'),
+    ('teachers', 'user_id', 'users'),
+    ('classes_headquarters', 'class_id', 'classes'),
+    ('classes_headquarters', 'headquarter_id', 'headquarters'),
+    ('students_classes', 'student_id', 'students'),
+    ('students_classes', 'class_id', 'classes'),
+    ('teachers_classes', 'teacher_id', 'teachers'),
+    ('teachers_classes', 'class_id', 'classes'),
+    ('registration_fees', 'student_id', 'students'),
+    ('payments', 'registration_fee_id', 'registration_fees'),
+    ('classes_attendances', 'student_id', 'students'),
+    ('classes_attendances', 'class_id', 'classes'),
+    ('classes_attendances', 'headquarter_id', 'headquarters'),
+    ('classes_attendances', 'teacher_id', 'teachers'),
+]
+
+# Orphan keys reported per reference
+SAMPLE_SIZE = 5
+
+
+def count_collection(db, collection):
+    """
+    Approximate count from collection metadata (no scan).
+    """
+    return collection, db[collection].estimated_document_count()
+
+
+def check_reference(db, collection, field, referenced):
+    """
+    Find values of collection.field that have no matching _id in referenced.
+    Distinct keys are grouped first (covered by the field index), so the
+    $lookup probes the referenced _id index once per key, not per document.
+    """
+    pipeline = [
+        {'$match': {field: {'$ne': None}}},
+        {'$project': {'_id': 0, field: 1}},
+        {'$group': {'_id': f'${field}', 'documents': {'$sum': 1}}},
+        {'$lookup': {
+            'from': referenced,
+            'localField': '_id',
+            'foreignField': '_id',
+            'pipeline': [{'$project': {'_id': 1}}],
+            'as': 'match'
+        }},
+        {'$match': {'match': {'$size': 0}}},
+        {'$facet': {
+            'summary': [{'$group': {
+                '_id': None,
+                'orphan_keys': {'$sum': 1},
+                'orphan_documents': {'$sum': '$documents'}
+            }}],
+            'samples': [{'$limit': SAMPLE_SIZE}, {'$project': {'_id': 1}}]
+        }}
+    ]
+    result = next(db[collection].aggregate(pipeline, allowDiskUse=True))
+    summary = result['summary'][0] if result['summary'] else {}
+
+    return {
+        'collection': collection,
+        'field': field,
+        'references': referenced,
+        'orphan_keys': summary.get('orphan_keys', 0),
+        'orphan_documents': summary.get('orphan_documents', 0),
+        'samples': [str(doc['_id']) for doc in result['samples']],
+    }
+
+
+def verify(db, mode='fast', workers=None, require_data=False):
+    """
+    Run the verification and return a structured report. ok reflects the orphan
+    checks; with require_data an empty collection also fails it.
+    """
+    started = time.perf_counter()
+    workers = workers or len(COLLECTIONS)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        counts = dict(executor.map(lambda c: count_collection(db, c), COLLECTIONS))
+
+        orphans = []
+        if mode == 'deep':
+            orphans = list(executor.map(lambda ref: check_reference(db, *ref), REFERENCES))
+
+    return {
+        'database': db.name,
+        'mode': mode,
+        'counts': {collection: counts[collection] for collection in COLLECTIONS},
+        'orphans': orphans,
+        'ok': all(check['orphan_documents'] == 0 for check in orphans)
+              and (not require_data or all(counts.values())),
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def print_report(report):
+    """
+    Print the report as a human-readable summary.
+    """
+    print("\n📊 RESUMEN DE DATOS EN MONGODB:")
+    print("=" * 50)
+
+    for collection, count in report['counts'].items():
+        print(f"{collection:25}: {count:>8,} registros")
+
+    if report['mode'] == 'deep':
+        print("\n🔗 REFERENCIAS HUÉRFANAS:")
+        print("=" * 50)
+        for check in report['orphans']:
+            reference = f"{check['collection']}.{check['field']} -> {check['references']}"
+            status = "✓" if check['orphan_documents'] == 0 else "❌"
+            print(f"{status} {reference:55}: {check['orphan_documents']:>8,} documentos")
+            if check['samples']:
+                print(f"    ejemplos: {', '.join(check['samples'])}")
+
+    status = "✅ Verificación correcta" if report['ok'] else "❌ Verificación con errores"
+    print(f"\n{status} ({report['mode']}, {report['elapsed_seconds']}s)")
+
+
+def parse_args():
+    """
+    Parse command line options for the verification.
+    """
+    parser = argparse.ArgumentParser(description='Verify MongoDB data generation')
+    parser.add_argument('--mode', choices=['fast', 'deep'], default='fast',
+                        help='fast: estimated counts; deep: counts + orphan references')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel checks (default: one per collection)')
+    parser.add_argument('--require-data', action='store_true',
+                        help='Also fail if any collection is empty')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    client = MongoClient(MONGO_URI)
+    try:
+        report = verify(client[DB_NAME], mode=args.mode, workers=args.workers,
+                        require_data=args.require_data)
+    finally:
+        client.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    sys.exit(0 if report['ok'] else 1)
+
 
-client.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Script to verify that the export queries are served by the compound indexes.
+Runs explain() on each export query shape and fails when the winning plan
+contains an in-memory SORT stage or a COLLSCAN, or when a $lookup of the
+aggregate export scans its foreign collection.
+"""
+
+import os
+import sys
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export'))
+from export_student_data import PAYMENT_ORDER, REGISTRATION_ORDER, STUDENT_PAYMENT_PIPELINE
+
+load_dotenv()
+
+MONGO_URI = os.getenv('DB_URI_MONGO', 'mongodb://localhost:27017/')
+DB_NAME = 'football_school_db'
+
+FORBIDDEN_STAGES = {'SORT', 'COLLSCAN'}
+
+# Ids per sample $in chunk (the hashjoin strategy's default --chunk-size)
+CHUNK_SIZE = 1000
+
+
+def plan_nodes(plan):
+    """
+    Collect every stage node in an explain plan tree (classic and SBE layouts).
+    """
+    nodes = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            nodes.append(plan)
+        for value in plan.values():
+            nodes.extend(plan_nodes(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            nodes.extend(plan_nodes(item))
+    return nodes
+
+
+def plan_stages(plan):
+    """
+    Collect every stage name in an explain plan tree.
+    """
+    return [node['stage'] for node in plan_nodes(plan)]
+
+
+def explain_problems(explain):
+    """
+    Return (stage names, failing stages) of a find() or aggregate explain.
+    Aggregate $lookup stages are listed as '$lookup <from>' and fail when their
+    sub-pipeline scanned a collection; a $lookup pushed down to the query engine
+    (EQ_LOOKUP) fails unless it probes an index.
+    """
+    stages_explain = explain.get('stages', [])
+    planner = explain.get('queryPlanner') or stages_explain[0]['$cursor']['queryPlanner']
+    nodes = plan_nodes(planner['winningPlan'])
+
+    stages = [node['stage'] for node in nodes]
+    bad = FORBIDDEN_STAGES.intersection(stages)
+    for node in nodes:
+        if node['stage'] == 'EQ_LOOKUP' and node.get('strategy') != 'IndexedLoopJoin':
+            bad.add(f"EQ_LOOKUP {node.get('strategy')}")
+
+    for stage in stages_explain:
+        if '$lookup' in stage:
+            name = f"$lookup {stage['$lookup']['from']}"
+            stages.append(name)
+            if stage.get('collectionScans', 0):
+                bad.add(f"{name} COLLSCAN")
+    return stages, bad
+
+
+def export_query_shapes(db):
+    """
+    Build (label, explain callable) for the queries of the export strategies,
+    using sample ids: a chunk of CHUNK_SIZE students and their registrations.
+    The aggregate pipeline runs with executionStats on that chunk only, so its
+    $lookup stages report how they read the foreign collections.
+    """
+    student_ids = [s['_id'] for s in db.students.find({}, {'_id': 1}).limit(CHUNK_SIZE)]
+    registration_ids = [r['_id'] for r in db.registration_fees.find(
+        {'student_id': {'$in': student_ids}}, {'_id': 1}).limit(CHUNK_SIZE)]
+    if not student_ids or not registration_ids:
+        return []
+
+    aggregate = {
+        'aggregate': 'students',
+        'pipeline': [{'$match': {'_id': {'$in': student_ids}}}] + STUDENT_PAYMENT_PIPELINE,
+        'cursor': {},
+        'allowDiskUse': True,
+    }
+
+    return [
+        (f'student payment pipeline, {len(student_ids)} students (aggregate)',
+         lambda: db.command('explain', aggregate, verbosity='executionStats')),
+        ('registration_fees by student (iterative / $lookup)',
+         db.registration_fees.find({'student_id': student_ids[0]})
+         .sort(list(REGISTRATION_ORDER.items())).explain),
+        ('payments by registration, first 10 (iterative / $lookup)',
+         db.payments.find({'registration_fee_id': registration_ids[0]})
+         .sort(list(PAYMENT_ORDER.items())).limit(10).explain),
+        (f'registration_fees $in batch of {len(student_ids)}, covered (hashjoin)',
+         db.registration_fees.find(
+             {'student_id': {'$in': student_ids}},
+             {'student_id': 1, 'state': 1, 'created_at': 1}
+         ).sort([('student_id', 1)] + list(REGISTRATION_ORDER.items())).explain),
+        (f'payments $in batch of {len(registration_ids)} (hashjoin)',
+         db.payments.find(
+             {'registration_fee_id': {'$in': registration_ids}},
+             {'registration_fee_id': 1, 'amount': 1, 'payment_method': 1,
+              'receipt_number': 1, 'concept': 1, 'created_at': 1}
+         ).sort([('registration_fee_id', 1)] + list(PAYMENT_ORDER.items())).explain),
+    ]
+
+
+def main():
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+
+    print("\n🔎 VERIFICACIÓN DE ÍNDICES DE EXPORTACIÓN:")
+    print("=" * 50)
+
+    shapes = export_query_shapes(db)
+    if not shapes:
+        print("❌ No hay datos para verificar")
+        client.close()
+        sys.exit(1)
+
+    failures = 0
+    for label, explain in shapes:
+        stages, bad = explain_problems(explain())
+        status = "❌" if bad else "✓"
+        print(f"{status} {label}")
+        print(f"    plan: {' <- '.join(stages)}")
+        if bad:
+            print(f"    problemas: {', '.join(sorted(bad))}")
+            failures += 1
+
+    client.close()
+
+    if failures:
+        print(f"\n❌ {failures} consulta(s) con SORT/COLLSCAN")
+        sys.exit(1)
+    print("\n✅ Todas las consultas de exportación usan índices")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Index Plan Check - data/migrations/sql/002_foreign_key_indexes.sql
+Builds a scratch schema from migrations.sql, fills it with synthetic data at a
+scale factor (1 = the volumes of generate_football_data.py: 80 students,
+50,000 payments, 50,000 attendances), and EXPLAINs the export queries and the
+foreign-key lookups of ON DELETE CASCADE / RESTRICT before and after applying
+the index migration. Fails (exit code 1) when a plan after the migration does
+not use the expected index.
+
+The scratch schema is dropped at the end unless --keep is given; the tables of
+the application schema are not touched.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export'))
+from export_attendance_data import ATTENDANCE_QUERY
+from export_student_data import DB_CONFIG, STUDENT_PAYMENT_QUERY
+from export_student_features import build_feature_query, build_version_query
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'migrations', 'sql')
+SCHEMA_MIGRATION = os.path.join(MIGRATIONS_DIR, 'migrations.sql')
+INDEX_MIGRATION = os.path.join(MIGRATIONS_DIR, '002_foreign_key_indexes.sql')
+
+# Row counts at scale factor 1 (generate_football_data.py)
+BASE_VOLUMES = {
+    'headquarters': 10,
+    'students': 80,
+    'teachers': 15,
+    'classes': 25,
+    'registrations_per_student': 2,
+    'payments': 50000,
+    'attendances': 50000,
+}
+
+# Share of students looked up by the filtered feature / version queries
+# (a scoring micro-batch or an incremental feature store refresh)
+LOOKUP_FRACTION = 0.01
+
+# Tables below this many pages are read with a sequential scan whatever the
+# indexes; expectations on them are reported but not enforced
+MIN_TABLE_PAGES = 50
+
+def populate_sql(scale):
+    """
+    Synthetic data with the generator's shape, built server-side with generate_series.
+    """
+    students = BASE_VOLUMES['students'] * scale
+    teachers = BASE_VOLUMES['teachers'] * scale
+    classes = BASE_VOLUMES['classes'] * scale
+    headquarters = BASE_VOLUMES['headquarters']
+    registrations = students * BASE_VOLUMES['registrations_per_student']
+    payments = BASE_VOLUMES['payments'] * scale
+    attendances = BASE_VOLUMES['attendances'] * scale
+
+    return [
+        f"""INSERT INTO headquarters (name, address, legal_name)
+            SELECT 'Sede ' || g, 'Calle ' || g, 'Academia ' || g || ' SAS'
+            FROM generate_series(1, {headquarters}) g""",
+        f"""INSERT INTO users (name, last_name, type_document_id, document_id, email, created_at)
+            SELECT 'Nombre', 'Apellido ' || g, 'CC', 'DOC' || g, 'user' || g || '@example.com',
+                   now() - random() * interval '3 years'
+            FROM generate_series(1, {students + teachers}) g""",
+        "CREATE TEMP TABLE numbered_users AS SELECT id, row_number() OVER (ORDER BY id) as n FROM users",
+        "CREATE TEMP TABLE numbered_hq AS SELECT id, row_number() OVER (ORDER BY id) - 1 as n FROM headquarters",
+        f"""INSERT INTO students (id, id_headquarter, state)
+            SELECT u.id, h.id, (ARRAY['active', 'inactive', 'suspended'])[1 + u.n % 3]
+            FROM numbered_users u
+            INNER JOIN numbered_hq h ON h.n = u.n % {headquarters}
+            WHERE u.n <= {students}""",
+        f"INSERT INTO teachers (id) SELECT id FROM numbered_users WHERE n > {students}",
+        f"""INSERT INTO classes (name, capacity, schedule, class_type)
+            SELECT 'Clase ' || g, 20, 'Lunes 16:00', 'Táctica'
+            FROM generate_series(1, {classes}) g""",
+        "CREATE TEMP TABLE numbered_students AS SELECT id, row_number() OVER (ORDER BY id) - 1 as n FROM students",
+        "CREATE TEMP TABLE numbered_teachers AS SELECT id, row_number() OVER (ORDER BY id) - 1 as n FROM teachers",
+        "CREATE TEMP TABLE numbered_classes AS SELECT id, row_number() OVER (ORDER BY id) - 1 as n FROM classes",
+        f"""INSERT INTO classes_headquarters (id_class, id_headquarter, start_date, end_date)
+            SELECT c.id, h.id, date '2023-01-01', date '2025-12-31'
+            FROM numbered_classes c INNER JOIN numbered_hq h ON h.n = c.n % {headquarters}""",
+        f"""INSERT INTO students_classes (id_student, id_class)
+            SELECT s.id, c.id
+            FROM numbered_students s, generate_series(0, 1) k
+            INNER JOIN numbered_classes c ON true
+            WHERE c.n = (s.n + k * 7) % {classes}""",
+        f"""INSERT INTO teachers_classes (id_teacher, id_class, start_date)
+            SELECT t.id, c.id, date '2023-01-01'
+            FROM numbered_classes c INNER JOIN numbered_teachers t ON t.n = c.n % {teachers}""",
+        f"""INSERT INTO registration_fees (id_student, start_date, end_date, state, created_at)
+            SELECT s.id, date '2023-01-01' + k * 365, date '2023-12-31' + k * 365,
+                   (ARRAY['active', 'expired', 'cancelled'])[1 + (s.n + k) % 3],
+                   timestamp '2023-01-01' + random() * interval '3 years'
+            FROM numbered_students s, generate_series(0, {BASE_VOLUMES['registrations_per_student'] - 1}) k""",
+        "CREATE TEMP TABLE numbered_registrations AS "
+        "SELECT id, row_number() OVER (ORDER BY id) - 1 as n FROM registration_fees",
+        f"""INSERT INTO payments (id_registration_fee, amount, payment_date, payment_method, receipt_number,
+                                  concept, created_at)
+            SELECT r.id, 50000 + (g % 400) * 1000, date '2023-01-01' + g % 1000,
+                   (ARRAY['Efectivo', 'Tarjeta', 'Transferencia', 'PSE', 'Daviplata', 'Nequi'])[1 + g % 6],
+                   'REC-' || g, 'Mensualidad', timestamp '2023-01-01' + random() * interval '3 years'
+            FROM generate_series(1, {payments}) g
+            INNER JOIN numbered_registrations r ON r.n = (hashint4(g) & 2147483647) % {registrations}""",
+        f"""INSERT INTO classes_attendances (id_student, id_class, id_headquarter, id_teacher, date, attended,
+                                             created_at)
+            SELECT s.id, c.id, h.id, t.id, date '2023-01-01' + g % 1000, g % 5 <> 0,
+                   timestamp '2023-01-01' + random() * interval '3 years'
+            FROM generate_series(1, {attendances}) g
+            INNER JOIN numbered_students s ON s.n = (hashint4(g) & 2147483647) % {students}
+            INNER JOIN numbered_classes c ON c.n = (hashint4(g + 1) & 2147483647) % {classes}
+            INNER JOIN numbered_hq h ON h.n = g % {headquarters}
+            INNER JOIN numbered_teachers t ON t.n = g % {teachers}
+            ON CONFLICT (id_student, id_class, date) DO NOTHING""",
+    ]
+
+def plan_checks(conn):
+    """
+    (name, query, params, expected indexes) for the export queries and the
+    child-table lookups that foreign keys run on parent delete.
+    """
+    students = conn.execute("SELECT count(*) FROM students").fetchone()[0]
+    lookup = max(1, int(students * LOOKUP_FRACTION))
+    student_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM students ORDER BY id LIMIT %s", (lookup,)).fetchall()]
+
+    def parent_id(table):
+        return conn.execute(f"SELECT id FROM {table} LIMIT 1").fetchone()[0]
+
+    checks = [
+        # The export numbers every registration (2 per student); on a table that
+        # small a seq scan + sort is as cheap as the index, so only payments are enforced
+        ('export: student payment query', STUDENT_PAYMENT_QUERY, None,
+         ['idx_payments_registration_order']),
+        ('export: attendance stream', ATTENDANCE_QUERY, None,
+         ['idx_classes_attendances_student_date']),
+        (f'features: {lookup} students', build_feature_query(filtered=True),
+         {'as_of': '2025-10-01', 'student_ids': student_ids},
+         ['idx_registration_fees_student_order', 'idx_payments_registration_order',
+          'idx_classes_attendances_student_date']),
+        (f'versions: {lookup} students', build_version_query(filtered=True),
+         {'student_ids': student_ids},
+         ['idx_registration_fees_student_order', 'idx_payments_registration_order',
+          'idx_classes_attendances_student_date']),
+    ]
+
+    foreign_keys = [
+        ('students', 'id_headquarter', 'headquarters', 'idx_students_headquarter'),
+        ('classes_headquarters', 'id_headquarter', 'headquarters', 'idx_classes_headquarters_headquarter'),
+        ('students_classes', 'id_class', 'classes', 'idx_students_classes_class'),
+        ('teachers_classes', 'id_teacher', 'teachers', 'idx_teachers_classes_teacher'),
+        ('teachers_classes', 'id_class', 'classes', 'idx_teachers_classes_class'),
+        ('registration_fees', 'id_student', 'students', 'idx_registration_fees_student_order'),
+        ('payments', 'id_registration_fee', 'registration_fees', 'idx_payments_registration_order'),
+        ('classes_attendances', 'id_class', 'classes', 'idx_classes_attendances_class'),
+        ('classes_attendances', 'id_teacher', 'teachers', 'idx_classes_attendances_teacher'),
+        ('classes_attendances', 'id_headquarter', 'headquarters', 'idx_classes_attendances_headquarter'),
+    ]
+    for table, column, parent, index in foreign_keys:
+        # Same lookup the RI trigger runs for each deleted parent row
+        checks.append((f'fk: {table}.{column}', f"SELECT 1 FROM ONLY {table} WHERE {column} = %(id)s",
+                       {'id': parent_id(parent)}, [index]))
+    return checks
+
+def index_table_pages(conn):
+    """
+    {index name: (table, table pages)} for the indexes of the current schema.
+    """
+    rows = conn.execute("""
+        SELECT i.relname, t.relname, t.relpages
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relnamespace = current_schema()::regnamespace
+    """).fetchall()
+    return {index: (table, pages) for index, table, pages in rows}
+
+def walk_plan(node):
+    """
+    Yield every node of an EXPLAIN (FORMAT JSON) plan tree.
+    """
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk_plan(child)
+
+def explain(conn, query, params):
+    """
+    (total cost, indexes used, sort count, scanned relations) of a query plan.
+    """
+    plan = conn.execute(f"EXPLAIN (FORMAT JSON) {query}", params).fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    nodes = list(walk_plan(root))
+    indexes = {node['Index Name'] for node in nodes if 'Index Name' in node}
+    sorts = sum(1 for node in nodes if node['Node Type'] in ('Sort', 'Incremental Sort'))
+    seq_scans = sorted({node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'})
+    return {'cost': root['Total Cost'], 'indexes': indexes, 'sorts': sorts, 'seq_scans': seq_scans}
+
+def run_sql_file(conn, path):
+    with open(path, encoding='utf-8') as fh:
+        conn.execute(fh.read())
+
+def build_schema(conn, schema, scale):
+    """
+    Create the scratch schema, apply migrations.sql and load synthetic data.
+    """
+    conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    conn.execute(f"CREATE SCHEMA {schema}")
+    conn.execute(f"SET search_path TO {schema}, public")
+    run_sql_file(conn, SCHEMA_MIGRATION)
+    for statement in populate_sql(scale):
+        conn.execute(statement)
+    conn.execute("VACUUM ANALYZE")
+
+def check_plans(scale, schema='index_check', keep=False):
+    """
+    Run the checks before and after the index migration; returns the failures.
+    """
+    failures = []
+    with psycopg.connect(**DB_CONFIG, autocommit=True) as conn:
+        start = time.perf_counter()
+        print(f"🧮 Building schema '{schema}' at scale factor {scale}...")
+        build_schema(conn, schema, scale)
+        counts = {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                  for table in ('students', 'registration_fees', 'payments', 'classes_attendances')}
+        print("✓ " + ", ".join(f"{table}: {count:,}" for table, count in counts.items())
+              + f" ({time.perf_counter() - start:.1f}s)")
+
+        checks = plan_checks(conn)
+        before = {name: explain(conn, query, params) for name, query, params, _ in checks}
+        run_sql_file(conn, INDEX_MIGRATION)
+        conn.execute("VACUUM ANALYZE")
+        after = {name: explain(conn, query, params) for name, query, params, _ in checks}
+        pages = index_table_pages(conn)
+
+        print(f"\n{'check':42} {'cost before':>12} {'cost after':>12} {'sorts':>6}  result")
+        for name, _, _, expected in checks:
+            unused = [index for index in expected if index not in after[name]['indexes']]
+            missing = [index for index in unused if pages[index][1] >= MIN_TABLE_PAGES]
+            small = sorted({pages[index][0] for index in unused if index not in missing})
+            if missing:
+                status = f"❌ missing {', '.join(missing)}"
+            elif small:
+                status = f"✓ (seq scan on small {', '.join(small)})"
+            else:
+                status = '✓'
+            sorts = f"{before[name]['sorts']}→{after[name]['sorts']}"
+            print(f"{name:42} {before[name]['cost']:>12,.0f} {after[name]['cost']:>12,.0f} {sorts:>6}  {status}")
+            if missing:
+                failures.append((name, missing, after[name]))
+
+        if not keep:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+    return failures
+
+def parse_args():
+    """
+    Parse command line options for the plan check.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, default=10,
+                        help='Scale factor over the generator volumes (default: 10)')
+    parser.add_argument('--schema', default='index_check', help='Scratch schema name (default: index_check)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema for inspection')
+    return parser.parse_args()
+
+def main():
+    """
+    Build, check and report; exit code 1 when an expected index is not used.
+    """
+    args = parse_args()
+
+    try:
+        failures = check_plans(args.scale, args.schema, args.keep)
+    except psycopg.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    if failures:
+        print(f"\n❌ {len(failures)} plan(s) do not use the expected indexes:")
+        for name, missing, plan in failures:
+            print(f"   {name}: uses {sorted(plan['indexes']) or 'no index'}, seq scans {plan['seq_scans']}")
+        sys.exit(1)
+    print("\n✅ All plans use the expected indexes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Cleaning Statistics Pushdown - Student Payment Data
+Computes the statistics ClearData.ipynb derives from the wide BI export (IQR
+fences, 3σ limits, medians for imputation, null counts) directly in PostgreSQL.
+Values are grouped by the same registration/payment slots the export uses for
+its amount_{r}_{p} / state_{r} columns, so only one small row per slot travels
+to the client.
+
+A slot (r, p) holds the p-th payment (by created_at, then payment_date and id;
+first 10) of each student's r-th registration (by created_at, then start_date
+and id), exactly as in STUDENT_PAYMENT_QUERY. The generators insert each table
+in one transaction, so created_at ties are common and need the tie-breakers.
+A null in the wide export is a student without that slot, so
+nulls = students - payments in the slot.
+"""
+
+import json
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'analysis'))
+
+# Same student filter and registration numbering as STUDENT_PAYMENT_QUERY
+REGISTRATIONS_CTE = """
+exported_students AS (
+    SELECT s.id
+    FROM students s
+    INNER JOIN users u ON s.id = u.id
+    INNER JOIN headquarters h ON s.id_headquarter = h.id
+),
+registrations AS (
+    SELECT
+        rf.id as registration_id,
+        rf.state,
+        ROW_NUMBER() OVER (
+            PARTITION BY rf.id_student ORDER BY rf.created_at, rf.start_date, rf.id
+        ) as reg_number
+    FROM registration_fees rf
+    INNER JOIN exported_students es ON rf.id_student = es.id
+)
+"""
+
+# Payment slots: first 10 payments per registration, numbered by created_at (ties: payment_date, id)
+SLOTS_CTE = REGISTRATIONS_CTE + """,
+slots AS (
+    SELECT
+        r.reg_number,
+        p.payment_number,
+        p.amount,
+        p.payment_method,
+        p.concept
+    FROM registrations r
+    INNER JOIN (
+        SELECT
+            id_registration_fee,
+            amount,
+            payment_method,
+            concept,
+            ROW_NUMBER() OVER (
+                PARTITION BY id_registration_fee ORDER BY created_at, payment_date, id
+            ) as payment_number
+        FROM payments
+    ) p ON p.id_registration_fee = r.registration_id AND p.payment_number <= 10
+)
+"""
+
+# One row per payment slot: counts, nulls, moments, quartiles, fences, modes
+# and outlier counts; 'slots' is referenced twice, so PostgreSQL materializes it once
+PAYMENT_SLOT_STATISTICS_QUERY = "WITH" + SLOTS_CTE + """,
+slot_stats AS (
+    SELECT
+        reg_number,
+        payment_number,
+        count(*) as payments,
+        count(*) FILTER (WHERE amount IS NULL) as null_amounts,
+        count(*) FILTER (WHERE payment_method IS NULL) as null_payment_methods,
+        count(*) FILTER (WHERE concept IS NULL) as null_concepts,
+        min(amount) as min,
+        max(amount) as max,
+        avg(amount) as mean,
+        stddev(amount) as std,
+        percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY amount) as quartiles,
+        mode() WITHIN GROUP (ORDER BY payment_method) as payment_method_mode,
+        mode() WITHIN GROUP (ORDER BY concept) as concept_mode
+    FROM slots
+    GROUP BY reg_number, payment_number
+),
+fences AS (
+    SELECT
+        *,
+        quartiles[1] - %(iqr_factor)s * (quartiles[3] - quartiles[1]) as iqr_lower,
+        quartiles[3] + %(iqr_factor)s * (quartiles[3] - quartiles[1]) as iqr_upper,
+        mean - %(sigma_factor)s * std as sigma_lower,
+        mean + %(sigma_factor)s * std as sigma_upper
+    FROM slot_stats
+),
+outliers AS (
+    SELECT
+        s.reg_number,
+        s.payment_number,
+        count(*) FILTER (WHERE s.amount < f.iqr_lower OR s.amount > f.iqr_upper) as iqr_outliers,
+        count(*) FILTER (WHERE s.amount < f.sigma_lower OR s.amount > f.sigma_upper) as sigma_outliers
+    FROM slots s
+    INNER JOIN fences f USING (reg_number, payment_number)
+    GROUP BY s.reg_number, s.payment_number
+)
+SELECT
+    f.reg_number,
+    f.payment_number,
+    (SELECT count(*) FROM exported_students) as students,
+    f.payments,
+    f.null_amounts,
+    f.null_payment_methods,
+    f.null_concepts,
+    f.min,
+    f.max,
+    f.mean,
+    f.std,
+    f.quartiles[1] as q1,
+    f.quartiles[2] as median,
+    f.quartiles[3] as q3,
+    f.iqr_lower,
+    f.iqr_upper,
+    f.sigma_lower,
+    f.sigma_upper,
+    o.iqr_outliers,
+    o.sigma_outliers,
+    f.payment_method_mode,
+    f.concept_mode
+FROM fences f
+INNER JOIN outliers o USING (reg_number, payment_number)
+ORDER BY f.reg_number, f.payment_number
+"""
+
+# One row per registration slot (state_{r} columns)
+REGISTRATION_SLOT_STATISTICS_QUERY = "WITH" + REGISTRATIONS_CTE + """
+SELECT
+    reg_number,
+    (SELECT count(*) FROM exported_students) as students,
+    count(*) as registrations,
+    count(*) FILTER (WHERE state IS NULL) as null_states,
+    count(*) FILTER (WHERE state = 'active') as active,
+    count(*) FILTER (WHERE state = 'expired') as expired,
+    count(*) FILTER (WHERE state = 'cancelled') as cancelled,
+    mode() WITHIN GROUP (ORDER BY state) as state_mode
+FROM registrations
+GROUP BY reg_number
+ORDER BY reg_number
+"""
+
+# Fill value used by the notebook for state_{r}
+STATE_FILL_VALUE = 'S'
+
+def get_payment_slot_statistics(conn, iqr_factor=1.5, sigma_factor=3.0):
+    """
+    Statistics per amount_{r}_{p} slot, computed in the database.
+    Adds the wide-export column name and its null count (students without the slot).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(PAYMENT_SLOT_STATISTICS_QUERY,
+                       {'iqr_factor': iqr_factor, 'sigma_factor': sigma_factor})
+        columns = [desc.name for desc in cursor.description]
+        stats = pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    numeric = ['min', 'max', 'mean', 'std', 'q1', 'median', 'q3',
+               'iqr_lower', 'iqr_upper', 'sigma_lower', 'sigma_upper']
+    stats[numeric] = stats[numeric].astype(float)
+    stats.insert(0, 'column', [f"amount_{r}_{p}" for r, p in zip(stats['reg_number'], stats['payment_number'])])
+    stats['nulls'] = stats['students'] - stats['payments'] + stats['null_amounts']
+    stats['null_ratio'] = stats['nulls'] / stats['students']
+    return stats
+
+def get_registration_slot_statistics(conn):
+    """
+    Statistics per state_{r} slot, computed in the database.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(REGISTRATION_SLOT_STATISTICS_QUERY)
+        columns = [desc.name for desc in cursor.description]
+        stats = pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    stats.insert(0, 'column', [f"state_{r}" for r in stats['reg_number']])
+    stats['nulls'] = stats['students'] - stats['registrations'] + stats['null_states']
+    stats['null_ratio'] = stats['nulls'] / stats['students']
+    return stats
+
+def cleaning_parameters(payment_stats, registration_stats):
+    """
+    Cleaning decisions in the layout of clean_pipeline.plan_cleaning():
+    IQR/3σ fences per amount column and fill values (median for amounts,
+    mode for payment methods, 'S' for states).
+    """
+    fences = {}
+    fill_values = {}
+    for row in payment_stats.itertuples(index=False):
+        r, p = row.reg_number, row.payment_number
+        fences[row.column] = {
+            'iqr': (row.iqr_lower, row.iqr_upper),
+            'sigma': (row.sigma_lower, row.sigma_upper),
+        }
+        fill_values[row.column] = row.median
+        fill_values[f"payment_method_{r}_{p}"] = row.payment_method_mode
+    for row in registration_stats.itertuples(index=False):
+        fill_values[row.column] = STATE_FILL_VALUE
+
+    return {'fences': fences, 'fill_values': fill_values}
+
+def save_imputer_statistics(parameters, path):
+    """
+    Store the fill values in FamilyImputer.save() format (analysis/imputation.py),
+    so FamilyImputer.load(path).transform(data) imputes a later export without refitting.
+    """
+    from imputation import FamilyImputer
+
+    imputer = FamilyImputer()
+    imputer.columns_ = imputer.family_columns(parameters['fill_values'])
+    imputer.statistics_ = {
+        family: {col: parameters['fill_values'][col] for col in columns}
+        for family, columns in imputer.columns_.items()
+    }
+    imputer.save(path)
+    return path
+
+def export_cleaning_statistics(conn, output_prefix, iqr_factor=1.5, sigma_factor=3.0):
+    """
+    Compute slot statistics in the database and write:
+    <prefix>_payment_slots.csv, <prefix>_registration_slots.csv,
+    <prefix>_cleaning.json (fences + fill values) and <prefix>_imputer.json.
+    Returns the written paths.
+    """
+    payment_stats = get_payment_slot_statistics(conn, iqr_factor, sigma_factor)
+    registration_stats = get_registration_slot_statistics(conn)
+    parameters = cleaning_parameters(payment_stats, registration_stats)
+
+    paths = {
+        'payment_slots': f"{output_prefix}_payment_slots.csv",
+        'registration_slots': f"{output_prefix}_registration_slots.csv",
+        'cleaning': f"{output_prefix}_cleaning.json",
+        'imputer': f"{output_prefix}_imputer.json",
+    }
+    payment_stats.to_csv(paths['payment_slots'], index=False)
+    registration_stats.to_csv(paths['registration_slots'], index=False)
+    with open(paths['cleaning'], 'w', encoding='utf-8') as fh:
+        json.dump(parameters, fh, indent=2, default=str)
+    save_imputer_statistics(parameters, paths['imputer'])
+    return paths
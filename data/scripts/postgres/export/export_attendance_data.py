@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Attendance Analytics Export Script - Class Attendance Data
+Streams classes_attendances ordered by (id_student, date) through a server-side
+cursor and computes, in one forward pass:
+- per row: session number, rolling attendance rate over the last sessions and
+  the last days, and the current attended/absent streak
+- per student: totals, rates, longest attended/absent streaks
+- per class and per teacher: sessions, attendance rate and distinct students
+State is kept only for the current student (plus one counter per class and
+teacher), so memory does not grow with the table. Results are written as Parquet.
+--since/--until bound the dates read; with the monthly partitions of
+003_partition_by_month.sql only the matching months are scanned.
+"""
+
+import argparse
+import os
+import sys
+from collections import deque
+from datetime import date, timedelta
+import psycopg
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from export_output import build_filename
+from export_student_data import DB_CONFIG
+from partitions import ensure_upcoming_partitions
+
+def build_attendance_query(since=None, until=None):
+    """
+    Attendance stream query, optionally bounded to %(since)s <= date <= %(until)s.
+    The bounds are plain comparisons on the partition column, so the planner
+    prunes the months outside them.
+    """
+    conditions = []
+    if since is not None:
+        conditions.append("ca.date >= %(since)s")
+    if until is not None:
+        conditions.append("ca.date <= %(until)s")
+    where = f"\nWHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return f"""
+SELECT
+    ca.id_student::text,
+    ca.id_class::text,
+    ca.id_teacher::text,
+    ca.id_headquarter::text,
+    ca.date,
+    coalesce(ca.attended, false) as attended
+FROM classes_attendances ca{where}
+ORDER BY ca.id_student, ca.date, ca.id_class
+"""
+
+ATTENDANCE_QUERY = build_attendance_query()
+
+# Rolling windows: last N sessions and last N days
+ROLLING_SESSIONS = 10
+ROLLING_DAYS = 30
+
+# Rows fetched per round trip and rows per Parquet row group
+FETCH_ROWS = 10000
+ROW_GROUP_ROWS = 100000
+
+ROW_SCHEMA = pa.schema([
+    ('id_student', pa.string()),
+    ('id_class', pa.string()),
+    ('id_teacher', pa.string()),
+    ('id_headquarter', pa.string()),
+    ('date', pa.date32()),
+    ('attended', pa.bool_()),
+    ('session_number', pa.int32()),
+    (f'rolling_rate_{ROLLING_SESSIONS}_sessions', pa.float32()),
+    (f'rolling_rate_{ROLLING_DAYS}d', pa.float32()),
+    ('streak', pa.int32()),
+])
+
+class StudentState:
+    """
+    Running state of the student currently being streamed.
+    """
+
+    def __init__(self, student_id):
+        self.student_id = student_id
+        self.sessions = 0
+        self.attended = 0
+        self.streak = 0
+        self.longest_attended_streak = 0
+        self.longest_absent_streak = 0
+        self.first_date = None
+        self.last_date = None
+        self.classes = set()
+        self.teachers = set()
+        self.last_sessions = deque(maxlen=ROLLING_SESSIONS)
+        # (date, attended) within the day window; bounded by sessions per window
+        self.last_days = deque()
+        self.last_days_attended = 0
+
+    def add(self, date, attended, class_id, teacher_id):
+        """
+        Add one session and return (session_number, session_rate, day_rate, streak).
+        Streak is positive for consecutive attended sessions, negative for absences.
+        """
+        self.sessions += 1
+        self.attended += attended
+        self.first_date = self.first_date or date
+        self.last_date = date
+        self.classes.add(class_id)
+        self.teachers.add(teacher_id)
+
+        if attended:
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.longest_attended_streak = max(self.longest_attended_streak, self.streak)
+        else:
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.longest_absent_streak = max(self.longest_absent_streak, -self.streak)
+
+        self.last_sessions.append(attended)
+        self.last_days.append((date, attended))
+        self.last_days_attended += attended
+        cutoff = date - timedelta(days=ROLLING_DAYS)
+        while self.last_days and self.last_days[0][0] <= cutoff:
+            self.last_days_attended -= self.last_days.popleft()[1]
+
+        return (
+            self.sessions,
+            sum(self.last_sessions) / len(self.last_sessions),
+            self.last_days_attended / len(self.last_days),
+            self.streak,
+        )
+
+    def summary(self):
+        """
+        Per-student summary row.
+        """
+        return {
+            'id_student': self.student_id,
+            'sessions': self.sessions,
+            'attended': self.attended,
+            'attendance_rate': self.attended / self.sessions if self.sessions else None,
+            f'rate_last_{ROLLING_SESSIONS}_sessions': (sum(self.last_sessions) / len(self.last_sessions)
+                                                        if self.last_sessions else None),
+            'current_streak': self.streak,
+            'longest_attended_streak': self.longest_attended_streak,
+            'longest_absent_streak': self.longest_absent_streak,
+            'classes': len(self.classes),
+            'teachers': len(self.teachers),
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+        }
+
+class GroupStats:
+    """
+    Sessions, attended and distinct students per class or teacher.
+    Rows arrive grouped by student, so a student is counted once per key by
+    marking the keys seen for the current student only.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.attended = {}
+        self.students = {}
+
+    def add(self, key, attended, first_for_student):
+        self.sessions[key] = self.sessions.get(key, 0) + 1
+        self.attended[key] = self.attended.get(key, 0) + attended
+        if first_for_student:
+            self.students[key] = self.students.get(key, 0) + 1
+
+    def table(self, key_name):
+        keys = sorted(self.sessions)
+        return pa.table({
+            key_name: pa.array(keys, pa.string()),
+            'sessions': pa.array([self.sessions[k] for k in keys], pa.int64()),
+            'attended': pa.array([self.attended[k] for k in keys], pa.int64()),
+            'attendance_rate': pa.array([self.attended[k] / self.sessions[k] for k in keys], pa.float64()),
+            'students': pa.array([self.students.get(k, 0) for k in keys], pa.int64()),
+        })
+
+class AttendanceAggregator:
+    """
+    Single forward pass over attendance rows sorted by (id_student, date).
+    Per-row features go to a Parquet writer in row groups; per-student
+    summaries are appended as each student finishes.
+    """
+
+    def __init__(self, row_writer=None):
+        self.row_writer = row_writer
+        self.buffer = {name: [] for name in ROW_SCHEMA.names}
+        self.student = None
+        self.students = []
+        self.classes = GroupStats()
+        self.teachers = GroupStats()
+        self.rows = 0
+
+    def process(self, rows):
+        """
+        Consume (id_student, id_class, id_teacher, id_headquarter, date, attended) tuples.
+        """
+        for student_id, class_id, teacher_id, headquarter_id, date, attended in rows:
+            if self.student is None or student_id != self.student.student_id:
+                if self.student is not None and student_id < self.student.student_id:
+                    raise ValueError("Attendance rows must be ordered by id_student, date")
+                self._finish_student()
+                self.student = StudentState(student_id)
+
+            attended = int(bool(attended))
+            new_class = class_id not in self.student.classes
+            new_teacher = teacher_id not in self.student.teachers
+            session, session_rate, day_rate, streak = self.student.add(date, attended, class_id, teacher_id)
+            self.classes.add(class_id, attended, new_class)
+            self.teachers.add(teacher_id, attended, new_teacher)
+
+            if self.row_writer is not None:
+                for name, value in zip(ROW_SCHEMA.names, (
+                        student_id, class_id, teacher_id, headquarter_id, date, bool(attended),
+                        session, session_rate, day_rate, streak)):
+                    self.buffer[name].append(value)
+                if len(self.buffer['id_student']) >= ROW_GROUP_ROWS:
+                    self._flush_rows()
+            self.rows += 1
+        return self
+
+    def finish(self):
+        """
+        Close the last student and flush buffered rows. Returns the summary tables.
+        """
+        self._finish_student()
+        self._flush_rows()
+        return {
+            'students': pa.Table.from_pylist(self.students) if self.students else pa.table({}),
+            'classes': self.classes.table('id_class'),
+            'teachers': self.teachers.table('id_teacher'),
+        }
+
+    def _finish_student(self):
+        if self.student is not None:
+            self.students.append(self.student.summary())
+            self.student = None
+
+    def _flush_rows(self):
+        if self.row_writer is None or not self.buffer['id_student']:
+            return
+        self.row_writer.write_table(pa.table(self.buffer, schema=ROW_SCHEMA))
+        self.buffer = {name: [] for name in ROW_SCHEMA.names}
+
+def stream_attendance_rows(conn, fetch_rows=FETCH_ROWS, since=None, until=None):
+    """
+    Yield attendance rows through a server-side cursor (fetch_rows per round trip),
+    restricted to since <= date <= until when given.
+    """
+    with conn.cursor(name='attendance_stream') as cursor:
+        cursor.itersize = fetch_rows
+        cursor.execute(build_attendance_query(since, until), {'since': since, 'until': until})
+        yield from cursor
+
+def export_attendance(rows, prefix):
+    """
+    Run the aggregation over rows and write <prefix>_rows/_students/_classes/_teachers.parquet.
+    Returns (paths, aggregator).
+    """
+    paths = {name: f"{prefix}_{name}.parquet" for name in ('rows', 'students', 'classes', 'teachers')}
+
+    with pq.ParquetWriter(paths['rows'], ROW_SCHEMA, compression='zstd') as writer:
+        aggregator = AttendanceAggregator(writer)
+        tables = aggregator.process(rows).finish()
+
+    for name, table in tables.items():
+        pq.write_table(table, paths[name], compression='zstd')
+    return paths, aggregator
+
+def parse_args():
+    """
+    Parse command line options for the attendance export.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prefix', default=None,
+                        help='Output prefix (default: attendance_export_<timestamp>)')
+    parser.add_argument('--fetch-rows', type=int, default=FETCH_ROWS,
+                        help='Rows fetched per round trip from the server-side cursor')
+    parser.add_argument('--since', type=date.fromisoformat, default=None,
+                        help='First attendance date to export (YYYY-MM-DD, default: all)')
+    parser.add_argument('--until', type=date.fromisoformat, default=None,
+                        help='Last attendance date to export (YYYY-MM-DD, default: all)')
+    return parser.parse_args()
+
+def main():
+    """
+    Stream attendance from PostgreSQL and export the analytics as Parquet.
+    """
+    args = parse_args()
+    prefix = args.prefix or build_filename('attendance_export', 'parquet').rsplit('.', 1)[0]
+
+    try:
+        print("🔌 Connecting to database...")
+        conn = psycopg.connect(**DB_CONFIG)
+        created = ensure_upcoming_partitions(conn)
+        conn.commit()
+        for table, count in created.items():
+            if count:
+                print(f"✓ Created {count} monthly partition(s) of {table}")
+
+        print("📊 Streaming attendance ordered by (id_student, date)...")
+        rows = stream_attendance_rows(conn, args.fetch_rows, args.since, args.until)
+        paths, aggregator = export_attendance(rows, prefix)
+        conn.close()
+
+        print(f"✓ Attendance rows: {aggregator.rows:,}")
+        print(f"✓ Students: {len(aggregator.students):,}")
+        print(f"✓ Classes: {len(aggregator.classes.sessions):,}")
+        print(f"✓ Teachers: {len(aggregator.teachers.sessions):,}")
+        for name, path in paths.items():
+            print(f"✅ {name}: {path}")
+
+    except psycopg.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
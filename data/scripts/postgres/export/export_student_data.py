@@ -5,10 +5,18 @@ Exports denormalized student data with registration fees and payments in wide fo
 One row per student with all their registration fees and associated payments.
 """
 
+import argparse
+import os
 import psycopg
 import pandas as pd
-import sys
 from datetime import datetime
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from export_output import add_output_arguments, export_dataframe
+from cleaning_statistics import export_cleaning_statistics
+from partitions import ensure_upcoming_partitions
 
 # Database configuration
 DB_CONFIG = {
@@ -19,6 +27,70 @@ DB_CONFIG = {
     'password': 'root123'
 }
 
+# Long-format rows: one per (student, registration, payment), first 10 payments per registration.
+# Rows created in one transaction share created_at, so start_date / payment_date and id
+# break ties and the amount_{r}_{p} slots are the same on every run
+STUDENT_PAYMENT_QUERY = """
+WITH student_base AS (
+    SELECT 
+        s.id as student_id,
+        u.name,
+        u.last_name,
+        u.type_document_id,
+        u.document_id,
+        u.email,
+        u.phone,
+        s.state as student_state,
+        h.name as headquarter_name
+    FROM students s
+    INNER JOIN users u ON s.id = u.id
+    INNER JOIN headquarters h ON s.id_headquarter = h.id
+),
+registrations AS (
+    SELECT 
+        rf.id as registration_id,
+        rf.id_student,
+        rf.state as registration_state,
+        ROW_NUMBER() OVER (
+            PARTITION BY rf.id_student ORDER BY rf.created_at, rf.start_date, rf.id
+        ) as reg_number
+    FROM registration_fees rf
+),
+payments_data AS (
+    SELECT 
+        p.id_registration_fee,
+        p.amount,
+        p.payment_method,
+        p.receipt_number,
+        p.concept,
+        ROW_NUMBER() OVER (
+            PARTITION BY p.id_registration_fee ORDER BY p.created_at, p.payment_date, p.id
+        ) as payment_number
+    FROM payments p
+)
+SELECT 
+    sb.student_id,
+    sb.name,
+    sb.last_name,
+    sb.type_document_id,
+    sb.document_id,
+    sb.email,
+    sb.phone,
+    sb.student_state,
+    sb.headquarter_name,
+    r.reg_number,
+    r.registration_state,
+    pd.payment_number,
+    pd.amount,
+    pd.payment_method,
+    pd.receipt_number,
+    pd.concept
+FROM student_base sb
+LEFT JOIN registrations r ON sb.student_id = r.id_student
+LEFT JOIN payments_data pd ON r.registration_id = pd.id_registration_fee AND pd.payment_number <= 10
+ORDER BY sb.document_id, r.reg_number, pd.payment_number
+"""
+
 def get_student_payment_data(conn):
     """
     Extract student data with registration fees and payments in denormalized format.
@@ -26,62 +98,7 @@ def get_student_payment_data(conn):
     """
     
     # Query to get all student data with registration fees and payments
-    query = """
-    WITH student_base AS (
-        SELECT 
-            s.id as student_id,
-            u.name,
-            u.last_name,
-            u.type_document_id,
-            u.document_id,
-            u.email,
-            u.phone,
-            s.state as student_state,
-            h.name as headquarter_name
-        FROM students s
-        INNER JOIN users u ON s.id = u.id
-        INNER JOIN headquarters h ON s.id_headquarter = h.id
-    ),
-    registrations AS (
-        SELECT 
-            rf.id as registration_id,
-            rf.id_student,
-            rf.state as registration_state,
-            ROW_NUMBER() OVER (PARTITION BY rf.id_student ORDER BY rf.created_at) as reg_number
-        FROM registration_fees rf
-    ),
-    payments_data AS (
-        SELECT 
-            p.id_registration_fee,
-            p.amount,
-            p.payment_method,
-            p.receipt_number,
-            p.concept,
-            ROW_NUMBER() OVER (PARTITION BY p.id_registration_fee ORDER BY p.created_at) as payment_number
-        FROM payments p
-    )
-    SELECT 
-        sb.student_id,
-        sb.name,
-        sb.last_name,
-        sb.type_document_id,
-        sb.document_id,
-        sb.email,
-        sb.phone,
-        sb.student_state,
-        sb.headquarter_name,
-        r.reg_number,
-        r.registration_state,
-        pd.payment_number,
-        pd.amount,
-        pd.payment_method,
-        pd.receipt_number,
-        pd.concept
-    FROM student_base sb
-    LEFT JOIN registrations r ON sb.student_id = r.id_student
-    LEFT JOIN payments_data pd ON r.registration_id = pd.id_registration_fee AND pd.payment_number <= 10
-    ORDER BY sb.document_id, r.reg_number, pd.payment_number
-    """
+    query = STUDENT_PAYMENT_QUERY
     
     # Execute query and get data
     df = pd.read_sql_query(query, conn)
@@ -151,24 +168,51 @@ def denormalize_student_data(df):
     
     return result_df
 
-def export_to_csv(df, filename=None):
+def export_to_csv(df, filename=None, fmt=None, compression=None, threads=None):
     """
-    Export dataframe to CSV file.
+    Export dataframe to CSV (optionally gzip/zstd compressed) or Parquet.
+    Format and compression come from the arguments or the filename extension;
+    without either, writes an uncompressed timestamped CSV as before.
     """
-    if filename is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'student_payment_bi_export_{timestamp}.csv'
-    
-    df.to_csv(filename, index=False, encoding='utf-8')
-    return filename
+    return export_dataframe(df, filename, prefix='student_payment_bi_export', fmt=fmt,
+                            compression=compression, threads=threads)
+
+def parse_args():
+    """
+    Parse command line options for the export.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_output_arguments(parser)
+    parser.add_argument('--stats-only', action='store_true',
+                        help='Compute cleaning statistics in the database instead of exporting rows')
+    parser.add_argument('--stats-prefix', default=None,
+                        help='Prefix for the statistics files (default: timestamped)')
+    return parser.parse_args()
 
 def main():
     """
     Main function to connect to database, extract data, and export to CSV.
     """
+    args = parse_args()
+
     try:
         print("🔌 Connecting to database...")
         conn = psycopg.connect(**DB_CONFIG)
+        created = ensure_upcoming_partitions(conn)
+        conn.commit()
+        for table, count in created.items():
+            if count:
+                print(f"✓ Created {count} monthly partition(s) of {table}")
+
+        if args.stats_only:
+            prefix = args.stats_prefix or f"student_payment_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            print("📊 Computing cleaning statistics in the database...")
+            paths = export_cleaning_statistics(conn, prefix)
+            for name, path in paths.items():
+                print(f"✓ {name}: {path}")
+            print("✅ Cleaning statistics exported (no rows transferred)")
+            conn.close()
+            return
         
         print("📊 Extracting and transforming student payment data...")
         df = get_student_payment_data(conn)
@@ -197,9 +241,10 @@ def main():
         state_cols = [col for col in df.columns if col.startswith('state_')]
         print(f"  Registration columns: {len(state_cols)}")
         
-        # Export to CSV
-        print("\n💾 Exporting to CSV...")
-        filename = export_to_csv(df)
+        # Export to CSV / Parquet
+        print("\n💾 Exporting data...")
+        filename = export_to_csv(df, args.output, fmt=args.format,
+                                 compression=args.compression, threads=args.threads)
         print(f"✅ Data successfully exported to: {filename}")
         
         # Display sample data
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Model Feature Export Script - Student Features (PostgreSQL)
+Computes per-student model features inside the database (aggregates and window
+functions) and exports a compact numeric matrix: one row per student, no
+pivoting or cleaning of the sparse wide BI table.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+import psycopg
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from export_output import add_output_arguments, export_dataframe
+from export_student_data import DB_CONFIG
+from student_features import (ATTENDANCE_WINDOWS, FEATURE_COLUMNS, PAYMENT_METHODS,
+                              RECENT_PAYMENT_DAYS, finalize_features, method_column)
+from partitions import ensure_upcoming_partitions
+
+# Columns of the feature CTEs, selected explicitly so the join keys are not repeated
+REGISTRATION_COLUMNS = [
+    'registration_count', 'registrations_active', 'registrations_expired',
+    'registrations_cancelled', 'latest_registration_active', 'days_since_last_registration',
+]
+PAYMENT_COLUMNS = [
+    'payment_count', 'payment_total', 'payment_mean', 'payment_max', 'payment_std',
+    'days_since_first_payment', 'days_since_last_payment', 'mean_days_between_payments',
+    'payments_recent', 'amount_recent',
+] + [method_column(method) for method in PAYMENT_METHODS]
+ATTENDANCE_COLUMNS = [
+    'attendance_count', 'attendance_rate', 'days_since_last_attendance',
+] + [f'attendance_rate_{days}d' for days in ATTENDANCE_WINDOWS]
+
+def build_feature_query(filtered=False):
+    """
+    Feature query; one aggregate row per exported student, as of %(as_of)s:
+    registrations created, payments made and classes attended after that date
+    are left out, so a past as_of sees only the data that existed then.
+    Payment gaps use LAG over each student's payments, the latest registration
+    state comes from ROW_NUMBER (registrations created in one transaction share
+    created_at, so start_date and id break the tie deterministically). The
+    payments/attendance scans are grouped by student before the joins, so each
+    table is read once.
+    With filtered=True every CTE is restricted to %(student_ids)s (uuid list),
+    for scoring a few students without aggregating the whole tables.
+    """
+    base_filter = "\n    WHERE {column} = ANY(%(student_ids)s::uuid[])" if filtered else ""
+    student_filter = "\n      AND {column} = ANY(%(student_ids)s::uuid[])" if filtered else ""
+    method_shares = ",\n        ".join(
+        f"count(*) FILTER (WHERE payment_method = '{method}')::float / count(*) as {method_column(method)}"
+        for method in PAYMENT_METHODS
+    )
+    attendance_windows = ",\n        ".join(
+        f"avg(attended::int) FILTER (WHERE date > p.as_of - {days}) as attendance_rate_{days}d"
+        for days in ATTENDANCE_WINDOWS
+    )
+    feature_columns = ",\n    ".join(
+        [f"rf.{column}" for column in REGISTRATION_COLUMNS]
+        + [f"pf.{column}" for column in PAYMENT_COLUMNS]
+        + [f"af.{column}" for column in ATTENDANCE_COLUMNS]
+    )
+
+    return f"""
+WITH params AS (
+    SELECT %(as_of)s::date as as_of
+),
+student_base AS (
+    SELECT s.id as student_id, s.state as student_state
+    FROM students s
+    INNER JOIN users u ON s.id = u.id
+    INNER JOIN headquarters h ON s.id_headquarter = h.id{base_filter.format(column='s.id')}
+),
+registrations AS (
+    SELECT
+        rf.id_student,
+        rf.state,
+        rf.created_at,
+        ROW_NUMBER() OVER (
+            PARTITION BY rf.id_student ORDER BY rf.created_at DESC, rf.start_date DESC, rf.id
+        ) as recency_rank
+    FROM registration_fees rf
+    WHERE rf.created_at::date <= %(as_of)s::date{student_filter.format(column='rf.id_student')}
+),
+registration_features AS (
+    SELECT
+        id_student,
+        count(*) as registration_count,
+        count(*) FILTER (WHERE state = 'active') as registrations_active,
+        count(*) FILTER (WHERE state = 'expired') as registrations_expired,
+        count(*) FILTER (WHERE state = 'cancelled') as registrations_cancelled,
+        max((recency_rank = 1 AND state = 'active')::int) as latest_registration_active,
+        p.as_of - max(created_at)::date as days_since_last_registration
+    FROM registrations, params p
+    GROUP BY id_student, p.as_of
+),
+student_payments AS (
+    SELECT
+        rf.id_student,
+        pay.amount,
+        pay.payment_date,
+        pay.payment_method,
+        pay.payment_date - LAG(pay.payment_date) OVER (
+            PARTITION BY rf.id_student ORDER BY pay.payment_date
+        ) as gap_days
+    FROM payments pay
+    INNER JOIN registration_fees rf ON rf.id = pay.id_registration_fee
+    WHERE pay.payment_date <= %(as_of)s::date{student_filter.format(column='rf.id_student')}
+),
+payment_features AS (
+    SELECT
+        id_student,
+        count(*) as payment_count,
+        sum(amount) as payment_total,
+        avg(amount) as payment_mean,
+        max(amount) as payment_max,
+        stddev(amount) as payment_std,
+        p.as_of - min(payment_date) as days_since_first_payment,
+        p.as_of - max(payment_date) as days_since_last_payment,
+        avg(gap_days) as mean_days_between_payments,
+        count(*) FILTER (WHERE payment_date > p.as_of - {RECENT_PAYMENT_DAYS}) as payments_recent,
+        coalesce(sum(amount) FILTER (WHERE payment_date > p.as_of - {RECENT_PAYMENT_DAYS}), 0) as amount_recent,
+        {method_shares}
+    FROM student_payments, params p
+    GROUP BY id_student, p.as_of
+),
+attendance_features AS (
+    SELECT
+        id_student,
+        count(*) as attendance_count,
+        avg(attended::int) as attendance_rate,
+        p.as_of - max(date) as days_since_last_attendance,
+        {attendance_windows}
+    FROM classes_attendances, params p
+    WHERE date <= %(as_of)s::date{student_filter.format(column='id_student')}
+    GROUP BY id_student, p.as_of
+)
+SELECT
+    sb.student_id,
+    sb.student_state,
+    {feature_columns}
+FROM student_base sb
+LEFT JOIN registration_features rf ON rf.id_student = sb.student_id
+LEFT JOIN payment_features pf ON pf.id_student = sb.student_id
+LEFT JOIN attendance_features af ON af.id_student = sb.student_id
+ORDER BY sb.student_id
+"""
+
+def build_version_query(filtered=False):
+    """
+    Per-student change marker over every source row of its features: latest
+    updated_at and row count (a deleted row changes the count, not updated_at).
+    Covers the exported students only, like the feature query; filtered=True
+    restricts every subquery to %(student_ids)s.
+    """
+    student_filter = "\n    WHERE {column} = ANY(%(student_ids)s::uuid[])" if filtered else ""
+    outer_filter = "\nWHERE s.id = ANY(%(student_ids)s::uuid[])" if filtered else ""
+
+    return f"""
+SELECT
+    s.id::text as student_id,
+    greatest(s.updated_at, rf.updated_at, pay.updated_at, ca.updated_at) as updated_at,
+    1 + coalesce(rf.row_count, 0) + coalesce(pay.row_count, 0) + coalesce(ca.row_count, 0) as row_count
+FROM students s
+INNER JOIN users u ON s.id = u.id
+INNER JOIN headquarters h ON s.id_headquarter = h.id
+LEFT JOIN (
+    SELECT id_student, max(updated_at) as updated_at, count(*) as row_count
+    FROM registration_fees{student_filter.format(column='id_student')}
+    GROUP BY id_student
+) rf ON rf.id_student = s.id
+LEFT JOIN (
+    SELECT r.id_student, max(pay.updated_at) as updated_at, count(*) as row_count
+    FROM registration_fees r
+    INNER JOIN payments pay ON pay.id_registration_fee = r.id{student_filter.format(column='r.id_student')}
+    GROUP BY r.id_student
+) pay ON pay.id_student = s.id
+LEFT JOIN (
+    SELECT id_student, max(updated_at) as updated_at, count(*) as row_count
+    FROM classes_attendances{student_filter.format(column='id_student')}
+    GROUP BY id_student
+) ca ON ca.id_student = s.id{outer_filter}
+"""
+
+def get_student_features(conn, as_of=None, student_ids=None):
+    """
+    Run the feature query and return the finalized feature matrix
+    (all exported students, or only student_ids).
+    """
+    params = {'as_of': as_of or date.today()}
+    if student_ids is not None:
+        params['student_ids'] = list(student_ids)
+    with conn.cursor() as cursor:
+        cursor.execute(build_feature_query(filtered=student_ids is not None), params)
+        columns = [desc.name for desc in cursor.description]
+        rows = cursor.fetchall()
+
+    return finalize_features(pd.DataFrame(rows, columns=columns))
+
+def get_student_versions(conn, student_ids=None):
+    """
+    {student_id: (updated_at, row_count)} for all exported students or only
+    student_ids; a feature row computed at an equal version is still current.
+    """
+    params = {'student_ids': list(student_ids)} if student_ids is not None else None
+    with conn.cursor() as cursor:
+        cursor.execute(build_version_query(filtered=student_ids is not None), params)
+        return {student_id: (updated_at, row_count) for student_id, updated_at, row_count in cursor.fetchall()}
+
+def parse_args():
+    """
+    Parse command line options for the feature export.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_output_arguments(parser)
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help='Reference date: recency, windows and the last day of data used (YYYY-MM-DD, default: today)')
+    return parser.parse_args()
+
+def main():
+    """
+    Compute the features in PostgreSQL and export them (Parquet by default).
+    """
+    args = parse_args()
+
+    try:
+        print("🔌 Connecting to database...")
+        conn = psycopg.connect(**DB_CONFIG)
+        created = ensure_upcoming_partitions(conn)
+        conn.commit()
+        for table, count in created.items():
+            if count:
+                print(f"✓ Created {count} monthly partition(s) of {table}")
+
+        print("🧮 Computing student features in the database...")
+        features = get_student_features(conn, args.as_of)
+        conn.close()
+
+        print(f"✓ Students: {len(features):,}")
+        print(f"✓ Features: {len(FEATURE_COLUMNS)}")
+
+        fmt = args.format or (None if args.output else 'parquet')
+        filename = export_dataframe(features, args.output, prefix='student_features', fmt=fmt,
+                                    compression=args.compression, threads=args.threads)
+        print(f"✅ Features exported to: {filename}")
+
+    except psycopg.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ Características implementadas:
 - Máximo 100 registros en tablas maestras
 """
 
+import argparse
 import psycopg
 import random
 import uuid
@@ -19,6 +20,8 @@ from datetime import datetime, date, timedelta
 from faker import Faker
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from partitions import ensure_month_partitions
 
 # Configuración de la base de datos
 DB_CONFIG = {
@@ -334,6 +337,16 @@ class FootballSchoolDataGenerator:
                 """
                 self.cursor.execute(query, (reg_id, student_id, start_date, end_date, state))
 
+    def generate_partitions(self):
+        """Crear las particiones mensuales de las fechas generadas (solo con 003_partition_by_month.sql)"""
+        # Días hacia atrás de las fechas de generate_payments ('-1y') y generate_classes_attendances ('-6M')
+        dias_atras = {'payments': 366, 'classes_attendances': 183}
+        for table, dias in dias_atras.items():
+            desde = date.today() - timedelta(days=dias)
+            creadas = ensure_month_partitions(self.conn, table, desde, date.today())
+            if creadas:
+                print(f"Creadas {creadas} particiones mensuales de {table}")
+
     def generate_payments(self, target_count=50000):
         """Generar pagos (tabla operacional)"""
         print(f"Generando {target_count} pagos...")
@@ -435,6 +448,9 @@ class FootballSchoolDataGenerator:
             self.generate_teachers_classes()
             self.generate_registration_fees()
             
+            # Particiones mensuales de pagos (último año) y asistencias (últimos 6 meses)
+            self.generate_partitions()
+            
             # Commit relaciones
             self.conn.commit()
             print("✓ Relaciones generadas")
@@ -455,7 +471,82 @@ class FootballSchoolDataGenerator:
             self.conn.rollback()
             raise
 
+# Tablas incluidas en el resumen final
+SUMMARY_TABLES = [
+    'users', 'headquarters', 'students', 'teachers', 'classes',
+    'students_classes', 'teachers_classes', 'registration_fees',
+    'payments', 'classes_attendances'
+]
+
+def approximate_table_stats(cursor, tables):
+    """
+    Conteo aproximado y tamaños desde el catálogo (pg_class / pg_stat_user_tables).
+    Requiere ANALYZE previo para que reltuples esté actualizado; no recorre las tablas.
+    Las tablas particionadas suman sus particiones (pg_partition_tree); para una
+    tabla normal pg_partition_tree no devuelve filas y se usa la propia tabla.
+    """
+    cursor.execute("""
+        SELECT
+            c.relname,
+            SUM(GREATEST(leaf.reltuples, 0))::bigint AS estimated_rows,
+            SUM(COALESCE(s.n_live_tup, 0))::bigint AS live_rows,
+            pg_size_pretty(SUM(pg_table_size(leaf.oid))) AS table_size,
+            pg_size_pretty(SUM(pg_indexes_size(leaf.oid))) AS index_size,
+            pg_size_pretty(SUM(pg_total_relation_size(leaf.oid))) AS total_size
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN LATERAL pg_partition_tree(c.oid) t ON true
+        JOIN pg_class leaf ON leaf.oid = COALESCE(t.relid, c.oid)
+        LEFT JOIN pg_stat_user_tables s ON s.relid = leaf.oid
+        WHERE n.nspname = current_schema()
+          AND c.relname = ANY(%s)
+          AND c.relkind IN ('r', 'p')
+          AND COALESCE(t.isleaf, true)
+        GROUP BY c.relname
+    """, (tables,))
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def exact_table_count(table):
+    """Conteo exacto de una tabla con su propia conexión (para ejecutar en paralelo)"""
+    with psycopg.connect(**DB_CONFIG) as conn:
+        return table, conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def exact_table_counts(tables):
+    """Conteos exactos de todas las tablas en paralelo"""
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        return dict(executor.map(exact_table_count, tables))
+
+def print_summary(generator, exact=False):
+    """Mostrar resumen de filas y almacenamiento por tabla"""
+    print("\n📊 RESUMEN DE DATOS GENERADOS:")
+    print("=" * 80)
+    
+    # Actualizar estadísticas del planificador (y reltuples) antes de leer el catálogo
+    generator.cursor.execute(f"ANALYZE {', '.join(SUMMARY_TABLES)}")
+    generator.conn.commit()
+    
+    stats = approximate_table_stats(generator.cursor, SUMMARY_TABLES)
+    counts = exact_table_counts(SUMMARY_TABLES) if exact else {}
+    
+    label = "exacto" if exact else "aprox."
+    print(f"{'tabla':20} {label:>10} {'tabla':>10} {'índices':>10} {'total':>10}")
+    for table in SUMMARY_TABLES:
+        estimated_rows, live_rows, table_size, index_size, total_size = stats.get(
+            table, (0, 0, '-', '-', '-')
+        )
+        count = counts.get(table, estimated_rows or live_rows)
+        print(f"{table:20} {count:>10,} {table_size:>10} {index_size:>10} {total_size:>10}")
+
+def parse_args():
+    """Opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Generar datos de prueba para la escuela de fútbol')
+    parser.add_argument('--exact-counts', action='store_true',
+                        help='Usar COUNT(*) exacto (en paralelo) en el resumen en lugar de '
+                             'las estimaciones del catálogo')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     generator = FootballSchoolDataGenerator()
     
     try:
@@ -463,19 +554,7 @@ def main():
         generator.generate_all_data()
         
         # Mostrar resumen
-        print("\n📊 RESUMEN DE DATOS GENERADOS:")
-        print("=" * 50)
-        
-        tables_to_count = [
-            'users', 'headquarters', 'students', 'teachers', 'classes',
-            'students_classes', 'teachers_classes', 'registration_fees',
-            'payments', 'classes_attendances'
-        ]
-        
-        for table in tables_to_count:
-            generator.cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = generator.cursor.fetchone()[0]
-            print(f"{table:20}: {count:>8,} registros")
+        print_summary(generator, exact=args.exact_counts)
         
     except Exception as e:
         print(f"❌ Error: {e}")
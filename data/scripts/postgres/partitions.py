@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Monthly Partition Maintenance - payments and classes_attendances
+Creates and drops the monthly partitions of data/migrations/sql/003_partition_by_month.sql.
+The migration has no default partition, so a month must exist before rows are
+inserted into it: the generator creates the months it fills, and the export
+scripts create the current and the next month on each run. Old months are
+removed by detaching and dropping their partitions, without a DELETE.
+
+Every function is a no-op on tables that are not partitioned, so the scripts
+work the same with or without the migration.
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date
+import psycopg
+from psycopg import sql
+
+# Partitioned table -> partition column
+PARTITIONED_TABLES = {
+    'payments': 'payment_date',
+    'classes_attendances': 'date',
+}
+
+# Months created ahead of the current one
+MONTHS_AHEAD = 1
+
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def add_months(day, months):
+    """
+    First day of the month `months` after the month of day.
+    """
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def is_partitioned(conn, table):
+    """
+    True if table exists and is a partitioned table.
+    """
+    row = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,)).fetchone()
+    return row[0]
+
+def ensure_month_partitions(conn, table, from_date, to_date):
+    """
+    Create the missing monthly partitions of table covering from_date .. to_date.
+    Returns the number created (0 if table is not partitioned). The caller commits.
+    """
+    if not is_partitioned(conn, table):
+        return 0
+    row = conn.execute("SELECT ensure_month_partitions(%s::regclass, %s, %s)",
+                       (table, from_date, to_date)).fetchone()
+    return row[0]
+
+def ensure_upcoming_partitions(conn, today=None, months_ahead=MONTHS_AHEAD):
+    """
+    Create the current and the next months_ahead months of every partitioned table.
+    Returns {table: partitions created}. The caller commits.
+    """
+    today = today or date.today()
+    return {
+        table: ensure_month_partitions(conn, table, today, add_months(today, months_ahead))
+        for table in PARTITIONED_TABLES
+    }
+
+def list_month_partitions(conn, table):
+    """
+    [(partition, from_date, to_date, estimated_rows)] of table, oldest first.
+    """
+    rows = conn.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), GREATEST(c.reltuples, 0)::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table,)).fetchall()
+
+    partitions = []
+    for name, bound, estimated_rows in rows:
+        match = BOUND_PATTERN.search(bound)
+        if match:
+            partitions.append((name, date.fromisoformat(match.group(1)),
+                               date.fromisoformat(match.group(2)), estimated_rows))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def drop_months_before(conn, table, before, dry_run=False):
+    """
+    Detach and drop the partitions of table that end on or before the month of
+    `before`, i.e. every month strictly older than it. Returns the dropped
+    partitions (list_month_partitions layout). The caller commits.
+    """
+    if not is_partitioned(conn, table):
+        return []
+    cutoff = add_months(before, 0)
+    dropped = [partition for partition in list_month_partitions(conn, table) if partition[2] <= cutoff]
+    if dry_run:
+        return dropped
+
+    for name, *_ in dropped:
+        partition = sql.Identifier(name)
+        conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), partition))
+        conn.execute(sql.SQL("DROP TABLE {}").format(partition))
+    return dropped
+
+def parse_args():
+    """
+    Parse command line options for partition maintenance.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--table', choices=sorted(PARTITIONED_TABLES), action='append',
+                        help='Table to maintain (repeatable, default: all partitioned tables)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='Show the monthly partitions with estimated rows')
+
+    ensure = commands.add_parser('ensure', help='Create missing monthly partitions')
+    ensure.add_argument('--from', dest='from_date', type=date.fromisoformat, default=None,
+                        help='First day to cover (YYYY-MM-DD, default: today)')
+    ensure.add_argument('--to', dest='to_date', type=date.fromisoformat, default=None,
+                        help=f'Last day to cover (default: {MONTHS_AHEAD} month(s) ahead)')
+
+    drop = commands.add_parser('drop-before', help='Drop the months older than a date')
+    drop.add_argument('before', type=date.fromisoformat,
+                      help='Months that end on or before the start of this month are dropped (YYYY-MM-DD)')
+    drop.add_argument('--dry-run', action='store_true', help='Only list the partitions that would be dropped')
+    return parser.parse_args()
+
+def main():
+    """
+    List, create or drop monthly partitions.
+    """
+    args = parse_args()
+    tables = args.table or list(PARTITIONED_TABLES)
+
+    try:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export'))
+        from export_student_data import DB_CONFIG
+
+        print("🔌 Connecting to database...")
+        with psycopg.connect(**DB_CONFIG) as conn:
+            for table in tables:
+                if not is_partitioned(conn, table):
+                    print(f"  {table}: not partitioned (003_partition_by_month.sql not applied)")
+                    continue
+
+                if args.command == 'list':
+                    partitions = list_month_partitions(conn, table)
+                    print(f"📊 {table}: {len(partitions)} partitions")
+                    for name, from_date, to_date, estimated_rows in partitions:
+                        print(f"  {name:36} {from_date} .. {to_date}  ~{estimated_rows:,} rows")
+                elif args.command == 'ensure':
+                    from_date = args.from_date or date.today()
+                    to_date = args.to_date or add_months(from_date, MONTHS_AHEAD)
+                    created = ensure_month_partitions(conn, table, from_date, to_date)
+                    print(f"✓ {table}: {created} partition(s) created for {from_date} .. {to_date}")
+                else:
+                    dropped = drop_months_before(conn, table, args.before, args.dry_run)
+                    rows = sum(partition[3] for partition in dropped)
+                    action = 'would drop' if args.dry_run else 'dropped'
+                    print(f"✓ {table}: {action} {len(dropped)} partition(s), ~{rows:,} rows")
+                    for name, from_date, to_date, _ in dropped:
+                        print(f"  {name:36} {from_date} .. {to_date}")
+            conn.commit()
+
+    except psycopg.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Student Feature Definitions - Shared by the PostgreSQL and MongoDB feature exporters
+Both backends aggregate per-student features in the database (SQL window
+functions / aggregation pipelines) and return one small row per student. This
+module fixes the feature names, windows and the final numeric matrix layout so
+both exports are interchangeable as model input.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Payment methods used by the generators; one share column each
+PAYMENT_METHODS = ['Efectivo', 'Tarjeta', 'Transferencia', 'PSE', 'Daviplata', 'Nequi']
+
+# Attendance-rate windows (days before the reference date)
+ATTENDANCE_WINDOWS = [30, 90, 365]
+
+# Window for "recent" payment activity (days)
+RECENT_PAYMENT_DAYS = 90
+
+# Label column (students.state) encoded as integers
+STATE_LABELS = {'active': 0, 'inactive': 1, 'suspended': 2}
+LABEL_COLUMN = 'student_state'
+
+ID_COLUMN = 'student_id'
+
+
+def method_column(method):
+    """
+    Feature name of a payment method share, e.g. 'Efectivo' -> 'share_efectivo'.
+    """
+    return f"share_{method.lower()}"
+
+
+FEATURE_COLUMNS = (
+    [
+        'registration_count',
+        'registrations_active',
+        'registrations_expired',
+        'registrations_cancelled',
+        'latest_registration_active',
+        'days_since_last_registration',
+        'has_payments',
+        'payment_count',
+        'payment_total',
+        'payment_mean',
+        'payment_max',
+        'payment_std',
+        'days_since_first_payment',
+        'days_since_last_payment',
+        'mean_days_between_payments',
+        'payments_recent',
+        'amount_recent',
+    ]
+    + [method_column(method) for method in PAYMENT_METHODS]
+    + ['has_attendance', 'attendance_count', 'attendance_rate', 'days_since_last_attendance']
+    + [f'attendance_rate_{days}d' for days in ATTENDANCE_WINDOWS]
+)
+
+
+def finalize_features(df):
+    """
+    Turn the per-student aggregate rows into the model matrix:
+    student_id, FEATURE_COLUMNS as float32 (undefined values -> 0, with the
+    has_payments / has_attendance flags telling them apart) and the integer label.
+    """
+    df = df.copy()
+    for col in FEATURE_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    df['has_payments'] = (df['payment_count'].fillna(0) > 0).astype(int)
+    df['has_attendance'] = (df['attendance_count'].fillna(0) > 0).astype(int)
+
+    features = df[FEATURE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    features = features.fillna(0).astype(np.float32)
+
+    result = pd.concat([df[[ID_COLUMN]].astype(str).reset_index(drop=True),
+                        features.reset_index(drop=True)], axis=1)
+    result[LABEL_COLUMN] = df[LABEL_COLUMN].map(STATE_LABELS).fillna(-1).astype(np.int8).to_numpy()
+    return result
+
+
+def feature_matrix(features):
+    """
+    (X, y, ids) numpy arrays from a finalize_features() frame or exported file.
+    """
+    X = features[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = features[LABEL_COLUMN].to_numpy()
+    return X, y, features[ID_COLUMN].to_numpy()